@@ -0,0 +1,55 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# POSTGRES points at a socket directory that does not exist, so the command fails fast after its imports
+_probe_environ = {**os.environ, 'POSTGRES': 'host=/nonexistent-magistrate-socket dbname=magistrate connect_timeout=1'}
+
+_probe_command = [sys.executable, '-X', 'importtime', '-m', 'magistrate.main', '--get-version']
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    cumulative: dict[str, int] = {}
+
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative_us, module = line[len('import time:'):].split('|')
+        # keep the indentation, it encodes the import nesting level
+        cumulative[module[1:].rstrip()] = int(cumulative_us)
+
+    return cumulative
+
+def measure_cli_imports() -> dict[str, int]:
+    result = subprocess.run(_probe_command, capture_output=True, text=True, env=_probe_environ)
+    return parse_importtime(result.stderr)
+
+def _total_us(cumulative: dict[str, int]) -> int:
+    # top-level imports carry the cumulative time of everything below them
+    return sum(us for module, us in cumulative.items() if module == module.lstrip())
+
+def main():
+    parser = argparse.ArgumentParser(description='Import-time benchmark for `magistrate.main --get-version`')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, default=None, help='Exit non-zero if the median exceeds this')
+    args = parser.parse_args()
+
+    runs = [measure_cli_imports() for _ in range(args.runs)]
+    totals_ms = [_total_us(run) / 1000 for run in runs]
+    median_ms = statistics.median(totals_ms)
+
+    print(f'import time over {args.runs} runs: median {median_ms:.1f}ms, min {min(totals_ms):.1f}ms, max {max(totals_ms):.1f}ms')
+
+    slowest = sorted(runs[-1].items(), key=lambda x: x[1], reverse=True)[:10]
+
+    for module, us in slowest:
+        print(f'{us / 1000:8.1f}ms  {module.strip()}')
+
+    if args.max_ms is not None and median_ms > args.max_ms:
+        print(f'median import time {median_ms:.1f}ms exceeds {args.max_ms:.1f}ms')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
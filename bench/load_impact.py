@@ -0,0 +1,58 @@
+import argparse
+import os
+import sys
+
+from magistrate.execution import DirectorySource
+from magistrate.loadimpact import Workload, measure_load_impact
+
+def _parse_target(value: str) -> int | str:
+    return value if value == 'latest' else int(value)
+
+def main():
+    parser = argparse.ArgumentParser(description='Query latency and throughput of a synthetic workload while migrations run')
+    parser.add_argument('--directory', required=True, help='Path to migration files')
+    parser.add_argument('--version', type=_parse_target, default='latest', help='Target version to migrate to')
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--read-query', default=None, help='Replaces the synthetic point read, %%(rows)s is the seeded row count')
+    parser.add_argument('--write-query', default=None, help='Replaces the synthetic point update')
+    parser.add_argument('--rows', type=int, default=10000, help='Rows seeded into the synthetic table')
+    parser.add_argument('--touched-tables', action='store_true', help='Query the existing tables the migrations touch instead of the synthetic table')
+    parser.add_argument('--baseline-seconds', type=float, default=5.0)
+    parser.add_argument('--settle-seconds', type=float, default=0.0, help='Keep measuring this long after each version')
+    parser.add_argument('--output', default=None, help='Write the markdown report here instead of stdout')
+    parser.add_argument('--json', action='store_true', help='Report as JSON instead of markdown')
+    args = parser.parse_args()
+
+    try:
+        conn_string = os.environ['POSTGRES']
+    except KeyError:
+        print('POSTGRES not found in os.environ, exiting')
+        sys.exit(1)
+
+    workload = Workload(
+        readers=args.readers,
+        writers=args.writers,
+        rows=args.rows,
+        touched_tables=args.touched_tables,
+        baseline_seconds=args.baseline_seconds,
+        settle_seconds=args.settle_seconds,
+        **({'read_query': args.read_query} if args.read_query is not None else {}),
+        **({'write_query': args.write_query} if args.write_query is not None else {})
+    )
+
+    report = measure_load_impact(conn_string, DirectorySource(directory=args.directory), args.version, workload)
+    text = report.model_dump_json(indent=2) if args.json else report.to_markdown()
+
+    if report.synthetic:
+        print('Warning: only the synthetic magistrate_load_impact table was queried, which no migration locks; pass --touched-tables or --read-query/--write-query', file=sys.stderr)
+
+    if args.output is None:
+        print(text)
+        return
+
+    with open(args.output, 'w') as f:
+        f.write(text)
+
+if __name__ == '__main__':
+    main()
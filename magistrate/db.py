@@ -1,14 +1,21 @@
+import contextlib
+import hashlib
+import json
 import os
+import re
 import shutil
-import subprocess
 import typing
 import psycopg2
+from psycopg2 import sql
 
-from magistrate.dbexc import IncompatibleVersions, MultipleVersionsFound, NoVersionsFound, VersionTableNotFound
+from magistrate.dbexc import CheckpointMismatch, IncompatibleVersions, InvalidIndexFound, LockQueueExceeded, MultipleVersionsFound, NoVersionsFound, PartialMigrationFound, SettingNotAllowed, VersionTableNotFound
 from magistrate.exc import PGDumpError, PGDumpNotFound
 
 if typing.TYPE_CHECKING:
-    from magistrate.parser import Migration
+    from magistrate.parser import CopyData, Migration, Statement, StreamingMigration
+    from magistrate.partitions import PartitionSettings
+    from magistrate.progress import ProgressSettings
+    from magistrate.watchdog import LockWatchdogSettings
 
 _pg_dump_binary = shutil.which('pg_dump')
 
@@ -16,6 +23,8 @@ def backup_db(backup_filename: str, conn_string: str, *, pg_dump_binary_path: st
     if pg_dump_binary_path is None:
         raise PGDumpNotFound(os.environ['PATH'])
 
+    import subprocess
+
     backup_filename = os.path.abspath(backup_filename)
 
     args = [
@@ -45,7 +54,11 @@ def backup_db(backup_filename: str, conn_string: str, *, pg_dump_binary_path: st
 
 _create_migrations_query = '''DO $$
 BEGIN
-    IF NOT EXISTS (SELECT 1 FROM pg_catalog.pg_class WHERE relname = 'magistrate_migrations' AND relkind = 'r') THEN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relname = 'magistrate_migrations' AND c.relkind = 'r' AND n.nspname = current_schema()
+    ) THEN
         CREATE TABLE magistrate_migrations (
             id SERIAL PRIMARY KEY,
             version INTEGER
@@ -56,68 +69,523 @@ END
 $$ LANGUAGE plpgsql
 '''
 
+def prepare_migration_table_conn(conn):
+    with conn.cursor() as cur:
+        cur.execute(_create_migrations_query)
+
+    conn.commit()
+
 def prepare_migration_table(conn_string: str):
     with psycopg2.connect(conn_string) as con:
-        with con.cursor() as cur:
-            cur.execute(_create_migrations_query)
+        prepare_migration_table_conn(con)
+
+def _read_current_version(cur) -> int:
+    try:
+        cur.execute('SELECT version FROM magistrate_migrations')
+    except psycopg2.errors.UndefinedTable:
+        raise VersionTableNotFound()
+    
+    versions = cur.fetchall()
+
+    if len(versions) == 0:
+        raise NoVersionsFound()
+    
+    if len(versions) > 1:
+        raise MultipleVersionsFound()
+    
+    ver = versions[0][0]
+    return ver
+
+def get_current_migration_version_conn(conn) -> int:
+    with conn.cursor() as cur:
+        try:
+            return _read_current_version(cur)
+        except VersionTableNotFound:
+            conn.rollback()
+            raise
 
 def get_current_migration_version(conn_string: str):
     with psycopg2.connect(conn_string) as con:
-        with con.cursor() as cur:
-            try:
-                cur.execute('SELECT version FROM magistrate_migrations')
-            except psycopg2.errors.UndefinedTable:
-                raise VersionTableNotFound()
-            
-            versions = cur.fetchall()
-
-            if len(versions) == 0:
-                raise NoVersionsFound()
-            
-            if len(versions) > 1:
-                raise MultipleVersionsFound()
-            
-            ver = versions[0][0]
-            return ver
-
-def migrate_up(conn_string: str, migration: 'Migration'):
-    current_version = get_current_migration_version(conn_string)
-
-    if migration.version != current_version + 1:
-        raise IncompatibleVersions(current_version, migration.version)
-    
-    with psycopg2.connect(conn_string) as conn:
+        return get_current_migration_version_conn(con)
+
+def _copy_data(cur, copy: 'CopyData'):
+    query = sql.SQL('COPY {} ({}) FROM STDIN WITH (FORMAT {})').format(
+        sql.Identifier(*copy.table.split('.')),
+        sql.SQL(', ').join(sql.Identifier(col) for col in copy.columns),
+        sql.SQL(copy.format)
+    )
+
+    if copy.filename is not None:
+        from magistrate.fileio import open_text
+
+        with open_text(copy.filename) as f:
+            cur.copy_expert(query, f)
+    else:
+        cur.copy_expert(query, copy.open_rows())
+
+# settings '-- set:' may change unless MigrationParameters.allowed_settings replaces this list
+default_allowed_settings = frozenset({
+    'maintenance_work_mem',
+    'max_parallel_maintenance_workers',
+    'max_parallel_workers_per_gather',
+    'work_mem',
+    'statement_timeout',
+    'lock_timeout',
+    'idle_in_transaction_session_timeout',
+    'synchronous_commit',
+})
+
+# channel the CLI's --notify announces version changes on, and VersionListener listens to by default
+default_notify_channel = 'magistrate_version'
+
+class ExecutionOptions:
+    __slots__ = ('resume', 'pause', 'connect', 'partitions', 'watchdog', 'touched_tables', 'progress', 'allowed_settings', 'notify_channel')
+
+    def __init__(
+        self,
+        *,
+        resume: bool = False,
+        pause: typing.Callable[[], None] | None = None,
+        connect: typing.Callable[[], typing.Any] | None = None,
+        partitions: 'PartitionSettings | None' = None,
+        watchdog: 'LockWatchdogSettings | None' = None,
+        touched_tables: set[str] | None = None,
+        progress: 'ProgressSettings | None' = None,
+        allowed_settings: typing.AbstractSet[str] = default_allowed_settings,
+        notify_channel: str | None = None
+    ):
+        # continue non-transactional migrations from their first unfinished statement
+        self.resume: bool = resume
+        # called between the statements of non-transactional migrations declaring '-- throttle: true'
+        self.pause: typing.Callable[[], None] | None = pause
+        # opens side connections, e.g. for building partition indexes in parallel
+        self.connect: typing.Callable[[], typing.Any] | None = connect
+        self.partitions: 'PartitionSettings | None' = partitions
+        # cancels the running statement when it holds up too many sessions, needs connect
+        self.watchdog: 'LockWatchdogSettings | None' = watchdog
+        # collects the tables executed statements touched, for the post-migration ANALYZE and VACUUM
+        self.touched_tables: set[str] | None = touched_tables
+        # polls pg_stat_progress_* for the running statement, needs connect
+        self.progress: 'ProgressSettings | None' = progress
+        self.allowed_settings: typing.AbstractSet[str] = allowed_settings
+        # NOTIFY sent in the transaction recording each new version, so listeners only hear committed versions
+        self.notify_channel: str | None = notify_channel
+
+    def replace(self, **kwargs) -> 'ExecutionOptions':
+        return ExecutionOptions(**{**{name: getattr(self, name) for name in self.__slots__}, **kwargs})
+
+    @classmethod
+    def for_connection_string(cls, conn_string: str, **kwargs) -> 'ExecutionOptions':
+        return cls(connect=lambda: psycopg2.connect(conn_string), **kwargs)
+
+def execute_statement(conn, cur, statement: 'Statement', options: ExecutionOptions):
+    if isinstance(statement, str):
+        cur.execute(statement)
+    elif statement.kind == 'copy':
+        _copy_data(cur, statement)
+    elif statement.kind == 'partitioned_index':
+        from magistrate.partitions import PartitionSettings, build_partitioned_index
+
+        settings = options.partitions if options.partitions is not None else PartitionSettings()
+        build_partitioned_index(conn, statement, settings, options.connect)
+
+_create_progress_query = '''CREATE TABLE IF NOT EXISTS magistrate_progress (
+    version INTEGER NOT NULL,
+    direction TEXT NOT NULL,
+    statement_index INTEGER NOT NULL,
+    checksum TEXT NOT NULL,
+    completed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (version, direction, statement_index)
+)'''
+
+def _statement_checksum(statement: 'Statement') -> str:
+    if not isinstance(statement, str) and statement.kind == 'copy':
+        return statement.checksum()
+
+    text = statement if isinstance(statement, str) else statement.model_dump_json()
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def _read_progress(cur, version: int, direction: str) -> list[str]:
+    cur.execute(
+        'SELECT checksum FROM magistrate_progress WHERE version = %s AND direction = %s ORDER BY statement_index',
+        (version, direction)
+    )
+
+    return [row[0] for row in cur.fetchall()]
+
+def _migrate_transactional(conn, queries: typing.Iterable['Statement'], options: ExecutionOptions):
+    with conn.cursor() as cur:
+        for query in queries:
+            execute_statement(conn, cur, query, options)
+
+# an index another session is still building with CREATE INDEX CONCURRENTLY is INVALID as well;
+# plain queries planned against the table only take AccessShareLock on its indexes
+_index_state_query = '''SELECT n.nspname, c.relname, i.indisvalid,
+    EXISTS (SELECT 1 FROM pg_catalog.pg_stat_progress_create_index p WHERE p.index_relid = c.oid)
+    OR EXISTS (
+        SELECT 1 FROM pg_catalog.pg_locks l
+        WHERE l.relation = c.oid AND l.mode <> 'AccessShareLock' AND l.pid <> pg_catalog.pg_backend_pid()
+    )
+FROM pg_catalog.pg_index i
+JOIN pg_catalog.pg_class c ON c.oid = i.indexrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE c.oid = pg_catalog.to_regclass(%s)'''
+
+def _concurrent_index_name(statement: 'Statement') -> str | None:
+    if not isinstance(statement, str):
+        return None
+
+    from magistrate.maintenance import identifier_pattern, qualified_name_pattern
+
+    index_match = re.search(
+        rf'^\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?({identifier_pattern})\s+ON\s+(?:ONLY\s+)?{qualified_name_pattern}',
+        re.sub(r'--[^\n]*', '', statement),
+        re.IGNORECASE
+    )
+
+    if index_match is None:
+        return None
+
+    # the index is created in the schema of its table
+    schema_match = re.match(rf'({identifier_pattern})\s*\.', index_match.group(2))
+
+    return index_match.group(1) if schema_match is None else f'{schema_match.group(1)}.{index_match.group(1)}'
+
+def _prepare_concurrent_index(cur, index_name: str, *, resumed: bool) -> bool:
+    # a failed or cancelled CREATE INDEX CONCURRENTLY leaves an INVALID index behind that makes the retry fail
+    cur.execute(_index_state_query, (index_name,))
+    state = cur.fetchone()
+
+    if state is None:
+        return False
+
+    if state[2]:
+        # built by the interrupted run, which stopped before recording its progress
+        return resumed
+
+    # without --resume the index may belong to anyone, and a build in progress would be dropped once it finished
+    if not resumed or state[3]:
+        raise InvalidIndexFound(index_name, state[3])
+
+    cur.execute(sql.SQL('DROP INDEX CONCURRENTLY IF EXISTS {}').format(sql.Identifier(state[0], state[1])))
+    return False
+
+def _execute_autocommit(conn, cur, statement: 'Statement', options: ExecutionOptions, *, resumed: bool):
+    conn.autocommit = True
+
+    try:
+        index_name = _concurrent_index_name(statement)
+
+        if index_name is not None and _prepare_concurrent_index(cur, index_name, resumed=resumed):
+            return
+
+        execute_statement(conn, cur, statement, options)
+    finally:
+        conn.autocommit = False
+
+def _migrate_checkpointed(conn, version: int, direction: str, queries: typing.Iterable['Statement'], options: ExecutionOptions, between_statements: typing.Callable[[], None] | None):
+    # every statement commits on its own, so progress is recorded after each one for --resume
+    conn.commit()
+
+    with conn.cursor() as cur:
+        cur.execute(_create_progress_query)
+
+        completed = _read_progress(cur, version, direction)
+        conn.commit()
+
+        if len(completed) > 0 and not options.resume:
+            raise PartialMigrationFound(version, direction, len(completed))
+
+        executed = 0
+        total = 0
+
+        for i, query in enumerate(queries):
+            total += 1
+
+            if i < len(completed):
+                if completed[i] != _statement_checksum(query):
+                    raise CheckpointMismatch(version, direction, i)
+
+                continue
+
+            if executed > 0 and between_statements is not None:
+                between_statements()
+
+            # the statement the earlier run was interrupted in
+            resumed = options.resume and executed == 0
+
+            if _concurrent_index_name(query) is not None or (not isinstance(query, str) and query.kind == 'partitioned_index'):
+                _execute_autocommit(conn, cur, query, options, resumed=resumed)
+            else:
+                try:
+                    execute_statement(conn, cur, query, options)
+                except psycopg2.errors.ActiveSqlTransaction:
+                    # e.g. VACUUM, which refuses to start inside a transaction block
+                    conn.rollback()
+                    _execute_autocommit(conn, cur, query, options, resumed=resumed)
+
+            executed += 1
+
+            # committed together with the statement wherever it ran in a transaction, so a crash cannot leave it unrecorded;
+            # taken after running, since streamed copy rows are hashed while COPY reads them
+            cur.execute(
+                'INSERT INTO magistrate_progress (version, direction, statement_index, checksum) VALUES (%s, %s, %s, %s)',
+                (version, direction, i, _statement_checksum(query))
+            )
+
+            conn.commit()
+
+        if len(completed) > total:
+            raise CheckpointMismatch(version, direction, total)
+
+def check_migration_settings(migration: 'Migration | StreamingMigration', allowed_settings: typing.AbstractSet[str]):
+    for name in migration.settings:
+        if name not in allowed_settings:
+            raise SettingNotAllowed(migration.version, name)
+
+def apply_settings(conn, settings: dict[str, str], *, is_local: bool) -> dict[str, str]:
+    previous: dict[str, str] = {}
+
+    with conn.cursor() as cur:
+        for name, value in settings.items():
+            cur.execute('SELECT pg_catalog.current_setting(%s), pg_catalog.set_config(%s, %s, %s)', (name, name, value, is_local))
+            previous[name] = cur.fetchone()[0]
+
+    return previous
+
+def _connect_with_settings(connect: typing.Callable[[], typing.Any], settings: dict[str, str]) -> typing.Callable[[], typing.Any]:
+    def _connect():
+        conn = connect()
+        apply_settings(conn, settings, is_local=False)
+        conn.commit()
+        return conn
+
+    return _connect
+
+def _run_statements_unwatched(conn, migration: 'Migration | StreamingMigration', direction: str, options: ExecutionOptions):
+    queries = migration.up_queries if direction == 'up' else migration.down_queries
+    # transactional migrations never pause, their locks would be held for the whole wait
+    between_statements = options.pause if migration.throttle and not migration.transactional else None
+
+    if options.touched_tables is not None and migration.maintenance:
+        from magistrate.maintenance import record_touched_tables
+
+        queries = record_touched_tables(queries, options.touched_tables)
+
+    check_migration_settings(migration, options.allowed_settings)
+
+    if migration.transactional:
+        # SET LOCAL semantics, the settings end with the migration's transaction
+        apply_settings(conn, migration.settings, is_local=True)
+        _migrate_transactional(conn, queries, options)
+        return
+
+    if len(migration.settings) == 0:
+        _migrate_checkpointed(conn, migration.version, direction, queries, options, between_statements)
+        return
+
+    # statements commit one by one here, so the settings are made for the session and undone afterwards
+    previous = apply_settings(conn, migration.settings, is_local=False)
+
+    if options.connect is not None:
+        # partition index builds on side connections get them too
+        options = options.replace(connect=_connect_with_settings(options.connect, migration.settings))
+
+    try:
+        _migrate_checkpointed(conn, migration.version, direction, queries, options, between_statements)
+    finally:
+        # a connection that broke mid-migration is thrown away by the caller anyway
+        with contextlib.suppress(psycopg2.Error):
+            # leaves the transaction a failed statement aborted
+            conn.rollback()
+            apply_settings(conn, previous, is_local=False)
+            conn.commit()
+
+def _run_statements_watched(conn, migration: 'Migration | StreamingMigration', direction: str, options: ExecutionOptions):
+    if options.watchdog is None or options.connect is None:
+        _run_statements_unwatched(conn, migration, direction, options)
+        return
+
+    from magistrate.watchdog import LockWatchdog
+
+    with LockWatchdog(options.watchdog, options.connect, conn.get_backend_pid()) as watchdog:
+        try:
+            _run_statements_unwatched(conn, migration, direction, options)
+        except Exception as ex:
+            if watchdog.tripped:
+                raise LockQueueExceeded(migration.version, watchdog.blocked_sessions, watchdog.blocked_seconds) from ex
+
+            raise
+
+def _run_statements(conn, migration: 'Migration | StreamingMigration', direction: str, options: ExecutionOptions):
+    if options.progress is None or options.connect is None:
+        _run_statements_watched(conn, migration, direction, options)
+        return
+
+    from magistrate.progress import ProgressReporter
+
+    with ProgressReporter(options.progress, options.connect, conn.get_backend_pid(), migration.version):
+        _run_statements_watched(conn, migration, direction, options)
+
+def migration_checksum(migration: 'Migration | StreamingMigration') -> str:
+    # the SHA-256 of the source text taken while it was parsed, streaming or not
+    if migration.checksum is not None:
+        return migration.checksum
+
+    read_checksum = getattr(migration, 'read_checksum', None)
+
+    if read_checksum is not None:
+        return read_checksum()
+
+    # migrations built in code have no source text
+    return hashlib.sha256(typing.cast('Migration', migration).model_dump_json().encode('utf-8')).hexdigest()
+
+def _notify_version_change(cur, channel: str, migration: 'Migration | StreamingMigration', direction: str, old_version: int, new_version: int):
+    payload = {
+        'old_version': old_version,
+        'new_version': new_version,
+        'migrated': migration.version,
+        'direction': direction,
+        'checksum': migration_checksum(migration),
+    }
+
+    cur.execute('SELECT pg_catalog.pg_notify(%s, %s)', (channel, json.dumps(payload)))
+
+def _clear_progress(cur, version: int, direction: str):
+    cur.execute('DELETE FROM magistrate_progress WHERE version = %s AND direction = %s', (version, direction))
+
+def migrate_up_conn(conn, migration: 'Migration | StreamingMigration', options: ExecutionOptions | None = None):
+    options = options if options is not None else ExecutionOptions()
+
+    try:
+        with conn.cursor() as cur:
+            current_version = _read_current_version(cur)
+
+        if migration.version != current_version + 1:
+            raise IncompatibleVersions(current_version, migration.version)
+
+        _run_statements(conn, migration, 'up', options)
+
         with conn.cursor() as cur:
-            try:
-                conn.autocommit = False
+            cur.execute('UPDATE magistrate_migrations SET version = %s', (migration.version,))
 
-                for query in migration.up_queries:
-                    cur.execute(query)
+            if not migration.transactional:
+                _clear_progress(cur, migration.version, 'up')
 
-                cur.execute('UPDATE magistrate_migrations SET version = %s', (migration.version,))
+            if options.notify_channel is not None:
+                _notify_version_change(cur, options.notify_channel, migration, 'up', current_version, migration.version)
 
-                conn.commit()
-            except Exception:
-                conn.rollback()
-                raise 
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
-def migrate_down(conn_string: str, migration: 'Migration'):
-    current_version = get_current_migration_version(conn_string)
+def migrate_down_conn(conn, migration: 'Migration | StreamingMigration', options: ExecutionOptions | None = None):
+    options = options if options is not None else ExecutionOptions()
+
+    try:
+        with conn.cursor() as cur:
+            current_version = _read_current_version(cur)
+
+        if migration.version != current_version:
+            raise IncompatibleVersions(current_version, migration.version)
+
+        _run_statements(conn, migration, 'down', options)
+
+        with conn.cursor() as cur:
+            cur.execute('UPDATE magistrate_migrations SET version = %s', (migration.version - 1,))
+
+            if not migration.transactional:
+                _clear_progress(cur, migration.version, 'down')
+
+            if options.notify_channel is not None:
+                _notify_version_change(cur, options.notify_channel, migration, 'down', current_version, migration.version - 1)
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+_create_applied_query = '''CREATE TABLE IF NOT EXISTS magistrate_applied (
+    version INTEGER PRIMARY KEY
+)'''
+
+def prepare_applied_table_conn(conn):
+    with conn.cursor() as cur:
+        cur.execute(_create_applied_query)
+
+    conn.commit()
+
+def get_applied_versions_conn(conn) -> set[int]:
+    # versions applied out of order by a dependency-graph run, above the contiguous magistrate_migrations version
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('magistrate_applied') IS NOT NULL")
+
+        if not cur.fetchone()[0]:
+            return set()
+
+        cur.execute('SELECT version FROM magistrate_applied')
+        return {row[0] for row in cur.fetchall()}
+
+def _check_not_applied(cur, version: int, *, lock: bool):
+    cur.execute('SELECT version FROM magistrate_migrations' + (' FOR UPDATE' if lock else ''))
+    current_version = cur.fetchone()[0]
+
+    cur.execute('SELECT 1 FROM magistrate_applied WHERE version = %s', (version,))
+
+    if version <= current_version or cur.fetchone() is not None:
+        raise IncompatibleVersions(current_version, version)
+
+    return current_version
+
+def _record_applied(cur, version: int) -> tuple[int, int]:
+    current_version = _check_not_applied(cur, version, lock=True)
+
+    cur.execute('INSERT INTO magistrate_applied (version) VALUES (%s)', (version,))
+    cur.execute('SELECT version FROM magistrate_applied WHERE version > %s ORDER BY version', (current_version,))
+
+    new_version = current_version
+
+    for (applied_version,) in cur.fetchall():
+        if applied_version != new_version + 1:
+            break
+
+        new_version = applied_version
+
+    cur.execute('UPDATE magistrate_migrations SET version = %s', (new_version,))
+    cur.execute('DELETE FROM magistrate_applied WHERE version <= %s', (new_version,))
+
+    return current_version, new_version
+
+def migrate_graph_conn(conn, migration: 'Migration | StreamingMigration', options: ExecutionOptions | None = None):
+    options = options if options is not None else ExecutionOptions()
+
+    try:
+        with conn.cursor() as cur:
+            _check_not_applied(cur, migration.version, lock=False)
+
+        _run_statements(conn, migration, 'up', options)
 
-    if migration.version != current_version:
-        raise IncompatibleVersions(current_version, migration.version)
-    
-    with psycopg2.connect(conn_string) as conn:
         with conn.cursor() as cur:
-            try:
-                conn.autocommit = False
+            # the row lock serializes the bookkeeping of migrations finishing concurrently
+            old_version, new_version = _record_applied(cur, migration.version)
+
+            if not migration.transactional:
+                _clear_progress(cur, migration.version, 'up')
+
+            # the contiguous version may not move when a migration finishes ahead of its predecessors
+            if options.notify_channel is not None:
+                _notify_version_change(cur, options.notify_channel, migration, 'up', old_version, new_version)
 
-                for query in migration.down_queries:
-                    cur.execute(query)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
-                cur.execute('UPDATE magistrate_migrations SET version = %s', (migration.version - 1,))
+def migrate_up(conn_string: str, migration: 'Migration | StreamingMigration', *, resume: bool = False):
+    with contextlib.closing(psycopg2.connect(conn_string)) as conn:
+        migrate_up_conn(conn, migration, ExecutionOptions.for_connection_string(conn_string, resume=resume))
 
-                conn.commit()
-            except Exception:
-                conn.rollback()
-                raise 
\ No newline at end of file
+def migrate_down(conn_string: str, migration: 'Migration | StreamingMigration', *, resume: bool = False):
+    with contextlib.closing(psycopg2.connect(conn_string)) as conn:
+        migrate_down_conn(conn, migration, ExecutionOptions.for_connection_string(conn_string, resume=resume))
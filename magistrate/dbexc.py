@@ -77,3 +77,180 @@ class MigrationFailed(DBError):
     
     def __str__(self):
         return f'Migration failed. Migration began at {self.version_begin} with target version {self.version_target}. Migration failed at {self.version_failed}. Database state left at version {self.version_end}'
+
+    @classmethod
+    def from_cause(cls, begin: int, failed: int, target: int, end: int, cause: BaseException) -> 'MigrationFailed':
+        if isinstance(cause, LockQueueExceeded):
+            return MigrationBlockedTraffic(begin, failed, target, end, cause.blocked_sessions, cause.blocked_seconds)
+
+        return cls(begin, failed, target, end)
+
+class LockQueueExceeded(DBError):
+    def __init__(self, version: int, blocked_sessions: int, blocked_seconds: float):
+        self.version: int = version
+        self.blocked_sessions: int = blocked_sessions
+        self.blocked_seconds: float = blocked_seconds
+
+    def __repr__(self):
+        return f'LockQueueExceeded({self.version}, {self.blocked_sessions}, {self.blocked_seconds})'
+    
+    def __str__(self):
+        return f'Migration {self.version} was cancelled after blocking {self.blocked_sessions} sessions for up to {self.blocked_seconds:.1f}s'
+
+class MigrationBlockedTraffic(MigrationFailed):
+    def __init__(self, begin: int, failed: int, target: int, end: int, blocked_sessions: int, blocked_seconds: float):
+        super().__init__(begin, failed, target, end)
+        self.blocked_sessions: int = blocked_sessions
+        self.blocked_seconds: float = blocked_seconds
+
+    def __repr__(self):
+        return f'MigrationBlockedTraffic({self.version_begin}, {self.version_failed}, {self.version_target}, {self.version_end}, {self.blocked_sessions}, {self.blocked_seconds})'
+    
+    def __str__(self):
+        return f'{super().__str__()}. The lock watchdog cancelled version {self.version_failed} after it blocked {self.blocked_sessions} sessions for up to {self.blocked_seconds:.1f}s'
+
+class SchemaNotFound(DBError):
+    def __init__(self, schema: str):
+        self.schema: str = schema
+
+    def __repr__(self):
+        return f'SchemaNotFound({repr(self.schema)})'
+    
+    def __str__(self):
+        return f'Schema {self.schema} does not exist'
+
+class MultiSchemaMigrationFailed(DBError):
+    def __init__(self, versions: dict[str, int], failures: dict[str, Exception]):
+        self.versions: dict[str, int] = versions
+        self.failures: dict[str, Exception] = failures
+
+    def __repr__(self):
+        return f'MultiSchemaMigrationFailed({repr(self.versions)}, {repr(self.failures)})'
+    
+    def __str__(self):
+        failed = ', '.join(sorted(self.failures.keys()))
+        return f'Migration failed in {len(self.failures)} of {len(self.versions) + len(self.failures)} schemas: {failed}'
+
+class ReplicationLagTimeout(DBError):
+    def __init__(self, lag_seconds: float, waited_seconds: float):
+        self.lag_seconds: float = lag_seconds
+        self.waited_seconds: float = waited_seconds
+
+    def __repr__(self):
+        return f'ReplicationLagTimeout({self.lag_seconds}, {self.waited_seconds})'
+    
+    def __str__(self):
+        return f'Replication lag was still {self.lag_seconds:.1f}s after waiting {self.waited_seconds:.1f}s for replicas to catch up'
+
+class PartialMigrationFound(DBError):
+    def __init__(self, version: int, direction: str, completed: int):
+        self.version: int = version
+        self.direction: str = direction
+        self.completed_statements: int = completed
+
+    def __repr__(self):
+        return f'PartialMigrationFound({self.version}, {repr(self.direction)}, {self.completed_statements})'
+    
+    def __str__(self):
+        return f'Migration {self.version} ({self.direction}) already completed {self.completed_statements} statements in an earlier run - resume it or clear magistrate_progress'
+
+class CheckpointMismatch(DBError):
+    def __init__(self, version: int, direction: str, statement_index: int):
+        self.version: int = version
+        self.direction: str = direction
+        self.statement_index: int = statement_index
+
+    def __repr__(self):
+        return f'CheckpointMismatch({self.version}, {repr(self.direction)}, {self.statement_index})'
+    
+    def __str__(self):
+        return f'Statement {self.statement_index} of migration {self.version} ({self.direction}) does not match the statement recorded by the earlier run, refusing to resume'
+
+class InvalidIndexFound(DBError):
+    def __init__(self, index: str, building: bool):
+        self.index: str = index
+        self.building: bool = building
+
+    def __repr__(self):
+        return f'InvalidIndexFound({repr(self.index)}, {self.building})'
+
+    def __str__(self):
+        if self.building:
+            return f'Index {self.index} is still being built by another session, refusing to drop it'
+
+        return f'An INVALID index {self.index} already exists - resume the migration to rebuild it, or drop it by hand'
+
+class OutOfOrderVersionsApplied(DBError):
+    def __init__(self, current: int, applied: list[int]):
+        self.current_version: int = current
+        self.applied_versions: list[int] = applied
+
+    def __repr__(self):
+        return f'OutOfOrderVersionsApplied({self.current_version}, {repr(self.applied_versions)})'
+    
+    def __str__(self):
+        return f'Versions {repr(self.applied_versions)} were applied ahead of current version {self.current_version} - finish the upgrade before downgrading'
+
+
+class DowngradeSchemaMismatch(DBError):
+    def __init__(self, version: int, changes: list[str]):
+        self.version: int = version
+        self.changes: list[str] = changes
+
+    def __repr__(self):
+        return f'DowngradeSchemaMismatch({self.version}, {repr(self.changes)})'
+    
+    def __str__(self):
+        return f'Downgrading version {self.version} did not restore the schema it was applied to: ' + '; '.join(self.changes)
+
+class RepeatableMigrationFailed(DBError):
+    def __init__(self, name: str):
+        self.name: str = name
+
+    def __repr__(self):
+        return f'RepeatableMigrationFailed({repr(self.name)})'
+    
+    def __str__(self):
+        return f'Repeatable migration {self.name} failed, no repeatable migrations were applied'
+
+class MaintenanceFailed(DBError):
+    def __init__(self, version: int, table: str):
+        self.version: int = version
+        self.table: str = table
+
+    def __repr__(self):
+        return f'MaintenanceFailed({self.version}, {repr(self.table)})'
+    
+    def __str__(self):
+        return f'Migrated to version {self.version}, but analyzing or vacuuming {self.table} afterwards failed'
+
+class DryRunNotTransactional(DBError):
+    def __init__(self, version: int):
+        self.version: int = version
+
+    def __repr__(self):
+        return f'DryRunNotTransactional({self.version})'
+    
+    def __str__(self):
+        return f'Migration {self.version} is not transactional and cannot be applied in a rolled-back dry run, check its plans on a staging copy instead'
+
+class PreflightRejected(DBError):
+    def __init__(self, rejections: list[str]):
+        self.rejections: list[str] = rejections
+
+    def __repr__(self):
+        return f'PreflightRejected({repr(self.rejections)})'
+    
+    def __str__(self):
+        return 'Refusing to migrate: ' + '; '.join(self.rejections)
+
+class SettingNotAllowed(DBError):
+    def __init__(self, version: int, setting: str):
+        self.version: int = version
+        self.setting: str = setting
+
+    def __repr__(self):
+        return f'SettingNotAllowed({self.version}, {repr(self.setting)})'
+    
+    def __str__(self):
+        return f'Migration {self.version} sets {self.setting}, which is not in the allowed settings'
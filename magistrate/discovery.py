@@ -1,18 +1,31 @@
 import os
+import re
 
-from magistrate.exc import DuplicateMigrationVersions, InvalidMigrationFile, InvalidMigrationVersion, MissingMigrationVersion, MissingMigrationVersions
+from magistrate.exc import DuplicateMigrationVersions, FilenameVersionMismatch, InvalidMigrationFile, InvalidMigrationVersion, MissingMigrationVersion, MissingMigrationVersions
+from magistrate.fileio import is_migration_file, open_text
 from magistrate.parser import parse_migration_version
 
 
-def discover_migrations(folder: str) -> list[tuple[int, str]]:
+_filename_version_pattern = re.compile(r'^0*([0-9]+)(?:_.*)?\.mig\.sql(?:\.\w+)?$')
+
+def parse_filename_version(filename: str) -> int:
+    version_match = _filename_version_pattern.search(os.path.basename(filename))
+
+    if not version_match:
+        raise InvalidMigrationFile(filename, 'file name must start with its version, e.g. "000123_add_users.mig.sql"')
+
+    return int(version_match.group(1))
+
+def _discover_by_header(folder: str) -> dict[int, list[str]]:
     filenames = [os.path.join(folder, x) for x in os.listdir(folder)]
     filenames = [os.path.abspath(x) for x in filenames]
-    filenames = [x for x in filenames if x.endswith('.mig.sql')]
+    filenames = [x for x in filenames if is_migration_file(x)]
 
     migrations: dict[int, list[str]] = {}
 
     for filename in filenames:
-        with open(filename, 'r') as f:
+        # compressed files are only inflated up to the end of the first line
+        with open_text(filename) as f:
             version_line = f.readline().strip()
 
             try:
@@ -26,6 +39,32 @@ def discover_migrations(folder: str) -> list[tuple[int, str]]:
             else:
                 migrations[version] = [filename]
 
+    return migrations
+
+def _discover_by_filename(folder: str) -> dict[int, list[str]]:
+    # a single directory listing, no file is opened until it is selected
+    migrations: dict[int, list[str]] = {}
+    folder = os.path.abspath(folder)
+
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not is_migration_file(entry.name):
+                continue
+
+            filename = os.path.join(folder, entry.name)
+            migrations.setdefault(parse_filename_version(filename), []).append(filename)
+
+    for fnames in migrations.values():
+        fnames.sort()
+
+    return migrations
+
+def discover_migrations(folder: str, *, filename_versions: bool = False) -> list[tuple[int, str]]:
+    migrations = _discover_by_filename(folder) if filename_versions else _discover_by_header(folder)
+
+    return sort_discovered_migrations(migrations)
+
+def sort_discovered_migrations(migrations: dict[int, list[str]]) -> list[tuple[int, str]]:
     for ver, fnames in migrations.items():
         if len(fnames) > 1:
             raise DuplicateMigrationVersions(ver, fnames)
@@ -58,3 +97,26 @@ def discover_migrations(folder: str) -> list[tuple[int, str]]:
         return []
     
     return sorted_result
+
+def discover_repeatable_migrations(folder: str) -> list[tuple[str, str]]:
+    filenames = sorted(x for x in os.listdir(folder) if x.endswith('.rep.sql'))
+
+    return [(x[:-len('.rep.sql')], os.path.abspath(os.path.join(folder, x))) for x in filenames]
+
+def verify_migrations(folder: str) -> list[tuple[int, str]]:
+    # opens every file, for CI checks of directories discovered by file name only
+    migrations = discover_migrations(folder, filename_versions=True)
+
+    for version, filename in migrations:
+        with open_text(filename) as f:
+            version_line = f.readline().strip()
+
+        try:
+            header_version = parse_migration_version(version_line)
+        except InvalidMigrationVersion as ex:
+            raise InvalidMigrationFile(filename, str(ex)) from ex
+
+        if header_version != version:
+            raise FilenameVersionMismatch(filename, version, header_version)
+
+    return migrations
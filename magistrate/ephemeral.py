@@ -0,0 +1,96 @@
+import contextlib
+import os
+import shutil
+import subprocess
+import tempfile
+import typing
+
+from magistrate.exc import PostgresBinaryError, PostgresBinaryNotFound
+
+# a throwaway cluster never needs to survive a crash, so every durability guarantee is turned off
+_ephemeral_settings: dict[str, str] = {
+    'fsync': 'off',
+    'synchronous_commit': 'off',
+    'full_page_writes': 'off',
+    'wal_level': 'minimal',
+    'max_wal_senders': '0',
+    'archive_mode': 'off',
+    'autovacuum': 'off',
+    'listen_addresses': '',
+}
+
+_ephemeral_user = 'magistrate'
+_ephemeral_port = 5432
+
+def _pg_config_bindir() -> str | None:
+    pg_config = shutil.which('pg_config')
+
+    if pg_config is None:
+        return None
+
+    try:
+        result = subprocess.run([pg_config, '--bindir'], capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError:
+        return None
+
+    return result.stdout.strip()
+
+def find_postgres_binary(name: str, bin_dir: str | None = None) -> str:
+    candidates = [bin_dir] if bin_dir is not None else [None, _pg_config_bindir()]
+
+    for candidate in candidates:
+        path = shutil.which(name, path=candidate)
+
+        if path is not None:
+            return path
+
+    raise PostgresBinaryNotFound(name, bin_dir if bin_dir is not None else os.environ.get('PATH', ''))
+
+def _run(binary: str, args: list[str]):
+    try:
+        subprocess.run([binary, *args], capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise PostgresBinaryError(os.path.basename(binary), e.returncode, str(e.stderr)) from e
+
+def _default_parent_directory() -> str | None:
+    # tmpfs keeps the whole cluster in memory
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+
+    return None
+
+@contextlib.contextmanager
+def ephemeral_cluster(*, bin_dir: str | None = None, parent_directory: str | None = None, settings: dict[str, str] | None = None) -> typing.Iterator[str]:
+    initdb = find_postgres_binary('initdb', bin_dir)
+    pg_ctl = find_postgres_binary('pg_ctl', bin_dir)
+
+    parent_directory = parent_directory if parent_directory is not None else _default_parent_directory()
+    base = tempfile.mkdtemp(prefix='magistrate_', dir=parent_directory)
+    data_directory = os.path.join(base, 'data')
+
+    options = {**_ephemeral_settings, **(settings or {}), 'unix_socket_directories': base, 'port': str(_ephemeral_port)}
+
+    try:
+        _run(initdb, ['-D', data_directory, '-U', _ephemeral_user, '--auth=trust', '--encoding=UTF8', '--no-sync'])
+
+        _run(pg_ctl, [
+            '-D', data_directory,
+            '-l', os.path.join(base, 'postgres.log'),
+            '-o', ' '.join(f"-c {key}='{value}'" for key, value in options.items()),
+            '-w', 'start'
+        ])
+
+        stop_args = ['-D', data_directory, '-m', 'immediate', '-w', 'stop']
+
+        try:
+            yield f'host={base} port={_ephemeral_port} user={_ephemeral_user} dbname=postgres'
+        except BaseException:
+            # the cluster is thrown away anyway, a failing stop must not hide the error raised inside the block
+            with contextlib.suppress(PostgresBinaryError):
+                _run(pg_ctl, stop_args)
+
+            raise
+
+        _run(pg_ctl, stop_args)
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
@@ -68,6 +68,118 @@ class ManualCommitDisabled(MigrationError):
     def __str__(self):
         return f'Migrations must not use the COMMIT statement themselves'
 
+class DuplicateHeader(MigrationError):
+    def __init__(self, header: str):
+        self.header: str = header
+
+    def __repr__(self):
+        return f'DuplicateHeader({repr(self.header)})'
+    
+    def __str__(self):
+        return f'Header "{self.header}" was declared more than once'
+
+class InvalidDependencyHeader(MigrationError):
+    def __init__(self, line: str):
+        self.line: str = line
+
+    def __repr__(self):
+        return f'InvalidDependencyHeader({repr(self.line)})'
+    
+    def __str__(self):
+        return f'Invalid dependency header - "{self.line}" - Format is "-- depends: 41, 43"'
+
+class InvalidDependency(MigrationError):
+    def __init__(self, version: int, dependency: int):
+        self.version: int = version
+        self.dependency: int = dependency
+
+    def __repr__(self):
+        return f'InvalidDependency({self.version}, {self.dependency})'
+    
+    def __str__(self):
+        return f'Migration {self.version} cannot depend on version {self.dependency} - dependencies must be known versions lower than the migration itself'
+
+class InvalidCopyDirective(MigrationError):
+    def __init__(self, line: str):
+        self.line: str = line
+
+    def __repr__(self):
+        return f'InvalidCopyDirective({repr(self.line)})'
+    
+    def __str__(self):
+        return f'Invalid copy directive - "{self.line}" - Format is "-- copy: table(col1, col2) [from data.tsv] [text|csv]"'
+
+class InvalidSetDirective(MigrationError):
+    def __init__(self, line: str):
+        self.line: str = line
+
+    def __repr__(self):
+        return f'InvalidSetDirective({repr(self.line)})'
+    
+    def __str__(self):
+        return f'Invalid set directive - "{self.line}" - Format is "-- set: name=value"'
+
+class UnterminatedCopyData(MigrationError):
+    def __init__(self, table: str):
+        self.table: str = table
+
+    def __repr__(self):
+        return f'UnterminatedCopyData({repr(self.table)})'
+    
+    def __str__(self):
+        return f'Inline copy data for table {self.table} was not terminated with a "\\." line'
+
+class InvalidPartitionedIndexDirective(MigrationError):
+    def __init__(self, line: str):
+        self.line: str = line
+
+    def __repr__(self):
+        return f'InvalidPartitionedIndexDirective({repr(self.line)})'
+    
+    def __str__(self):
+        return f'Invalid partitioned index directive - "{self.line}" - Format is "-- partitioned_index: [UNIQUE] index_name ON table [USING method] (col1, col2) [INCLUDE (...)] [NULLS [NOT] DISTINCT] [WITH (...)] [TABLESPACE name] [WHERE predicate]"'
+
+class DirectiveRequiresNonTransactional(MigrationError):
+    def __init__(self, directive: str):
+        self.directive: str = directive
+
+    def __repr__(self):
+        return f'DirectiveRequiresNonTransactional({repr(self.directive)})'
+    
+    def __str__(self):
+        return f'The "{self.directive}" directive can only be used in migrations declaring "-- transactional: false"'
+
+class InvalidRepeatableDependencyHeader(MigrationError):
+    def __init__(self, line: str):
+        self.line: str = line
+
+    def __repr__(self):
+        return f'InvalidRepeatableDependencyHeader({repr(self.line)})'
+    
+    def __str__(self):
+        return f'Invalid repeatable dependency header - "{self.line}" - Format is "-- depends: other_view, other_function"'
+
+class UnknownRepeatableDependency(MigrationError):
+    def __init__(self, name: str, dependency: str):
+        self.name: str = name
+        self.dependency: str = dependency
+
+    def __repr__(self):
+        return f'UnknownRepeatableDependency({repr(self.name)}, {repr(self.dependency)})'
+    
+    def __str__(self):
+        return f'Repeatable migration {self.name} depends on unknown repeatable migration {self.dependency}'
+
+class RepeatableDependencyCycle(MigrationError):
+    def __init__(self, names: list[str]):
+        self.names: list[str] = names
+
+    def __repr__(self):
+        return f'RepeatableDependencyCycle({repr(self.names)})'
+    
+    def __str__(self):
+        return f'Repeatable migrations {", ".join(self.names)} depend on each other in a cycle'
+
 class BackwardsIncompatibilityViolation(MigrationError):
     def __init__(self, message: str):
         self.message: str = message
@@ -101,6 +213,29 @@ class PGDumpError(MigrationError):
     def __str__(self):
         return f'pg_dump returned error code {self.code} - stderr: {self.stderr_str}'
     
+class PostgresBinaryNotFound(MigrationError):
+    def __init__(self, binary: str, path: str):
+        self.binary: str = binary
+        self.path: str = path
+
+    def __repr__(self):
+        return f'PostgresBinaryNotFound({repr(self.binary)}, {repr(self.path)})'
+
+    def __str__(self):
+        return f'{self.binary} executable not found in PATH or pg_config --bindir: {self.path}'
+
+class PostgresBinaryError(MigrationError):
+    def __init__(self, binary: str, code: int, stderr_str: str):
+        self.binary: str = binary
+        self.code: int = code
+        self.stderr_str: str = stderr_str
+
+    def __repr__(self):
+        return f'PostgresBinaryError({repr(self.binary)}, {self.code}, {repr(self.stderr_str)})'
+
+    def __str__(self):
+        return f'{self.binary} returned error code {self.code} - stderr: {self.stderr_str}'
+    
 # All errors involving specific files should be placed after this line
 
 class InvalidMigrationFile(MigrationError):
@@ -114,6 +249,18 @@ class InvalidMigrationFile(MigrationError):
     def __str__(self):
         return f'Invalid migration file: {self.filename}: {self.message}'
 
+class FilenameVersionMismatch(MigrationError):
+    def __init__(self, filename: str, filename_version: int, header_version: int):
+        self.filename: str = filename
+        self.filename_version: int = filename_version
+        self.header_version: int = header_version
+
+    def __repr__(self):
+        return f'FilenameVersionMismatch({repr(self.filename)}, {self.filename_version}, {self.header_version})'
+    
+    def __str__(self):
+        return f'Migration file {self.filename} is named for version {self.filename_version} but its header declares version {self.header_version}'
+
 class MissingMigrationVersion(MigrationError):
     def __init__(self, missing_version: int, known_versions: list[int]):
         self.missing_version: int = missing_version
@@ -150,3 +297,13 @@ class DuplicateMigrationVersions(MigrationError):
     def __str__(self):
         nice_filenames = [os.path.basename(fname) for fname in self.filenames]
         return f'Duplicate migration version {self.version} found in the following files: {repr(nice_filenames)}'
+
+class InvalidHotQueries(MigrationError):
+    def __init__(self, reason: str):
+        self.reason: str = reason
+
+    def __repr__(self):
+        return f'InvalidHotQueries({repr(self.reason)})'
+    
+    def __str__(self):
+        return f'Invalid hot query file - {self.reason} - Format is "-- query: name", optionally "-- params: [json array]", then one statement ending with a semicolon'
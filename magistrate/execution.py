@@ -1,11 +1,24 @@
+import contextlib
+import psycopg2
 import pydantic
 
-from magistrate.db import migrate_down, migrate_up, prepare_migration_table, get_current_migration_version
-from magistrate.dbexc import DowngradeIncompatible, CurrentVersionTooHigh, MigrationFailed, TargetBelowZero, TargetVersionTooHigh
-from magistrate.discovery import discover_migrations
-from magistrate.parser import MigrationDirection, parse_migration, Migration
+from magistrate.db import ExecutionOptions, check_migration_settings, default_allowed_settings, get_applied_versions_conn, migrate_down_conn, migrate_up_conn, prepare_applied_table_conn, prepare_migration_table_conn, get_current_migration_version_conn
+from magistrate.dbexc import DowngradeIncompatible, CurrentVersionTooHigh, MigrationFailed, OutOfOrderVersionsApplied, TargetBelowZero, TargetVersionTooHigh
+from magistrate.discovery import discover_migrations, discover_repeatable_migrations, parse_filename_version, sort_discovered_migrations
+from magistrate.exc import FilenameVersionMismatch, InvalidMigrationFile, InvalidMigrationVersion
+from magistrate.fileio import is_migration_file, open_text, open_text_stream
+from magistrate.parser import CopyData, LazyMigration, MigrationDirection, RepeatableMigration, StreamingMigration, load_migration, parse_migration, parse_migration_version, parse_repeatable_migration, Migration
 import typing
 
+if typing.TYPE_CHECKING:
+    from importlib.resources.abc import Traversable
+    from magistrate.maintenance import MaintenanceSettings
+    from magistrate.partitions import PartitionSettings
+    from magistrate.preflight import PreflightSettings
+    from magistrate.progress import ProgressSettings
+    from magistrate.throttle import ReplicationThrottle
+    from magistrate.watchdog import LockWatchdogSettings
+
 class VersionMigration(pydantic.BaseModel):
     target_version: int | typing.Literal['latest']
 
@@ -21,52 +34,267 @@ class DirectionMigration(pydantic.BaseModel):
 
 class DirectorySource(pydantic.BaseModel):
     directory: str
+    streaming: bool = False
 
-    def select_migrations(self, current_version: int, target_version: int) -> list['Migration']:
-        migration_files = discover_migrations(self.directory)
+    # take versions from names like 000123_add_users.mig.sql without opening the files
+    filename_versions: bool = False
+
+    def discover(self) -> list[tuple[int, str]]:
+        return discover_migrations(self.directory, filename_versions=self.filename_versions)
+
+    def highest_version(self) -> int:
+        migration_files = self.discover()
+
+        if len(migration_files) == 0:
+            return 0
+
+        return migration_files[-1][0]
+
+    def load_migration(self, version: int, filename: str) -> 'Migration | StreamingMigration':
+        migration: Migration | StreamingMigration
 
-        migrations: list[Migration] = []
+        if self.streaming:
+            migration = StreamingMigration(filename)
+        else:
+            with open_text(filename) as f:
+                migration = parse_migration(f)
+
+        # the header is only checked once the file is opened for execution
+        if self.filename_versions and migration.version != version:
+            raise FilenameVersionMismatch(filename, version, migration.version)
+
+        return migration
+
+    def select_migrations(self, current_version: int, target_version: int) -> list['Migration | StreamingMigration']:
+        migration_files = self.discover()
 
-        selected: list[str] = []
+        selected: list[tuple[int, str]] = []
 
         if current_version > target_version:
-            tmp = migration_files[target_version:current_version][::-1]
-            selected = [x[1] for x in tmp]
+            selected = migration_files[target_version:current_version][::-1]
         elif current_version < target_version:
-            tmp = migration_files[current_version:target_version]
-            selected = [x[1] for x in tmp]
+            selected = migration_files[current_version:target_version]
         
-        for s in selected:
-            with open(s, 'r') as f:
-                migrations.append(parse_migration(f))
+        return [self.load_migration(version, filename) for version, filename in selected]
+
+class ArchiveSource(pydantic.BaseModel):
+    # exactly one of these - a zip file, or the resources of an installed (possibly zipped) package
+    archive: str | None = None
+    package: str | None = None
+
+    # folder inside the archive or package holding the migrations
+    directory: str = ''
+
+    # with versions in the file names, the archive's central directory alone is the version index
+    filename_versions: bool = True
+
+    @pydantic.model_validator(mode='after')
+    def _validate_archive_source(self) -> 'ArchiveSource':
+        if (self.archive is None) == (self.package is None):
+            raise ValueError('Exactly one of archive and package must be set')
+
+        return self
+
+    def _root(self) -> 'Traversable':
+        root: Traversable
+
+        if self.archive is not None:
+            import zipfile
+            root = zipfile.Path(self.archive)
+        else:
+            import importlib.resources
+            root = importlib.resources.files(typing.cast(str, self.package))
+
+        for part in self.directory.strip('/').split('/'):
+            if part != '':
+                root = root.joinpath(part)
+
+        return root
+
+    def _open(self, root: 'Traversable', name: str) -> typing.TextIO:
+        # members are read straight from the archive, nothing is extracted to disk
+        return open_text_stream(root.joinpath(name).open('rb'), name, None)
+
+    def _discover(self, root: 'Traversable') -> list[tuple[int, str]]:
+        migrations: dict[int, list[str]] = {}
+
+        for entry in root.iterdir():
+            if not is_migration_file(entry.name):
+                continue
+
+            if self.filename_versions:
+                version = parse_filename_version(entry.name)
+            else:
+                with self._open(root, entry.name) as f:
+                    try:
+                        version = parse_migration_version(f.readline())
+                    except InvalidMigrationVersion as ex:
+                        raise InvalidMigrationFile(entry.name, str(ex)) from ex
+
+            migrations.setdefault(version, []).append(entry.name)
+
+        for names in migrations.values():
+            names.sort()
+
+        return sort_discovered_migrations(migrations)
+
+    def highest_version(self) -> int:
+        migration_files = self._discover(self._root())
+
+        if len(migration_files) == 0:
+            return 0
+
+        return migration_files[-1][0]
+
+    def _load_migration(self, root: 'Traversable', version: int, name: str) -> Migration:
+        with self._open(root, name) as f:
+            migration = parse_migration(f)
+
+        if self.filename_versions and migration.version != version:
+            raise FilenameVersionMismatch(name, version, migration.version)
+
+        for query in (*migration.up_queries, *migration.down_queries):
+            if isinstance(query, CopyData) and query.filename is not None:
+                raise InvalidMigrationFile(name, '"-- copy: ... from" data files are not supported in archives, inline the rows instead')
+
+        return migration
+
+    def select_migrations(self, current_version: int, target_version: int) -> list['Migration']:
+        root = self._root()
+        migration_files = self._discover(root)
+
+        selected: list[tuple[int, str]] = []
+
+        if current_version > target_version:
+            selected = migration_files[target_version:current_version][::-1]
+        elif current_version < target_version:
+            selected = migration_files[current_version:target_version]
+
+        return [self._load_migration(root, version, name) for version, name in selected]
+
+class RepeatableSource(pydantic.BaseModel):
+    directory: str
+
+    def load_migrations(self) -> list[RepeatableMigration]:
+        migrations: list[RepeatableMigration] = []
+
+        for name, filename in discover_repeatable_migrations(self.directory):
+            with open(filename, 'r') as f:
+                migrations.append(parse_repeatable_migration(name, f.read()))
 
         return migrations
 
 class HardcodedSource(pydantic.BaseModel):
-    migrations: list[Migration]
+    model_config = pydantic.ConfigDict(arbitrary_types_allowed=True)
+
+    migrations: list[Migration | LazyMigration]
 
     @pydantic.model_validator(mode='after')
     def _auto_sort_migrations(self):
         self.migrations.sort(key=lambda mig: mig.version)
         return self
+
+    @classmethod
+    def trusted(cls, migrations: list[Migration | LazyMigration]) -> 'HardcodedSource':
+        # skips pydantic validation entirely - only use for migrations built by your own code
+        if any(migrations[i].version > migrations[i + 1].version for i in range(len(migrations) - 1)):
+            migrations = sorted(migrations, key=lambda mig: mig.version)
+
+        return cls.model_construct(migrations=migrations)
+
+    def highest_version(self) -> int:
+        if len(self.migrations) == 0:
+            return 0
+
+        return self.migrations[-1].version
     
     def select_migrations(self, current_version: int, target_version: int) -> list['Migration']:
+        selected: list[Migration | LazyMigration] = []
+
         if current_version > target_version:
-            return self.migrations[target_version:current_version][::-1]
+            selected = self.migrations[target_version:current_version][::-1]
         elif current_version < target_version:
-            return self.migrations[current_version:target_version]
+            selected = self.migrations[current_version:target_version]
         
-        return []
+        return [load_migration(mig) for mig in selected]
+
+def _feature_settings() -> dict[str, typing.Any]:
+    # the feature modules are only imported once parameters are built, so 'import magistrate.execution' stays light
+    from magistrate.maintenance import MaintenanceSettings
+    from magistrate.partitions import PartitionSettings
+    from magistrate.preflight import PreflightSettings
+    from magistrate.progress import ProgressSettings
+    from magistrate.throttle import ReplicationThrottle
+    from magistrate.watchdog import LockWatchdogSettings
+
+    return {
+        'MaintenanceSettings': MaintenanceSettings,
+        'PartitionSettings': PartitionSettings,
+        'PreflightSettings': PreflightSettings,
+        'ProgressSettings': ProgressSettings,
+        'ReplicationThrottle': ReplicationThrottle,
+        'LockWatchdogSettings': LockWatchdogSettings,
+    }
+
+def _default_partition_settings() -> 'PartitionSettings':
+    from magistrate.partitions import PartitionSettings
+
+    return PartitionSettings()
 
 class MigrationParameters(pydantic.BaseModel):
     connection_string: str
 
-    migration_source: DirectorySource | HardcodedSource
+    migration_source: DirectorySource | HardcodedSource | ArchiveSource
     migration_type: VersionMigration | DirectionMigration
 
+    # re-applied after the versioned migrations whenever their checksum changes
+    repeatable_source: RepeatableSource | None = None
+
     backup_directory: str | None = None
 
-def _execute_migration_list(params: MigrationParameters, current_version: int, target_version: int, parsed_migrations: list['Migration']) -> int:
+    throttle: 'ReplicationThrottle | None' = None
+
+    # continue non-transactional migrations from their first unfinished statement
+    resume: bool = False
+
+    partitions: 'PartitionSettings' = pydantic.Field(default_factory=_default_partition_settings)
+
+    # cancels a migration statement that holds up too many application queries
+    watchdog: 'LockWatchdogSettings | None' = None
+
+    # ANALYZE the tables the applied versions touched, and VACUUM those left with many dead tuples
+    maintenance: 'MaintenanceSettings | None' = None
+
+    # session settings '-- set:' directives may change, defaults to magistrate.db.default_allowed_settings
+    allowed_settings: set[str] | None = None
+
+    # NOTIFY this channel with old and new version and a checksum whenever a version commits
+    notify_channel: str | None = None
+
+    # reports phase, percent and ETA of index builds, rewrites and copies while they run
+    progress: 'ProgressSettings | None' = None
+
+    # estimates every pending statement first, and refuses to start past its time or disk budget
+    preflight: 'PreflightSettings | None' = None
+
+    # above 1, upgrades run as a dependency graph with independent versions on separate connections
+    workers: int = 1
+
+    def __init__(self, **data: typing.Any):
+        if not MigrationParameters.__pydantic_complete__:
+            MigrationParameters.model_rebuild(_types_namespace=_feature_settings())
+
+        super().__init__(**data)
+
+    @pydantic.model_validator(mode='after')
+    def _validate_migration_parameters(self) -> 'MigrationParameters':
+        if self.workers < 1:
+            raise ValueError('At least one worker is required')
+        
+        return self
+
+def execute_migration_list(conn, current_version: int, target_version: int, parsed_migrations: list['Migration | StreamingMigration'], options: ExecutionOptions | None = None) -> int:
+    options = options if options is not None else ExecutionOptions()
     living_db_version: int = current_version
 
     if target_version < current_version:
@@ -75,83 +303,106 @@ def _execute_migration_list(params: MigrationParameters, current_version: int, t
             if not mig.backwards_compatible:
                 raise DowngradeIncompatible(current_version, mig.version, target_version)
         
-        for mig in parsed_migrations:
+        for i, mig in enumerate(parsed_migrations):
             try:
-                migrate_down(params.connection_string, mig)
+                if i > 0 and options.pause is not None:
+                    options.pause()
+
+                migrate_down_conn(conn, mig, options)
             except Exception as ex:
-                raise MigrationFailed(current_version, mig.version, target_version, living_db_version) from ex
+                raise MigrationFailed.from_cause(current_version, mig.version, target_version, living_db_version, ex) from ex
             
             living_db_version = mig.version - 1
     else:
-        for mig in parsed_migrations:
+        for i, mig in enumerate(parsed_migrations):
             try:
-                migrate_up(params.connection_string, mig)
+                if i > 0 and options.pause is not None:
+                    options.pause()
+
+                migrate_up_conn(conn, mig, options)
             except Exception as ex:
-                raise MigrationFailed(current_version, mig.version, target_version, living_db_version) from ex
+                raise MigrationFailed.from_cause(current_version, mig.version, target_version, living_db_version, ex) from ex
 
             living_db_version = mig.version
 
     return living_db_version
 
-def _execute_target_migration(params: MigrationParameters, current_version: int, target_version: int) -> int:
+def _execution_options(params: MigrationParameters, touched_tables: set[str] | None = None) -> ExecutionOptions:
+    pause: typing.Callable[[], None] | None = None
+
+    if params.throttle is not None:
+        throttle = params.throttle
+        pause = lambda: throttle.wait(params.connection_string)
+
+    return ExecutionOptions.for_connection_string(
+        params.connection_string,
+        resume=params.resume,
+        pause=pause,
+        partitions=params.partitions,
+        watchdog=params.watchdog,
+        touched_tables=touched_tables,
+        progress=params.progress,
+        allowed_settings=params.allowed_settings if params.allowed_settings is not None else default_allowed_settings,
+        notify_channel=params.notify_channel
+    )
+
+def _execute_target_migration(params: MigrationParameters, conn, current_version: int, target_version: int, touched_tables: set[str] | None = None) -> int:
     migrations = params.migration_source.select_migrations(current_version, target_version)
 
     if len(migrations) == 0:
         return current_version
     
-    _execute_migration_list(params, current_version, target_version, migrations)
+    options = _execution_options(params, touched_tables)
 
-    new_current_version = get_current_migration_version(params.connection_string)
+    # refuse before anything is applied rather than failing halfway through the range
+    for mig in migrations:
+        check_migration_settings(mig, options.allowed_settings)
 
-    return new_current_version
-    
-def _execute_version_migration(params: MigrationParameters, migration_type: VersionMigration, current_version: int, highest_version: int) -> int:
-    target_version: int = -1
+    applied = get_applied_versions_conn(conn)
 
-    if migration_type.target_version == 'latest':
-        target_version = highest_version
-    else:
-        target_version = typing.cast(int, migration_type.target_version)
+    if len(applied) > 0 and target_version < current_version:
+        raise OutOfOrderVersionsApplied(current_version, sorted(applied))
 
-    if target_version == current_version:
-        return current_version
+    if params.preflight is not None:
+        from magistrate.preflight import check_preflight_conn
 
-    return _execute_target_migration(params, current_version, target_version)
+        pending = [mig for mig in migrations if mig.version not in applied]
+        check_preflight_conn(conn, pending, 'down' if target_version < current_version else 'up', params.preflight)
 
-def execute_migration(params: MigrationParameters) -> int:
-    prepare_migration_table(params.connection_string)
-    current_version = get_current_migration_version(params.connection_string)
+    if target_version > current_version and (params.workers > 1 or len(applied) > 0):
+        from magistrate.graph import execute_migration_graph
 
-    if isinstance(params.migration_source, DirectorySource):
-        dsrc = typing.cast(DirectorySource, params.migration_source)
-        migrations = discover_migrations(dsrc.directory)
+        prepare_applied_table_conn(conn)
 
-        if len(migrations) == 0:
-            return current_version
-    
-        highest_version = migrations[-1][0]
-    elif isinstance(params.migration_source, HardcodedSource):
-        hsrc = typing.cast(HardcodedSource, params.migration_source)
+        pending = [mig for mig in migrations if mig.version not in applied]
 
-        if len(hsrc.migrations) == 0:
-            return current_version
-        
-        highest_version = hsrc.migrations[-1].version
-    else:
-        return current_version
+        return execute_migration_graph(
+            params.connection_string, current_version, target_version, pending, applied,
+            workers=params.workers, options=options
+        )
+
+    execute_migration_list(conn, current_version, target_version, migrations, options)
+
+    new_current_version = get_current_migration_version_conn(conn)
+
+    return new_current_version
 
+def resolve_target_version(migration_type: VersionMigration | DirectionMigration, current_version: int, highest_version: int) -> int:
     if current_version > highest_version:
         raise CurrentVersionTooHigh(current_version, highest_version)
-    
-    if isinstance(params.migration_type, VersionMigration):
-        if params.migration_type.target_version != 'latest' and params.migration_type.target_version > highest_version:
-            raise TargetVersionTooHigh(params.migration_type.target_version, highest_version)
+
+    if isinstance(migration_type, VersionMigration):
+        if migration_type.target_version == 'latest':
+            return highest_version
+
+        if migration_type.target_version > highest_version:
+            raise TargetVersionTooHigh(migration_type.target_version, highest_version)
         
-        return _execute_version_migration(params, typing.cast(VersionMigration, params.migration_type), current_version, highest_version)
-    elif isinstance(params.migration_type, DirectionMigration):
-        if params.migration_type.direction == MigrationDirection.up:
+        return typing.cast(int, migration_type.target_version)
+    elif isinstance(migration_type, DirectionMigration):
+        if migration_type.direction == MigrationDirection.up:
             target_version = current_version + 1
-        elif params.migration_type == MigrationDirection.down:
+        elif migration_type.direction == MigrationDirection.down:
             target_version = current_version - 1
         else:
             return current_version
@@ -162,7 +413,46 @@ def execute_migration(params: MigrationParameters) -> int:
         if target_version > highest_version:
             raise TargetVersionTooHigh(target_version, highest_version)
 
-        return _execute_target_migration(params, current_version, target_version)
+        return target_version
     
     return current_version
-    
\ No newline at end of file
+
+def _execute_versioned_migration(params: MigrationParameters, conn, current_version: int, touched_tables: set[str] | None = None) -> int:
+    highest_version = params.migration_source.highest_version()
+
+    if highest_version == 0:
+        return current_version
+
+    target_version = resolve_target_version(params.migration_type, current_version, highest_version)
+
+    if target_version == current_version:
+        return current_version
+
+    return _execute_target_migration(params, conn, current_version, target_version, touched_tables)
+
+def execute_migration(params: MigrationParameters) -> int:
+    with contextlib.closing(psycopg2.connect(params.connection_string)) as conn:
+        prepare_migration_table_conn(conn)
+        current_version = get_current_migration_version_conn(conn)
+
+        touched_tables: set[str] | None = None
+        dead_tuples: dict[int, int] = {}
+
+        if params.maintenance is not None:
+            from magistrate.maintenance import read_dead_tuples_conn, run_maintenance_conn
+
+            touched_tables = set()
+            dead_tuples = read_dead_tuples_conn(conn)
+
+        new_version = _execute_versioned_migration(params, conn, current_version, touched_tables)
+
+        if params.maintenance is not None and touched_tables:
+            run_maintenance_conn(conn, params.maintenance, new_version, touched_tables, dead_tuples)
+
+        # objects defined for newer versions may not fit the schema after a downgrade
+        if params.repeatable_source is not None and new_version >= current_version:
+            from magistrate.repeatable import apply_repeatable_migrations_conn
+
+            apply_repeatable_migrations_conn(conn, params.repeatable_source.load_migrations())
+
+        return new_version
@@ -0,0 +1,62 @@
+import io
+import os
+import typing
+
+# extension -> module providing a streaming open(), imported only when such a file is read
+_compressed_extensions: dict[str, str] = {
+    '.gz': 'gzip',
+    '.xz': 'lzma',
+    '.lzma': 'lzma',
+    '.bz2': 'bz2',
+}
+
+migration_suffixes: tuple[str, ...] = ('.mig.sql', *(f'.mig.sql{ext}' for ext in _compressed_extensions))
+
+class _NamedTextFile(io.TextIOWrapper):
+    # lzma and bz2 files carry no name, but '-- copy: ... from file' paths are resolved against it
+    _source_filename: str | None
+
+    # decompressors don't close the stream they read from
+    _raw: typing.BinaryIO
+
+    @property
+    def name(self) -> str | None:
+        return self._source_filename
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._raw.close()
+
+def is_migration_file(filename: str) -> bool:
+    return filename.endswith(migration_suffixes)
+
+def strip_migration_suffix(filename: str) -> str:
+    for suffix in migration_suffixes:
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+
+    return filename
+
+def open_text_stream(binary: typing.BinaryIO, name: str, filename: str | None) -> typing.TextIO:
+    module_name = _compressed_extensions.get(os.path.splitext(name)[1])
+    decompressed = binary
+
+    if module_name is not None:
+        import importlib
+
+        # decompresses as the text is read, the file is never inflated in full
+        decompressed = importlib.import_module(module_name).open(binary, 'rb')
+
+    text = _NamedTextFile(decompressed, encoding='utf-8')
+    text._source_filename = filename
+    text._raw = binary
+
+    return text
+
+def open_text(filename: str) -> typing.TextIO:
+    if os.path.splitext(filename)[1] not in _compressed_extensions:
+        return open(filename, 'r')
+
+    return open_text_stream(open(filename, 'rb'), filename, filename)
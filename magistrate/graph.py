@@ -0,0 +1,98 @@
+import concurrent.futures
+import contextlib
+import typing
+import psycopg2
+
+from magistrate.db import ExecutionOptions, get_current_migration_version_conn, migrate_graph_conn
+from magistrate.dbexc import MigrationFailed
+from magistrate.exc import InvalidDependency
+
+if typing.TYPE_CHECKING:
+    from magistrate.parser import Migration, StreamingMigration
+
+class _GraphFailure(Exception):
+    def __init__(self, version: int, cause: Exception):
+        self.version: int = version
+        self.cause: Exception = cause
+
+def migration_dependencies(migration: 'Migration | StreamingMigration') -> list[int]:
+    if migration.depends is None:
+        return [migration.version - 1] if migration.version > 1 else []
+
+    return migration.depends
+
+def run_migration_graph(
+    migrations: list['Migration | StreamingMigration'],
+    done: set[int],
+    workers: int,
+    run: typing.Callable[['Migration | StreamingMigration'], None]
+):
+    pending = {mig.version: mig for mig in migrations if mig.version not in done}
+    done = set(done)
+
+    for mig in pending.values():
+        for dependency in migration_dependencies(mig):
+            if dependency not in done and dependency not in pending:
+                raise InvalidDependency(mig.version, dependency)
+
+    def _ready() -> list['Migration | StreamingMigration']:
+        return [mig for mig in pending.values() if all(dep in done for dep in migration_dependencies(mig))]
+
+    failure: _GraphFailure | None = None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        running: dict[concurrent.futures.Future, int] = {}
+
+        while failure is None and (len(pending) > 0 or len(running) > 0):
+            for mig in sorted(_ready(), key=lambda x: x.version):
+                del pending[mig.version]
+                running[pool.submit(run, mig)] = mig.version
+
+            finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in finished:
+                version = running.pop(future)
+
+                if (ex := future.exception()) is not None:
+                    if failure is None:
+                        failure = _GraphFailure(version, typing.cast(Exception, ex))
+                else:
+                    done.add(version)
+
+        # let migrations that are already running finish, but start nothing new
+        concurrent.futures.wait(running)
+
+    if failure is not None:
+        raise failure
+
+def execute_migration_graph(
+    conn_string: str,
+    current_version: int,
+    target_version: int,
+    migrations: list['Migration | StreamingMigration'],
+    applied: set[int],
+    *,
+    workers: int = 1,
+    options: ExecutionOptions | None = None
+) -> int:
+    options = options if options is not None else ExecutionOptions.for_connection_string(conn_string)
+
+    def _run(mig: 'Migration | StreamingMigration'):
+        if options.pause is not None:
+            options.pause()
+
+        with contextlib.closing(psycopg2.connect(conn_string)) as conn:
+            migrate_graph_conn(conn, mig, options)
+
+    done = set(range(1, current_version + 1)) | applied
+
+    try:
+        run_migration_graph(migrations, done, workers, _run)
+    except _GraphFailure as failure:
+        with contextlib.closing(psycopg2.connect(conn_string)) as conn:
+            end_version = get_current_migration_version_conn(conn)
+
+        raise MigrationFailed.from_cause(current_version, failure.version, target_version, end_version, failure.cause) from failure.cause
+
+    with contextlib.closing(psycopg2.connect(conn_string)) as conn:
+        return get_current_migration_version_conn(conn)
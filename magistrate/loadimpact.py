@@ -0,0 +1,255 @@
+import contextlib
+import threading
+import time
+import typing
+import psycopg2
+import pydantic
+from psycopg2 import sql
+
+from magistrate.db import get_current_migration_version_conn, prepare_migration_table_conn
+from magistrate.execution import ArchiveSource, DirectorySource, HardcodedSource, MigrationParameters, VersionMigration, execute_migration
+
+_setup_queries = [
+    'CREATE TABLE IF NOT EXISTS magistrate_load_impact (id serial primary key, value integer not null, updated_at timestamptz not null default now())',
+    'TRUNCATE magistrate_load_impact',
+    'INSERT INTO magistrate_load_impact (value) SELECT g FROM generate_series(1, %(rows)s) g',
+    'ANALYZE magistrate_load_impact',
+]
+
+_teardown_query = 'DROP TABLE IF EXISTS magistrate_load_impact'
+
+_default_read_query = 'SELECT value FROM magistrate_load_impact WHERE id = (random() * %(rows)s)::int + 1'
+_default_write_query = 'UPDATE magistrate_load_impact SET value = value + 1, updated_at = now() WHERE id = (random() * %(rows)s)::int + 1'
+
+# stand-ins for application traffic on the migrated tables; FOR UPDATE takes the row lock a write would, without writing
+_touched_read_query = 'SELECT 1 FROM {} LIMIT 1'
+_touched_write_query = 'SELECT 1 FROM {} LIMIT 1 FOR UPDATE SKIP LOCKED'
+
+class Workload(pydantic.BaseModel):
+    readers: int = 4
+    writers: int = 2
+
+    # default to point reads and writes on a table the harness seeds itself, %(rows)s holds its row count
+    read_query: str = _default_read_query
+    write_query: str = _default_write_query
+    rows: int = 10000
+
+    # query the existing tables the migrated versions touch instead of the synthetic table the default queries use
+    touched_tables: bool = False
+
+    baseline_seconds: float = 5.0
+    # keeps measuring briefly after each version, so the tail of its impact is attributed to it
+    settle_seconds: float = 0.0
+
+class PhaseStats(pydantic.BaseModel):
+    phase: str
+    seconds: float
+    queries: int
+    errors: int
+    throughput: float
+    p50_ms: float
+    p99_ms: float
+    max_ms: float
+
+class LoadImpactReport(pydantic.BaseModel):
+    workload: Workload
+    baseline: PhaseStats
+    versions: list[PhaseStats]
+
+    # the workload only queried magistrate_load_impact, which no migration locks or rewrites
+    synthetic: bool = False
+
+    def to_markdown(self) -> str:
+        lines = [f'Workload: {self.workload.readers} readers, {self.workload.writers} writers', '']
+
+        if self.synthetic:
+            lines += [
+                '> Warning: the workload only queried the synthetic magistrate_load_impact table, which the migrations never lock. '
+                'Use touched tables or custom read and write queries to measure their lock and rewrite impact.',
+                '',
+            ]
+
+        lines += [
+            '| Phase | Duration (s) | Queries | Errors | Throughput (q/s) | p50 (ms) | p99 (ms) | Max (ms) | p99 vs baseline |',
+            '| --- | ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: |',
+        ]
+
+        for stats in [self.baseline, *self.versions]:
+            ratio = stats.p99_ms / self.baseline.p99_ms if self.baseline.p99_ms > 0 else 0.0
+
+            lines.append(
+                f'| {stats.phase} | {stats.seconds:.2f} | {stats.queries} | {stats.errors} | {stats.throughput:.1f} '
+                f'| {stats.p50_ms:.2f} | {stats.p99_ms:.2f} | {stats.max_ms:.2f} | {ratio:.2f}x |'
+            )
+
+        return '\n'.join(lines) + '\n'
+
+class _Sample(typing.NamedTuple):
+    started: float
+    latency: float
+    failed: bool
+
+def _percentile(sorted_values: list[float], percentile: float) -> float:
+    if len(sorted_values) == 0:
+        return 0.0
+
+    index = min(len(sorted_values) - 1, max(0, int(round(percentile / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def summarize(phase: str, samples: list[_Sample], started: float, ended: float) -> PhaseStats:
+    # queries belong to the phase they were started in, even if a lock made them finish much later
+    in_phase = [sample for sample in samples if started <= sample.started < ended]
+    latencies = sorted(sample.latency * 1000 for sample in in_phase if not sample.failed)
+    seconds = ended - started
+
+    return PhaseStats(
+        phase=phase,
+        seconds=seconds,
+        queries=len(latencies),
+        errors=len(in_phase) - len(latencies),
+        throughput=len(latencies) / seconds if seconds > 0 else 0.0,
+        p50_ms=_percentile(latencies, 50),
+        p99_ms=_percentile(latencies, 99),
+        max_ms=latencies[-1] if len(latencies) > 0 else 0.0
+    )
+
+class _WorkloadRunner:
+    def __init__(self, conn_string: str, workload: Workload, read_queries: list[str], write_queries: list[str]):
+        self._conn_string: str = conn_string
+        self._workload: Workload = workload
+        self._read_queries: list[str] = read_queries
+        self._write_queries: list[str] = write_queries
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self.samples: list[_Sample] = []
+
+    def _run(self, query: str):
+        params = {'rows': self._workload.rows}
+        samples: list[_Sample] = []
+
+        with contextlib.closing(psycopg2.connect(self._conn_string)) as conn:
+            conn.autocommit = True
+
+            with conn.cursor() as cur:
+                while not self._stopped.is_set():
+                    started = time.monotonic()
+                    failed = False
+
+                    try:
+                        cur.execute(query, params)
+                    except psycopg2.Error:
+                        # e.g. the migration dropped something the workload uses
+                        failed = True
+
+                    samples.append(_Sample(started, time.monotonic() - started, failed))
+
+        with self._lock:
+            self.samples.extend(samples)
+
+    def __enter__(self) -> '_WorkloadRunner':
+        # the threads are spread over the queries round-robin
+        queries = [self._read_queries[i % len(self._read_queries)] for i in range(self._workload.readers)]
+        queries += [self._write_queries[i % len(self._write_queries)] for i in range(self._workload.writers)]
+
+        for query in queries:
+            self._threads.append(threading.Thread(target=self._run, args=(query,), daemon=True))
+            self._threads[-1].start()
+
+        return self
+
+    def __exit__(self, *args):
+        self._stopped.set()
+
+        for thread in self._threads:
+            thread.join()
+
+def prepare_workload(conn_string: str, workload: Workload):
+    with contextlib.closing(psycopg2.connect(conn_string)) as conn:
+        with conn.cursor() as cur:
+            for query in _setup_queries:
+                cur.execute(query, {'rows': workload.rows})
+
+        conn.commit()
+
+def _drop_workload(conn_string: str):
+    with contextlib.closing(psycopg2.connect(conn_string)) as conn:
+        with conn.cursor() as cur:
+            cur.execute(_teardown_query)
+
+        conn.commit()
+
+def touched_table_queries(conn_string: str, migrations: list) -> tuple[list[str], list[str]]:
+    from magistrate.maintenance import resolve_touched_tables, statement_tables
+
+    touched: set[str] = set()
+
+    for mig in migrations:
+        for statement in mig.up_queries:
+            touched.update(statement_tables(statement))
+
+    if len(touched) == 0:
+        return [], []
+
+    with contextlib.closing(psycopg2.connect(conn_string)) as conn:
+        with conn.cursor() as cur:
+            # tables the migrations create do not exist yet, querying them would only count errors
+            tables = [sql.Identifier(schema, name) for _, schema, name, _, _ in resolve_touched_tables(cur, touched)]
+
+            return (
+                [sql.SQL(_touched_read_query).format(table).as_string(cur) for table in tables],
+                [sql.SQL(_touched_write_query).format(table).as_string(cur) for table in tables]
+            )
+
+def measure_load_impact(
+    conn_string: str,
+    migration_source: DirectorySource | HardcodedSource | ArchiveSource,
+    target_version: int | typing.Literal['latest'],
+    workload: Workload
+) -> LoadImpactReport:
+    with contextlib.closing(psycopg2.connect(conn_string)) as conn:
+        prepare_migration_table_conn(conn)
+        current_version = get_current_migration_version_conn(conn)
+
+    target = migration_source.highest_version() if target_version == 'latest' else target_version
+    phases: list[tuple[str, float, float]] = []
+
+    read_queries = [workload.read_query]
+    write_queries = [workload.write_query]
+
+    if workload.touched_tables:
+        touched_reads, touched_writes = touched_table_queries(conn_string, migration_source.select_migrations(current_version, target))
+
+        # a range that only creates new tables leaves nothing to query but the synthetic table
+        read_queries = touched_reads or read_queries
+        write_queries = touched_writes or write_queries
+
+    synthetic = read_queries == [_default_read_query] and write_queries == [_default_write_query]
+
+    with contextlib.ExitStack() as stack:
+        if _default_read_query in read_queries or _default_write_query in write_queries:
+            prepare_workload(conn_string, workload)
+            stack.callback(_drop_workload, conn_string)
+
+        runner = stack.enter_context(_WorkloadRunner(conn_string, workload, read_queries, write_queries))
+
+        started = time.monotonic()
+        time.sleep(workload.baseline_seconds)
+        phases.append(('baseline', started, time.monotonic()))
+
+        # one version at a time, so each gets its own latency figures
+        for version in range(current_version + 1, target + 1):
+            started = time.monotonic()
+
+            execute_migration(MigrationParameters(
+                connection_string=conn_string,
+                migration_source=migration_source,
+                migration_type=VersionMigration(target_version=version)
+            ))
+
+            time.sleep(workload.settle_seconds)
+            phases.append((f'version {version}', started, time.monotonic()))
+
+    stats = [summarize(phase, runner.samples, started, ended) for phase, started, ended in phases]
+
+    return LoadImpactReport(workload=workload, baseline=stats[0], versions=stats[1:], synthetic=synthetic)
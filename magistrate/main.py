@@ -3,8 +3,7 @@ import os
 import sys
 import typing
 
-from magistrate.db import get_current_migration_version
-from magistrate.execution import DirectorySource, MigrationParameters, VersionMigration, execute_migration
+# heavy modules (psycopg2, pydantic) are imported inside _main so each command only pays for what it uses
 
 def _parse_version(value: str) -> int | typing.Literal['latest']:
     if value == "latest":
@@ -18,6 +17,17 @@ def _parse_version(value: str) -> int | typing.Literal['latest']:
     except ValueError:
         raise argparse.ArgumentTypeError("Version must be a zero or positive integer or 'latest'")
 
+_size_units = {'': 1, 'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4}
+
+def _parse_size(value: str) -> int:
+    number = value.strip().upper().rstrip('BKMGT ')
+    unit = value.strip().upper()[len(number):].strip()
+
+    try:
+        return int(float(number) * _size_units[unit if unit in _size_units else unit + 'B'])
+    except (ValueError, KeyError):
+        raise argparse.ArgumentTypeError("Size must be a number of bytes, optionally followed by kB, MB, GB or TB")
+
 def _create_argument_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Magistrate migration tool")
 
@@ -35,10 +45,192 @@ def _create_argument_parser() -> argparse.ArgumentParser:
         help="Target version to migrate to (zero/positive integer or 'latest')"
     )
 
+    exclusive.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run a daemon answering version, status and plan queries over localhost HTTP or a unix socket"
+    )
+
+    exclusive.add_argument(
+        "--verify",
+        action="store_true",
+        help="Check that every migration file's name matches the version in its header"
+    )
+
+    exclusive.add_argument(
+        "--validate",
+        action="store_true",
+        help="Apply every migration up and then down again, reporting timings"
+    )
+
     parser.add_argument(
         "--directory",
         type=str,
-        help="Path to migration files (required with --version)"
+        help="Path to migration files (required with --version and --validate)"
+    )
+
+    parser.add_argument(
+        "--filename-versions",
+        action="store_true",
+        help="Take versions from file names like 000123_add_users.mig.sql instead of opening every file"
+    )
+
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="Address --serve listens on"
+    )
+
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8642,
+        help="Port --serve listens on"
+    )
+
+    parser.add_argument(
+        "--unix-socket",
+        type=str,
+        help="Serve on this unix socket instead of --host and --port"
+    )
+
+    parser.add_argument(
+        "--allow-remote",
+        action="store_true",
+        help="Let --serve listen on a non-loopback --host; POST /migrate is unauthenticated"
+    )
+
+    parser.add_argument(
+        "--repeatable-directory",
+        type=str,
+        help="Path to .rep.sql files re-applied after the versioned migrations whenever they change"
+    )
+
+    parser.add_argument(
+        "--ephemeral",
+        action="store_true",
+        help="With --validate, run against a throwaway local cluster instead of $POSTGRES"
+    )
+
+    parser.add_argument(
+        "--pg-bin-dir",
+        type=str,
+        help="Directory holding initdb and pg_ctl for --ephemeral (defaults to PATH, then pg_config --bindir)"
+    )
+
+    parser.add_argument(
+        "--max-replication-lag",
+        type=float,
+        help="Pause between migrations until replica lag in seconds drops below this value"
+    )
+
+    parser.add_argument(
+        "--max-blocked-sessions",
+        type=int,
+        help="Cancel a migration statement once more sessions than this are waiting on its locks"
+    )
+
+    parser.add_argument(
+        "--max-blocked-seconds",
+        type=float,
+        help="Cancel a migration statement once a session has waited on its locks longer than this"
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Run independent migrations (see '-- depends:') concurrently on this many connections"
+    )
+
+    parser.add_argument(
+        "--partition-workers",
+        type=int,
+        default=4,
+        help="Connections used to build per-partition indexes for '-- partitioned_index:' directives"
+    )
+
+    parser.add_argument(
+        "--preflight",
+        action="store_true",
+        help="Print estimated duration and extra disk space of every pending statement instead of migrating"
+    )
+
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        help="Refuse to start when the migrations are estimated to take longer than this many seconds"
+    )
+
+    parser.add_argument(
+        "--free-space",
+        type=_parse_size,
+        help="Free disk space on the database server, e.g. 50GB; refuse to start when the migrations are estimated to need more"
+    )
+
+    parser.add_argument(
+        "--check-plans",
+        type=str,
+        help="File of hot queries to EXPLAIN before and after the migrations, which are then rolled back; exits 1 on plan regressions"
+    )
+
+    parser.add_argument(
+        "--plan-cost-ratio",
+        type=float,
+        default=2.0,
+        help="With --check-plans, flag queries whose estimated cost grows by more than this factor"
+    )
+
+    parser.add_argument(
+        "--staging",
+        action="store_true",
+        help="With --check-plans, apply the migrations for real instead of rolling them back, e.g. on a staging copy"
+    )
+
+    parser.add_argument(
+        "--maintenance",
+        action="store_true",
+        help="ANALYZE the tables the applied migrations touched, and VACUUM those left with many dead tuples"
+    )
+
+    parser.add_argument(
+        "--vacuum-threshold",
+        type=int,
+        help="With --maintenance, vacuum tables whose dead tuples grew by more than this plus 10%% of their live tuples"
+    )
+
+    parser.add_argument(
+        "--notify",
+        nargs="?",
+        const=True,
+        metavar="CHANNEL",
+        help="NOTIFY listeners whenever a version commits, on magistrate.db.default_notify_channel unless a channel is given"
+    )
+
+    parser.add_argument(
+        "--allow-setting",
+        action="append",
+        default=[],
+        help="Also let '-- set:' directives change this setting, on top of the default allow-list (repeatable)"
+    )
+
+    parser.add_argument(
+        "--progress",
+        action="store_true",
+        help="Show phase, progress and ETA of index builds, table rewrites and copies while they run"
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue a failed non-transactional migration from its first unfinished statement"
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Parse and execute statements incrementally instead of loading whole migration files"
     )
 
     return parser
@@ -46,8 +238,24 @@ def _create_argument_parser() -> argparse.ArgumentParser:
 def _validate_args(parser: argparse.ArgumentParser, args: argparse.Namespace):
     if args.get_version and args.directory:
         parser.error('--get-version cannot be combined with --version or --directory')
-    if (args.directory and not args.version) or (args.version and not args.directory):
+    if args.validate and not args.directory:
+        parser.error('--validate requires --directory')
+    if args.serve and not args.directory:
+        parser.error('--serve requires --directory')
+    if args.verify and not args.directory:
+        parser.error('--verify requires --directory')
+    if not args.validate and not args.serve and not args.verify and ((args.directory and not args.version) or (args.version and not args.directory)):
         parser.error('--directory and --version must be specified together')
+    if args.ephemeral and not args.validate:
+        parser.error('--ephemeral can only be used with --validate')
+    if args.preflight and not args.version:
+        parser.error('--preflight requires --version and --directory')
+    if args.check_plans and not args.version:
+        parser.error('--check-plans requires --version and --directory')
+    if args.staging and not args.check_plans:
+        parser.error('--staging can only be used with --check-plans')
+    if args.vacuum_threshold is not None and not args.maintenance:
+        parser.error('--vacuum-threshold can only be used with --maintenance')
 
 def _get_args(parser: argparse.ArgumentParser) -> argparse.Namespace:
     args = parser.parse_args()
@@ -56,7 +264,92 @@ def _get_args(parser: argparse.ArgumentParser) -> argparse.Namespace:
 
     return args
 
+def _print_partition_progress(progress) -> None:
+    width = 30
+    filled = width * progress.completed // max(progress.total, 1)
+    bar = '#' * filled + '.' * (width - filled)
+
+    end = '\n' if progress.completed == progress.total else ''
+    print(f'\r{progress.index} [{bar}] {progress.completed}/{progress.total} partitions', end=end, flush=True)
+
+def _print_statement_progress(progress) -> None:
+    width = 30
+    target = progress.relation if progress.relation is not None else 'statement'
+
+    if progress.finished:
+        print(f'\r{progress.command} {target} finished after {progress.elapsed_seconds:.0f}s'.ljust(100), flush=True)
+        return
+
+    filled = int(width * (progress.percent or 0) / 100)
+    bar = '#' * filled + '.' * (width - filled)
+    percent = '' if progress.percent is None else f' {progress.percent:.1f}%'
+    eta = '' if progress.eta_seconds is None else f', ETA {progress.eta_seconds:.0f}s'
+
+    # pad over whatever a longer previous line left behind
+    print(f'\r{progress.command} {target} [{bar}]{percent} {progress.phase}{eta}'.ljust(100), end='', flush=True)
+
+def _print_table_maintenance(result) -> None:
+    action = 'Vacuumed' if result.vacuumed else 'Analyzed'
+    dead = f' ({result.dead_tuples} new dead tuples)' if result.vacuumed else ''
+
+    print(f'{action} {result.table}{dead} in {result.seconds:.3f}s')
+
+def _print_preflight_report(report) -> None:
+    from magistrate.preflight import format_bytes
+
+    for version in report.versions:
+        print(f'version {version.version}: ~{version.seconds:.1f}s, +{format_bytes(version.extra_bytes)}')
+
+        for statement in version.statements:
+            if statement.operation == 'other' and len(statement.tables) == 0:
+                continue
+
+            tables = ', '.join(
+                f'{table.table} ({format_bytes(table.heap_bytes + table.index_bytes)}, ~{table.rows} rows)' if table.exists else f'{table.table} (new)'
+                for table in statement.tables
+            )
+
+            print(f'  #{statement.index + 1} {statement.operation} {tables}: ~{statement.seconds:.1f}s, +{format_bytes(statement.extra_bytes)}')
+
+    print(f'Estimated {report.seconds:.1f}s, peak extra disk space {format_bytes(report.peak_extra_bytes)}')
+
+    for rejection in report.rejections:
+        print(f'Refusing to migrate: {rejection}')
+
+def _print_plan_report(report) -> None:
+    for regression in report.regressions:
+        print(f'Plan regression in {regression}')
+
+    print(f'Checked {len(report.after)} query plans from version {report.version_before} to {report.version_after}, {len(report.regressions)} regressions')
+
+def _print_validation_report(report) -> None:
+    for timing in report.timings:
+        down = 'skipped' if timing.down_seconds is None else f'{timing.down_seconds:.3f}s'
+        print(f'version {timing.version}: up {timing.up_seconds:.3f}s, down {down}')
+
+    if report.down_stopped_at is not None:
+        print(f'Downs stopped at backwards-incompatible version {report.down_stopped_at}')
+
+    if report.setup_seconds > 0:
+        print(f'Cluster setup took {report.setup_seconds:.3f}s')
+
+    print(f'Validated versions {report.start_version + 1} to {report.highest_version} in {report.total_seconds:.3f}s')
+
 def _main(args: argparse.Namespace):
+    if args.verify:
+        from magistrate.discovery import verify_migrations
+
+        migrations = verify_migrations(args.directory)
+        print(f'Verified {len(migrations)} migration file names against their headers')
+        sys.exit(0)
+
+    if args.validate and args.ephemeral:
+        from magistrate.execution import DirectorySource
+        from magistrate.validation import validate_migrations_ephemeral
+
+        _print_validation_report(validate_migrations_ephemeral(DirectorySource(directory=args.directory, filename_versions=args.filename_versions), bin_dir=args.pg_bin_dir))
+        sys.exit(0)
+
     try:
         conn_string = os.environ['POSTGRES']
     except KeyError:
@@ -64,25 +357,114 @@ def _main(args: argparse.Namespace):
         sys.exit(1)
 
     if args.get_version:
+        from magistrate.db import get_current_migration_version
+
         current_version = get_current_migration_version(conn_string)
         print('Current version is', current_version)
         sys.exit(0)
 
+    if args.serve:
+        from magistrate.execution import DirectorySource
+        from magistrate.server import ServerParameters, serve
+
+        serve(ServerParameters(
+            connection_string=conn_string,
+            migration_source=DirectorySource(directory=args.directory, filename_versions=args.filename_versions),
+            host=args.host,
+            port=args.port,
+            unix_socket=args.unix_socket,
+            allow_remote=args.allow_remote
+        ))
+        sys.exit(0)
+
+    if args.validate:
+        from magistrate.execution import DirectorySource
+        from magistrate.validation import validate_migrations
+
+        _print_validation_report(validate_migrations(conn_string, DirectorySource(directory=args.directory, filename_versions=args.filename_versions)))
+        sys.exit(0)
+
+    from magistrate.db import default_allowed_settings, default_notify_channel
+    from magistrate.execution import DirectorySource, MigrationParameters, RepeatableSource, VersionMigration, execute_migration
+    from magistrate.maintenance import MaintenanceSettings
+    from magistrate.preflight import PreflightSettings
+    from magistrate.progress import ProgressSettings
+    from magistrate.partitions import PartitionSettings
+    from magistrate.throttle import ReplicationThrottle
+    from magistrate.watchdog import LockWatchdogSettings
+
     migration_directory = args.directory
     version: int | typing.Literal['latest'] = args.version
 
+    throttle: ReplicationThrottle | None = None
+
+    if args.max_replication_lag is not None:
+        throttle = ReplicationThrottle(max_lag_seconds=args.max_replication_lag)
+
+    watchdog: LockWatchdogSettings | None = None
+
+    if args.max_blocked_sessions is not None or args.max_blocked_seconds is not None:
+        watchdog = LockWatchdogSettings(max_blocked_sessions=args.max_blocked_sessions, max_blocked_seconds=args.max_blocked_seconds)
+
+    preflight: PreflightSettings | None = None
+
+    if args.preflight or args.time_budget is not None or args.free_space is not None:
+        preflight = PreflightSettings(time_budget_seconds=args.time_budget, free_bytes=args.free_space, on_report=_print_preflight_report)
+
+    maintenance: MaintenanceSettings | None = None
+
+    if args.maintenance:
+        maintenance = MaintenanceSettings(on_table=_print_table_maintenance)
+
+        if args.vacuum_threshold is not None:
+            maintenance.vacuum_threshold = args.vacuum_threshold
+
     migration_params = MigrationParameters(
         connection_string=conn_string,
-        migration_source=DirectorySource(directory=migration_directory),
+        migration_source=DirectorySource(directory=migration_directory, streaming=args.stream, filename_versions=args.filename_versions),
+        repeatable_source=RepeatableSource(directory=args.repeatable_directory) if args.repeatable_directory else None,
         migration_type=VersionMigration(
             target_version=version,
-        )
+        ),
+        throttle=throttle,
+        resume=args.resume,
+        workers=args.workers,
+        watchdog=watchdog,
+        maintenance=maintenance,
+        preflight=preflight,
+        notify_channel=default_notify_channel if args.notify is True else args.notify,
+        allowed_settings=set(default_allowed_settings) | {name.lower() for name in args.allow_setting},
+        progress=ProgressSettings(on_progress=_print_statement_progress) if args.progress else None,
+        partitions=PartitionSettings(workers=args.partition_workers, on_progress=_print_partition_progress)
     )
 
+    if args.preflight:
+        from magistrate.preflight import preflight_migration
+
+        report = preflight_migration(migration_params, typing.cast(PreflightSettings, preflight))
+
+        _print_preflight_report(report)
+        sys.exit(1 if len(report.rejections) > 0 else 0)
+
+    if args.check_plans:
+        from magistrate.plans import PlanGuardSettings, check_plan_regressions, load_hot_queries
+
+        report = check_plan_regressions(migration_params, PlanGuardSettings(
+            queries=load_hot_queries(args.check_plans),
+            cost_ratio=args.plan_cost_ratio,
+            dry_run=not args.staging
+        ))
+
+        _print_plan_report(report)
+        sys.exit(1 if len(report.regressions) > 0 else 0)
+
     new_version: int = execute_migration(migration_params)
 
     print('Database migrated. New version is', new_version)
 
+    if throttle is not None:
+        print(f'Waited {throttle.waited_seconds:.1f}s for replication lag')
+
 def _main_no_args():
     _parser = _create_argument_parser()
     args = _get_args(_parser)
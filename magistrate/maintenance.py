@@ -0,0 +1,167 @@
+import re
+import time
+import typing
+import pydantic
+from psycopg2 import sql
+
+from magistrate.dbexc import MaintenanceFailed
+from magistrate.snapshot import magistrate_relations
+
+if typing.TYPE_CHECKING:
+    from magistrate.parser import Statement
+
+class TableMaintenance(pydantic.BaseModel):
+    table: str
+    analyzed: bool
+    vacuumed: bool
+
+    # growth of the table's dead tuples over the migration run
+    dead_tuples: int
+    seconds: float
+
+class MaintenanceSettings(pydantic.BaseModel):
+    analyze: bool = True
+
+    # vacuums tables whose dead tuples grew by more than vacuum_threshold + vacuum_scale_factor * live tuples, like autovacuum
+    vacuum: bool = True
+    vacuum_threshold: int = 1000
+    vacuum_scale_factor: float = 0.1
+
+    on_table: typing.Callable[[TableMaintenance], None] | None = None
+
+    @pydantic.model_validator(mode='after')
+    def _validate_maintenance_settings(self) -> 'MaintenanceSettings':
+        if self.vacuum_threshold < 0 or self.vacuum_scale_factor < 0:
+            raise ValueError('Vacuum thresholds cannot be below zero')
+
+        return self
+
+# regex fragments for SQL names, also used by the pre-flight estimates; the qualified name is one capture group
+identifier_pattern = r'(?:"(?:[^"]|"")+"|[A-Za-z_][\w$]*)'
+qualified_name_pattern = rf'({identifier_pattern}(?:\s*\.\s*{identifier_pattern})?)'
+
+# statements that leave a table's statistics stale; freshly created, still empty tables are left alone
+# since analyzing them would tell the planner they stay empty
+_touched_table_patterns = [
+    re.compile(rf'\bALTER\s+TABLE\s+(?:IF\s+EXISTS\s+)?(?:ONLY\s+)?{qualified_name_pattern}', re.IGNORECASE),
+    re.compile(rf'\bCREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:(?:IF\s+NOT\s+EXISTS\s+)?{identifier_pattern}\s+)?ON\s+(?:ONLY\s+)?{qualified_name_pattern}', re.IGNORECASE),
+    re.compile(rf'\bINSERT\s+INTO\s+{qualified_name_pattern}', re.IGNORECASE),
+    re.compile(rf'\bUPDATE\s+(?:ONLY\s+)?{qualified_name_pattern}', re.IGNORECASE),
+    re.compile(rf'\bDELETE\s+FROM\s+(?:ONLY\s+)?{qualified_name_pattern}', re.IGNORECASE),
+    re.compile(rf'\bCOPY\s+{qualified_name_pattern}', re.IGNORECASE),
+    re.compile(rf'\bCREATE\s+(?:UNLOGGED\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?{qualified_name_pattern}\s*(?:\([^)]*\)\s*)?AS\b', re.IGNORECASE),
+    re.compile(rf'\b(?:CREATE|REFRESH)\s+MATERIALIZED\s+VIEW\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?{qualified_name_pattern}', re.IGNORECASE),
+]
+
+# words the patterns above pick up from e.g. "ON CONFLICT DO UPDATE SET" or "FOR UPDATE NOWAIT"
+_not_tables = {'set', 'of', 'nowait', 'skip'}
+
+_line_comment = re.compile(r'--[^\n]*')
+
+_dead_tuples_query = 'SELECT relid, n_dead_tup FROM pg_catalog.pg_stat_user_tables'
+
+_touched_tables_query = '''SELECT DISTINCT c.oid, n.nspname, c.relname, COALESCE(s.n_live_tup, 0), COALESCE(s.n_dead_tup, 0)
+FROM unnest(%(names)s::text[]) t(name)
+JOIN pg_catalog.pg_class c ON c.oid = pg_catalog.to_regclass(t.name)
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_catalog.pg_stat_user_tables s ON s.relid = c.oid
+WHERE c.relkind IN ('r', 'p', 'm') AND c.relname <> ALL(%(excluded)s)
+ORDER BY n.nspname, c.relname'''
+
+def statement_tables(statement: 'Statement') -> set[str]:
+    if not isinstance(statement, str):
+        return {statement.table}
+
+    text = _line_comment.sub('', statement)
+    tables: set[str] = set()
+
+    for pattern in _touched_table_patterns:
+        for match in pattern.finditer(text):
+            name = re.sub(r'\s*\.\s*', '.', match.group(1))
+
+            if name.lower() not in _not_tables:
+                tables.add(name)
+
+    return tables
+
+def record_touched_tables(statements: typing.Iterable['Statement'], touched: set[str]) -> typing.Iterator['Statement']:
+    for statement in statements:
+        touched.update(statement_tables(statement))
+        yield statement
+
+def resolve_touched_tables(cur, touched: set[str]) -> list[tuple[int, str, str, int, int]]:
+    # names are resolved against the search path the migrations ran with, dropped tables resolve to nothing
+    cur.execute(_touched_tables_query, {'names': sorted(touched), 'excluded': magistrate_relations})
+    return cur.fetchall()
+
+def read_dead_tuples_conn(conn) -> dict[int, int]:
+    with conn.cursor() as cur:
+        cur.execute(_dead_tuples_query)
+        dead_tuples = dict(cur.fetchall())
+
+    conn.commit()
+
+    return dead_tuples
+
+def _flush_statistics(conn):
+    # from postgres 15 on, the backend publishes its pending statistics when it goes idle after this;
+    # older servers report them through the stats collector, which can lag by up to half a second
+    if conn.server_version >= 150000:
+        with conn.cursor() as cur:
+            cur.execute('SELECT pg_catalog.pg_stat_force_next_flush()')
+
+    conn.commit()
+
+def run_maintenance_conn(conn, settings: MaintenanceSettings, version: int, touched: set[str], dead_tuples_before: dict[int, int]) -> list[TableMaintenance]:
+    if len(touched) == 0 or not (settings.analyze or settings.vacuum):
+        return []
+
+    _flush_statistics(conn)
+
+    with conn.cursor() as cur:
+        tables = resolve_touched_tables(cur, touched)
+
+    conn.commit()
+
+    results: list[TableMaintenance] = []
+
+    # VACUUM cannot run inside a transaction block
+    conn.autocommit = True
+
+    try:
+        with conn.cursor() as cur:
+            for relid, schema, name, live_tuples, dead_tuples in tables:
+                grown = max(dead_tuples - dead_tuples_before.get(relid, 0), 0)
+                vacuum = settings.vacuum and grown > settings.vacuum_threshold + settings.vacuum_scale_factor * live_tuples
+
+                if not vacuum and not settings.analyze:
+                    continue
+
+                if vacuum:
+                    query = sql.SQL('VACUUM (ANALYZE) {}' if settings.analyze else 'VACUUM {}')
+                else:
+                    query = sql.SQL('ANALYZE {}')
+
+                started = time.monotonic()
+
+                try:
+                    cur.execute(query.format(sql.Identifier(schema, name)))
+                except Exception as ex:
+                    raise MaintenanceFailed(version, f'{schema}.{name}') from ex
+
+                result = TableMaintenance(
+                    table=f'{schema}.{name}',
+                    analyzed=settings.analyze,
+                    vacuumed=vacuum,
+                    dead_tuples=grown,
+                    seconds=time.monotonic() - started
+                )
+
+                results.append(result)
+
+                if settings.on_table is not None:
+                    settings.on_table(result)
+    finally:
+        conn.autocommit = False
+
+    return results
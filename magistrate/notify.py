@@ -0,0 +1,131 @@
+import contextlib
+import json
+import select
+import threading
+import typing
+import psycopg2
+import pydantic
+from psycopg2 import sql
+
+from magistrate.db import default_notify_channel, get_current_migration_version_conn
+from magistrate.dbexc import DBError
+
+class VersionChange(pydantic.BaseModel):
+    old_version: int
+    new_version: int
+
+    # the migration that committed, which differs from new_version while out-of-order migrations wait for their predecessors
+    migrated: int | None = None
+    direction: typing.Literal['up', 'down'] | None = None
+
+    # None for changes the listener found by reading the version table after it reconnected
+    checksum: str | None = None
+
+def parse_notification(payload: str) -> VersionChange:
+    return VersionChange.model_validate(json.loads(payload))
+
+class VersionListener:
+    def __init__(
+        self,
+        conn_string: str,
+        callback: typing.Callable[[VersionChange], None],
+        *,
+        channel: str = default_notify_channel,
+        poll_interval: float = 1.0,
+        reconnect_interval: float = 5.0
+    ):
+        self.conn_string: str = conn_string
+        self.callback: typing.Callable[[VersionChange], None] = callback
+        self.channel: str = channel
+        self.poll_interval: float = poll_interval
+        self.reconnect_interval: float = reconnect_interval
+
+        # the version last announced or read, so changes missed while disconnected are still reported
+        self.version: int | None = None
+
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> 'VersionListener':
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        # LISTEN before the thread starts, so nothing committed after start() returns is missed
+        conn = self._listen()
+        self._thread = threading.Thread(target=self._run, args=(conn,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+        if self._thread is not None:
+            self._thread.join()
+
+    def _listen(self):
+        conn = psycopg2.connect(self.conn_string)
+        conn.autocommit = True
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL('LISTEN {}').format(sql.Identifier(self.channel)))
+
+            # a database that was never migrated has no version table yet
+            with contextlib.suppress(DBError):
+                self._catch_up(get_current_migration_version_conn(conn))
+        except Exception:
+            conn.close()
+            raise
+
+        return conn
+
+    def _catch_up(self, version: int):
+        if self.version is not None and self.version != version:
+            self._emit(VersionChange(old_version=self.version, new_version=version))
+
+        self.version = version
+
+    def _emit(self, change: VersionChange):
+        self.version = change.new_version
+
+        # a failing callback must not stop the notifications of everyone else in the process
+        with contextlib.suppress(Exception):
+            self.callback(change)
+
+    def _receive(self, conn):
+        while not self._stopped.is_set():
+            if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                continue
+
+            conn.poll()
+
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+
+                try:
+                    change = parse_notification(notify.payload)
+                except ValueError:
+                    # NOTIFY from something other than magistrate on the same channel
+                    continue
+
+                self._emit(change)
+
+    def _run(self, conn):
+        while not self._stopped.is_set():
+            try:
+                if conn is None:
+                    conn = self._listen()
+
+                self._receive(conn)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                if conn is not None:
+                    conn.close()
+                    conn = None
+
+                self._stopped.wait(self.reconnect_interval)
+
+        if conn is not None:
+            conn.close()
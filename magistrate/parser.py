@@ -1,8 +1,14 @@
 
 import enum
+import hashlib
+import io
+import os
 import re
+import typing
+import zlib
 import pydantic
-from magistrate.exc import BackwardsIncompatibilityViolation, DisjointedSections, IncompleteQuery, InvalidMigrationVersion, ManualCommitDisabled, MissingSection, SectionNotSet, VersionCannotBeZero
+from magistrate.fileio import open_text
+from magistrate.exc import BackwardsIncompatibilityViolation, DisjointedSections, IncompleteQuery, InvalidCopyDirective, DirectiveRequiresNonTransactional, DuplicateHeader, InvalidDependency, InvalidDependencyHeader, InvalidMigrationFile, InvalidMigrationVersion, InvalidPartitionedIndexDirective, InvalidRepeatableDependencyHeader, InvalidSetDirective, ManualCommitDisabled, MissingSection, SectionNotSet, UnterminatedCopyData, VersionCannotBeZero
 from typing import Protocol
 
 class MigrationDirection(enum.Enum):
@@ -18,13 +24,175 @@ class _StringReader(Protocol):
     def readline(self, __size: int = ...) -> str: ...
     def tell(self) -> int: ...
 
+class _HashingReader:
+    # hashes the migration text as it is parsed, so its checksum never costs a second pass over the file
+    def __init__(self, fd: _StringReader):
+        self._fd: _StringReader = fd
+        self._digest = hashlib.sha256()
+        self.name: str | None = getattr(fd, 'name', None)
+
+    def readline(self, size: int = -1) -> str:
+        line = self._fd.readline(size)
+
+        # files are read with universal newlines, text handed in directly may still carry '\r\n'
+        self._digest.update(line.replace('\r\n', '\n').encode('utf-8'))
+        return line
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+class CopyRowsReader:
+    # inline '-- copy:' rows read straight from the open migration file up to the '\.' line, hashed as they go by
+    def __init__(self, fd: _StringReader, table: str):
+        self._fd: _StringReader = fd
+        self._table: str = table
+        self._buffer: str = ''
+        self._finished: bool = False
+        self._digest = hashlib.sha256()
+        self.size: int = 0
+
+    def _next_line(self) -> str:
+        if self._finished:
+            return ''
+
+        line = self._fd.readline()
+
+        if line == '':
+            raise UnterminatedCopyData(self._table)
+
+        if is_copy_end(line):
+            self._finished = True
+            return ''
+
+        data = line.encode('utf-8')
+        self._digest.update(data)
+        self.size += len(data)
+
+        return line
+
+    def read(self, size: int = -1) -> str:
+        chunks = [self._buffer]
+        buffered = len(self._buffer)
+
+        while (size < 0 or buffered < size) and (line := self._next_line()) != '':
+            chunks.append(line)
+            buffered += len(line)
+
+        data = ''.join(chunks)
+
+        if size < 0:
+            size = len(data)
+
+        self._buffer = data[size:]
+        return data[:size]
+
+    def drain(self):
+        while self._next_line() != '':
+            pass
+
+        self._buffer = ''
+
+    def hexdigest(self) -> str:
+        self.drain()
+        return self._digest.hexdigest()
+
+class CopyData(pydantic.BaseModel):
+    kind: typing.Literal['copy'] = 'copy'
+
+    table: str
+    columns: list[str]
+    format: typing.Literal['text', 'csv'] = 'text'
+
+    # exactly one of these is set - inline rows from the migration, or a data file to stream from
+    rows: str | None = None
+    filename: str | None = None
+
+    # set instead of rows while a streaming migration reads them from its open file
+    _reader: CopyRowsReader | None = pydantic.PrivateAttr(default=None)
+
+    def open_rows(self) -> CopyRowsReader | io.StringIO:
+        return self._reader if self._reader is not None else io.StringIO(self.rows or '')
+
+    def rows_size(self) -> int:
+        if self._reader is not None:
+            self._reader.drain()
+            return self._reader.size
+
+        return len((self.rows or '').encode('utf-8'))
+
+    def _rows_hexdigest(self) -> str:
+        if self._reader is not None:
+            return self._reader.hexdigest()
+
+        digest = hashlib.sha256()
+        rows = self.rows or ''
+
+        for start in range(0, len(rows), 1024 * 1024):
+            digest.update(rows[start:start + 1024 * 1024].encode('utf-8'))
+
+        return digest.hexdigest()
+
+    def checksum(self) -> str:
+        # the same whether the rows were parsed into the migration or streamed from its file
+        digest = hashlib.sha256(self.model_dump_json(exclude={'rows'}).encode('utf-8'))
+        digest.update(self._rows_hexdigest().encode('utf-8'))
+
+        return digest.hexdigest()
+
+class PartitionedIndex(pydantic.BaseModel):
+    kind: typing.Literal['partitioned_index'] = 'partitioned_index'
+
+    name: str
+    table: str
+    unique: bool = False
+
+    # everything after the table name, e.g. "USING btree (created_at) WHERE deleted_at IS NULL"
+    definition: str
+
+Statement = str | CopyData | PartitionedIndex
+
 class Migration(pydantic.BaseModel):
     version: int
-    up_queries: list[str]
-    down_queries: list[str]
+    up_queries: list[Statement]
+    down_queries: list[Statement]
 
     backwards_compatible: bool
 
+    # pause for replica lag between this migration's statements, not only between versions
+    # only allowed for non-transactional migrations
+    throttle: bool = False
+
+    # non-transactional migrations commit statement by statement and can be resumed after a failure
+    transactional: bool = True
+
+    # None means the migration depends on the version right before it
+    depends: list[int] | None = None
+
+    # lets a run's post-migration ANALYZE and VACUUM skip the tables this migration touches
+    maintenance: bool = True
+
+    # '-- set: name=value' session settings, in effect only while this migration runs
+    settings: dict[str, str] = {}
+
+    # SHA-256 of the parsed source text, None for migrations built in code
+    checksum: str | None = None
+
+    @pydantic.model_validator(mode='after')
+    def _validate_migration(self) -> 'Migration':
+        if self.throttle and self.transactional:
+            raise ValueError('Only non-transactional migrations can be throttled between statements')
+
+        return self
+
+class RepeatableMigration(pydantic.BaseModel):
+    # file name without the .rep.sql extension
+    name: str
+    depends: list[str] = []
+
+    # the whole file runs as one statement batch, so function bodies need no special splitting
+    body: str
+    checksum: str
+
 def parse_migration_version(line: str) -> int:
     line = line.strip()
 
@@ -55,6 +223,193 @@ def parse_is_backwards_compatible(line: str) -> bool | None:
     
     return None
 
+def parse_throttle(line: str) -> bool | None:
+    line = line.strip()
+
+    throttle_match = re.search(r'^--\s*throttle:\s*(true|false)\s*$', line)
+
+    if throttle_match:
+        return throttle_match.group(1) == 'true'
+    
+    return None
+
+def parse_transactional(line: str) -> bool | None:
+    line = line.strip()
+
+    transactional_match = re.search(r'^--\s*transactional:\s*(true|false)\s*$', line)
+
+    if transactional_match:
+        return transactional_match.group(1) == 'true'
+    
+    return None
+
+def parse_maintenance(line: str) -> bool | None:
+    line = line.strip()
+
+    maintenance_match = re.search(r'^--\s*maintenance:\s*(true|false)\s*$', line)
+
+    if maintenance_match:
+        return maintenance_match.group(1) == 'true'
+    
+    return None
+
+def parse_set(line: str) -> tuple[str, str] | None:
+    line = line.strip()
+
+    if re.search(r'^--\s*set:', line) is None:
+        return None
+
+    set_match = re.search(r'^--\s*set:\s*([A-Za-z_][\w.]*)\s*=\s*(\S(?:.*\S)?)\s*$', line)
+
+    if not set_match:
+        raise InvalidSetDirective(line)
+
+    value = set_match.group(2)
+
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '\'"':
+        value = value[1:-1]
+    elif re.search(r'[,=]', value):
+        # one setting per line, 'a=1, b=2' would otherwise hand 'a' the whole rest of the line
+        raise InvalidSetDirective(line)
+
+    return set_match.group(1).lower(), value
+
+def parse_depends(line: str) -> list[int] | None:
+    line = line.strip()
+
+    if re.search(r'^--\s*depends:', line) is None:
+        return None
+
+    depends_match = re.search(r'^--\s*depends:\s*([0-9]+(?:\s*,\s*[0-9]+)*)?\s*$', line)
+
+    if not depends_match:
+        raise InvalidDependencyHeader(line)
+
+    if depends_match.group(1) is None:
+        return []
+
+    return [int(x) for x in depends_match.group(1).split(',')]
+
+def parse_repeatable_depends(line: str) -> list[str] | None:
+    line = line.strip()
+
+    if re.search(r'^--\s*depends:', line) is None:
+        return None
+
+    depends_match = re.search(r'^--\s*depends:\s*([\w.-]+(?:\s*,\s*[\w.-]+)*)?\s*$', line)
+
+    if not depends_match:
+        raise InvalidRepeatableDependencyHeader(line)
+
+    if depends_match.group(1) is None:
+        return []
+
+    return [x.strip() for x in depends_match.group(1).split(',')]
+
+def parse_copy_directive(line: str, base_directory: str | None = None) -> CopyData | None:
+    line = line.strip()
+
+    if re.search(r'^--\s*copy:', line) is None:
+        return None
+
+    copy_match = re.search(r'^--\s*copy:\s*([A-Za-z_][\w.]*)\s*\(([^)]*)\)\s*(?:from\s+(\S+))?\s*(text|csv)?\s*$', line)
+
+    if not copy_match:
+        raise InvalidCopyDirective(line)
+
+    columns = [col.strip().strip('"') for col in copy_match.group(2).split(',')]
+
+    if any(col == '' for col in columns):
+        raise InvalidCopyDirective(line)
+
+    filename = copy_match.group(3)
+
+    if filename is not None and base_directory is not None:
+        filename = os.path.join(base_directory, filename)
+
+    return CopyData(
+        table=copy_match.group(1),
+        columns=columns,
+        format=copy_match.group(4) or 'text',
+        filename=filename
+    )
+
+# clauses that may follow the column list of CREATE INDEX, in the order postgres expects them
+_index_clauses: list[tuple[re.Pattern, bool]] = [
+    (re.compile(r'INCLUDE\s*(?=\()', re.IGNORECASE), True),
+    (re.compile(r'NULLS\s+(?:NOT\s+)?DISTINCT\b\s*', re.IGNORECASE), False),
+    (re.compile(r'WITH\s*(?=\()', re.IGNORECASE), True),
+    (re.compile(r'TABLESPACE\s+\S+\s*', re.IGNORECASE), False),
+]
+
+def _skip_parenthesized(text: str, start: int) -> int | None:
+    if start >= len(text) or text[start] != '(':
+        return None
+
+    depth = 0
+    quote: str | None = None
+
+    for i in range(start, len(text)):
+        if quote is not None:
+            if text[i] == quote:
+                quote = None
+        elif text[i] in '\'"':
+            quote = text[i]
+        elif text[i] == '(':
+            depth += 1
+        elif text[i] == ')':
+            depth -= 1
+
+            if depth == 0:
+                return i + 1
+
+    return None
+
+def _is_index_definition(definition: str) -> bool:
+    using = typing.cast(re.Match, re.match(r'(?:USING\s+\w+\s*)?', definition, re.IGNORECASE))
+    end = _skip_parenthesized(definition, using.end())
+
+    if end is None:
+        return False
+
+    rest = definition[end:].lstrip()
+
+    for pattern, parenthesized in _index_clauses:
+        if (clause := pattern.match(rest)) is None:
+            continue
+
+        end = _skip_parenthesized(rest, clause.end()) if parenthesized else clause.end()
+
+        if end is None:
+            return False
+
+        rest = rest[end:].lstrip()
+
+    # a partial index predicate runs to the end of the line
+    return rest == '' or re.match(r'WHERE\s+\S', rest, re.IGNORECASE) is not None
+
+def parse_partitioned_index_directive(line: str) -> PartitionedIndex | None:
+    line = line.strip()
+
+    if re.search(r'^--\s*partitioned_index:', line) is None:
+        return None
+
+    index_match = re.search(r'^--\s*partitioned_index:\s*(unique\s+)?([A-Za-z_]\w*)\s+on\s+([A-Za-z_][\w.]*)\s+(.*?)\s*;?\s*$', line, re.IGNORECASE)
+
+    # anything unexpected after the columns would only fail once the partitions are being built
+    if not index_match or not _is_index_definition(index_match.group(4)):
+        raise InvalidPartitionedIndexDirective(line)
+
+    return PartitionedIndex(
+        name=index_match.group(2),
+        table=index_match.group(3),
+        unique=index_match.group(1) is not None,
+        definition=index_match.group(4)
+    )
+
+def is_copy_end(line: str) -> bool:
+    return line.strip() == '\\.'
+
 def is_query_end(line: str) -> bool:
     line = line.strip()
 
@@ -66,7 +421,55 @@ def has_commit_statement(query: str) -> bool:
     commit_match = re.search(r'\s*commit\s*;', query, re.IGNORECASE | re.MULTILINE)
     return commit_match is not None
 
-def parse_migration(fd: _StringReader) -> Migration:
+class _MigrationHeader:
+    __slots__ = ('version', 'backwards_compatible', 'throttle', 'transactional', 'depends', 'maintenance', 'settings')
+
+    def __init__(self, version: int):
+        self.version: int = version
+        self.backwards_compatible: bool | None = None
+        self.throttle: bool | None = None
+        self.transactional: bool | None = None
+        self.depends: list[int] | None = None
+        self.maintenance: bool | None = None
+        self.settings: dict[str, str] = {}
+
+def _apply_header_directive(line: str, header: _MigrationHeader) -> bool:
+    if (throttle := parse_throttle(line)) is not None:
+        if header.throttle is not None:
+            raise DuplicateHeader('throttle')
+
+        header.throttle = throttle
+    elif (transactional := parse_transactional(line)) is not None:
+        if header.transactional is not None:
+            raise DuplicateHeader('transactional')
+
+        header.transactional = transactional
+    elif (depends := parse_depends(line)) is not None:
+        if header.depends is not None:
+            raise DuplicateHeader('depends')
+
+        for dependency in depends:
+            # depending only on lower versions keeps the graph acyclic and the linear order valid
+            if dependency == 0 or dependency >= header.version:
+                raise InvalidDependency(header.version, dependency)
+
+        header.depends = sorted(set(depends))
+    elif (maintenance := parse_maintenance(line)) is not None:
+        if header.maintenance is not None:
+            raise DuplicateHeader('maintenance')
+
+        header.maintenance = maintenance
+    elif (setting := parse_set(line)) is not None:
+        if setting[0] in header.settings:
+            raise DuplicateHeader(f'set: {setting[0]}')
+
+        header.settings[setting[0]] = setting[1]
+    else:
+        return False
+
+    return True
+
+def _parse_header(fd: _StringReader) -> tuple[_MigrationHeader, MigrationDirection | None]:
     version_line = fd.readline()
 
     version = parse_migration_version(version_line)
@@ -74,40 +477,105 @@ def parse_migration(fd: _StringReader) -> Migration:
     if version == 0:
         raise VersionCannotBeZero()
 
-    queries: dict[MigrationDirection, list[str]] = {
-        MigrationDirection.up: [],
-        MigrationDirection.down: []
+    header = _MigrationHeader(version)
+    direction: MigrationDirection | None = None
+
+    while (line := fd.readline()) != '':
+        if (dir := parse_migration_direction(line)) is not None:
+            if dir == MigrationDirection.down and header.backwards_compatible is False:
+                raise BackwardsIncompatibilityViolation('Migration declares itself backwards-incompatible, but defines a "down" section anyways')
+
+            direction = dir
+            break
+        elif (bc := parse_is_backwards_compatible(line)) is not None:
+            if header.backwards_compatible is not None:
+                raise BackwardsIncompatibilityViolation('Migration cannot declare backwards-incompatibility statements more than once')
+
+            header.backwards_compatible = bc
+        elif _apply_header_directive(line, header):
+            continue
+        elif line.strip() != '':
+            raise SectionNotSet()
+
+    # waiting on replicas inside a transaction would hold every lock taken so far for as long as the wait
+    if header.throttle is True and header.transactional is not False:
+        raise DirectiveRequiresNonTransactional('throttle')
+
+    return header, direction
+
+def _read_copy_rows(fd: _StringReader, copy: CopyData) -> str:
+    rows: list[str] = []
+
+    while (line := fd.readline()) != '':
+        if is_copy_end(line):
+            return ''.join(rows)
+
+        rows.append(line)
+
+    raise UnterminatedCopyData(copy.table)
+
+def _iter_sections(
+    fd: _StringReader,
+    header: _MigrationHeader,
+    first_direction: MigrationDirection | None,
+    base_directory: str | None = None,
+    *,
+    stream_rows: bool = False
+) -> typing.Iterator[tuple[MigrationDirection, Statement]]:
+    counts: dict[MigrationDirection, int] = {
+        MigrationDirection.up: 0,
+        MigrationDirection.down: 0
     }
 
-    back_compatible: bool | None = None
+    fd_name = getattr(fd, 'name', None)
+
+    if base_directory is None and isinstance(fd_name, str):
+        base_directory = os.path.dirname(os.path.abspath(fd_name))
 
     accum: list[str] = []
-    current_direction: MigrationDirection | None = None
+    current_direction: MigrationDirection | None = first_direction
 
-    while (line := fd.readline()) != '':
+    while current_direction is not None and (line := fd.readline()) != '':
         if (dir := parse_migration_direction(line)) is not None:
-            if len(queries[dir]) > 0:
+            if counts[dir] > 0:
                 raise DisjointedSections(dir)
             
-            if dir == MigrationDirection.down and back_compatible is False:
+            if dir == MigrationDirection.down and header.backwards_compatible is False:
                 raise BackwardsIncompatibilityViolation('Migration declares itself backwards-incompatible, but defines a "down" section anyways')
             
             current_direction = dir
-        elif (bc := parse_is_backwards_compatible(line)) is not None:
-            if back_compatible is not None:
+        elif parse_is_backwards_compatible(line) is not None:
+            if header.backwards_compatible is not None:
                 raise BackwardsIncompatibilityViolation('Migration cannot declare backwards-incompatibility statements more than once')
             
-            if current_direction is not None:
-                raise BackwardsIncompatibilityViolation('Migration must declare itself backwards-incompatible before SQL statements are made')
-            
-            back_compatible = bc
+            raise BackwardsIncompatibilityViolation('Migration must declare itself backwards-incompatible before SQL statements are made')
+        elif (copy := parse_copy_directive(line, base_directory)) is not None:
+            if len(accum) > 0:
+                raise IncompleteQuery(''.join(accum))
+
+            if copy.filename is None and stream_rows:
+                copy._reader = CopyRowsReader(fd, copy.table)
+            elif copy.filename is None:
+                copy.rows = _read_copy_rows(fd, copy)
+
+            counts[current_direction] += 1
+
+            yield current_direction, copy
+
+            if copy._reader is not None:
+                # skips whatever the caller left unread, so parsing carries on after the '\.' line
+                copy._reader.drain()
+        elif (index := parse_partitioned_index_directive(line)) is not None:
+            if len(accum) > 0:
+                raise IncompleteQuery(''.join(accum))
+
+            if header.transactional is not False:
+                raise DirectiveRequiresNonTransactional('partitioned_index')
+
+            counts[current_direction] += 1
+
+            yield current_direction, index
         else:
-            if current_direction is None:
-                if line.strip() == '':
-                    continue
-                
-                raise SectionNotSet()
-            
             accum.append(line)
 
             if is_query_end(line):
@@ -116,21 +584,181 @@ def parse_migration(fd: _StringReader) -> Migration:
                 if has_commit_statement(query):
                     raise ManualCommitDisabled()
 
-                queries[current_direction].append(query)
+                counts[current_direction] += 1
                 accum = []
+
+                yield current_direction, query
     
     if len(accum) > 0:
         raise IncompleteQuery(''.join(accum))
     
-    if len(queries[MigrationDirection.up]) == 0:
+    if counts[MigrationDirection.up] == 0:
         raise MissingSection(MigrationDirection.up)
     
-    if len(queries[MigrationDirection.down]) == 0 and back_compatible in {None, True}:
+    if counts[MigrationDirection.down] == 0 and header.backwards_compatible in {None, True}:
         raise MissingSection(MigrationDirection.down)
+
+def parse_migration(fd: _StringReader, base_directory: str | None = None) -> Migration:
+    # relative '-- copy: ... from' files resolve against base_directory, or the directory of a named file
+    reader = _HashingReader(fd)
+    header, first_direction = _parse_header(reader)
+
+    queries: dict[MigrationDirection, list[Statement]] = {
+        MigrationDirection.up: [],
+        MigrationDirection.down: []
+    }
+
+    for direction, query in _iter_sections(reader, header, first_direction, base_directory):
+        queries[direction].append(query)
     
     return Migration(
-        version=version,
+        version=header.version,
         up_queries=queries[MigrationDirection.up],
         down_queries=queries[MigrationDirection.down],
-        backwards_compatible=True if back_compatible is None else back_compatible
+        backwards_compatible=True if header.backwards_compatible is None else header.backwards_compatible,
+        throttle=header.throttle is True,
+        transactional=header.transactional is not False,
+        depends=header.depends,
+        maintenance=header.maintenance is not False,
+        settings=header.settings,
+        checksum=reader.hexdigest()
     )
+
+class StreamingMigration:
+    __slots__ = ('version', 'backwards_compatible', 'throttle', 'transactional', 'depends', 'maintenance', 'settings', 'filename', 'checksum')
+
+    def __init__(self, filename: str):
+        with open_text(filename) as f:
+            header, _ = _parse_header(f)
+
+        self.version: int = header.version
+        self.backwards_compatible: bool = True if header.backwards_compatible is None else header.backwards_compatible
+        self.throttle: bool = header.throttle is True
+        self.transactional: bool = header.transactional is not False
+        self.depends: list[int] | None = header.depends
+        self.maintenance: bool = header.maintenance is not False
+        self.settings: dict[str, str] = header.settings
+        self.filename: str = filename
+
+        # set once the queries have been read through, the same value parse_migration gives the file
+        self.checksum: str | None = None
+
+    def __repr__(self):
+        return f'StreamingMigration({repr(self.filename)})'
+
+    def _iter_queries(self, direction: MigrationDirection) -> typing.Iterator[Statement]:
+        # the whole file is still validated, so a malformed tail raises before the caller commits
+        with open_text(self.filename) as f:
+            reader = _HashingReader(f)
+            header, first_direction = _parse_header(reader)
+
+            # inline copy rows are passed to COPY as they are read, never held in memory whole
+            for dir, query in _iter_sections(reader, header, first_direction, stream_rows=True):
+                if dir == direction:
+                    yield query
+
+        self.checksum = reader.hexdigest()
+
+    def read_checksum(self) -> str:
+        # for callers that never iterated the queries, reads the file once without keeping anything
+        if self.checksum is None:
+            with open_text(self.filename) as f:
+                reader = _HashingReader(f)
+
+                while reader.readline() != '':
+                    pass
+
+            self.checksum = reader.hexdigest()
+
+        return self.checksum
+
+    @property
+    def up_queries(self) -> typing.Iterator[Statement]:
+        return self._iter_queries(MigrationDirection.up)
+
+    @property
+    def down_queries(self) -> typing.Iterator[Statement]:
+        return self._iter_queries(MigrationDirection.down)
+
+def parse_repeatable_migration(name: str, text: str) -> RepeatableMigration:
+    depends: list[str] = []
+    lines = text.splitlines(keepends=True)
+    body_start = 0
+
+    for i, line in enumerate(lines):
+        if (line_depends := parse_repeatable_depends(line)) is not None:
+            depends.extend(line_depends)
+        elif line.strip() != '':
+            break
+
+        body_start = i + 1
+
+    return RepeatableMigration(
+        name=name,
+        depends=sorted(set(depends)),
+        body=''.join(lines[body_start:]),
+        checksum=hashlib.sha256(text.encode('utf-8')).hexdigest()
+    )
+
+class LazyMigration:
+    __slots__ = ('version', '_filename', '_offset', '_length', '_compressed', '_base_directory')
+
+    def __init__(
+        self,
+        version: int,
+        *,
+        filename: str | None = None,
+        offset: int = 0,
+        length: int | None = None,
+        compressed: bytes | None = None,
+        base_directory: str | None = None
+    ):
+        self.version: int = version
+        self._filename: str | None = filename
+        self._offset: int = offset
+        self._length: int | None = length
+        self._compressed: bytes | None = compressed
+        # what relative '-- copy: ... from' files are resolved against
+        self._base_directory: str | None = base_directory
+
+    @classmethod
+    def from_text(cls, version: int, text: str, *, base_directory: str | None = None) -> 'LazyMigration':
+        return cls(version, compressed=zlib.compress(text.encode('utf-8')), base_directory=base_directory)
+
+    @classmethod
+    def from_file(cls, version: int, filename: str, *, offset: int = 0, length: int | None = None) -> 'LazyMigration':
+        return cls(version, filename=filename, offset=offset, length=length, base_directory=os.path.dirname(os.path.abspath(filename)))
+
+    def __repr__(self):
+        return f'LazyMigration({self.version})'
+
+    def _read_text(self) -> str:
+        if self._compressed is not None:
+            return zlib.decompress(self._compressed).decode('utf-8')
+
+        with open(typing.cast(str, self._filename), 'rb') as f:
+            f.seek(self._offset)
+            data = f.read() if self._length is None else f.read(self._length)
+
+        return data.decode('utf-8')
+
+    def load(self) -> Migration:
+        migration = parse_migration(io.StringIO(self._read_text()), self._base_directory)
+        source = self._filename if self._filename is not None else '<compressed text>'
+
+        if migration.version != self.version:
+            raise InvalidMigrationFile(source, f'header declares version {migration.version} but the migration was registered as version {self.version}')
+
+        if self._base_directory is None:
+            for query in (*migration.up_queries, *migration.down_queries):
+                # would otherwise be read relative to whatever the working directory is at run time
+                if isinstance(query, CopyData) and query.filename is not None and not os.path.isabs(query.filename):
+                    raise InvalidMigrationFile(source, f'relative data file {query.filename} needs LazyMigration.from_text(..., base_directory=...)')
+
+        return migration
+
+def load_migration(migration: Migration | LazyMigration) -> Migration:
+    if isinstance(migration, LazyMigration):
+        return migration.load()
+
+    return migration
@@ -0,0 +1,181 @@
+import concurrent.futures
+import contextlib
+import hashlib
+import threading
+import typing
+import psycopg2
+import pydantic
+from psycopg2 import sql
+
+if typing.TYPE_CHECKING:
+    from magistrate.parser import PartitionedIndex
+
+class PartitionProgress(pydantic.BaseModel):
+    index: str
+    partition: str
+    completed: int
+    total: int
+
+class PartitionSettings(pydantic.BaseModel):
+    workers: int = 4
+    retries: int = 2
+    on_progress: typing.Callable[[PartitionProgress], None] | None = None
+
+    @pydantic.model_validator(mode='after')
+    def _validate_partition_settings(self) -> 'PartitionSettings':
+        if self.workers < 1:
+            raise ValueError('At least one worker is required')
+
+        if self.retries < 0:
+            raise ValueError('Retries cannot be below zero')
+
+        return self
+
+class _Partition(typing.NamedTuple):
+    oid: int
+    schema: str
+    name: str
+    parent_oid: int | None
+    is_leaf: bool
+    level: int
+
+_partition_tree_query = '''SELECT t.relid::oid, n.nspname, c.relname, t.parentrelid::oid, c.relkind = 'r', t.level
+FROM pg_catalog.pg_partition_tree(%s::regclass) t
+JOIN pg_catalog.pg_class c ON c.oid = t.relid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relkind IN ('r', 'p')
+ORDER BY t.level, c.relname'''
+
+_index_state_query = '''SELECT i.indisvalid
+FROM pg_catalog.pg_index i
+JOIN pg_catalog.pg_class c ON c.oid = i.indexrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = %s AND c.relname = %s'''
+
+_index_attached_query = '''SELECT 1 FROM pg_catalog.pg_inherits
+WHERE inhrelid = %s::regclass AND inhparent = %s::regclass'''
+
+def partition_index_name(index_name: str, partition_name: str) -> str:
+    name = f'{partition_name}_{index_name}'
+
+    if len(name.encode('utf-8')) <= 63:
+        return name
+
+    # postgres truncates identifiers at 63 bytes, so keep a hash of the full name to stay unique
+    digest = hashlib.md5(name.encode('utf-8')).hexdigest()[:8]
+    return f'{name.encode("utf-8")[:54].decode("utf-8", "ignore")}_{digest}'
+
+def _index_name_for(index: 'PartitionedIndex', partition: _Partition) -> str:
+    if partition.parent_oid is None:
+        return index.name
+
+    return partition_index_name(index.name, partition.name)
+
+def _load_partition_tree(conn, table: str) -> list[_Partition]:
+    with conn.cursor() as cur:
+        cur.execute(_partition_tree_query, (table,))
+        return [_Partition(*row) for row in cur.fetchall()]
+
+def _build_leaf_index(conn, index: 'PartitionedIndex', leaf: _Partition, retries: int):
+    index_name = _index_name_for(index, leaf)
+
+    for attempt in range(retries + 1):
+        try:
+            with conn.cursor() as cur:
+                cur.execute(_index_state_query, (leaf.schema, index_name))
+                state = cur.fetchone()
+
+                if state is not None and state[0]:
+                    # built by an earlier, interrupted run
+                    return
+
+                if state is not None:
+                    cur.execute(sql.SQL('DROP INDEX CONCURRENTLY IF EXISTS {}').format(sql.Identifier(leaf.schema, index_name)))
+
+                cur.execute(sql.SQL('CREATE UNIQUE INDEX CONCURRENTLY {} ON {} {}' if index.unique else 'CREATE INDEX CONCURRENTLY {} ON {} {}').format(
+                    sql.Identifier(index_name),
+                    sql.Identifier(leaf.schema, leaf.name),
+                    sql.SQL(index.definition)
+                ))
+
+            return
+        except psycopg2.Error:
+            if attempt == retries or conn.closed:
+                raise
+
+def _attach_indexes(conn, index: 'PartitionedIndex', partitions: list[_Partition]):
+    nodes = [partition for partition in partitions if not partition.is_leaf]
+    nodes.sort(key=lambda partition: partition.level, reverse=True)
+
+    with conn.cursor() as cur:
+        for node in nodes:
+            node_index = sql.Identifier(node.schema, _index_name_for(index, node))
+
+            cur.execute(sql.SQL('CREATE UNIQUE INDEX IF NOT EXISTS {} ON ONLY {} {}' if index.unique else 'CREATE INDEX IF NOT EXISTS {} ON ONLY {} {}').format(
+                sql.Identifier(_index_name_for(index, node)),
+                sql.Identifier(node.schema, node.name),
+                sql.SQL(index.definition)
+            ))
+
+            for child in partitions:
+                if child.parent_oid != node.oid:
+                    continue
+
+                child_index = sql.Identifier(child.schema, _index_name_for(index, child))
+
+                cur.execute(_index_attached_query, (child_index.as_string(conn), node_index.as_string(conn)))
+
+                if cur.fetchone() is None:
+                    cur.execute(sql.SQL('ALTER INDEX {} ATTACH PARTITION {}').format(node_index, child_index))
+
+def build_partitioned_index(conn, index: 'PartitionedIndex', settings: PartitionSettings, connect: typing.Callable[[], typing.Any] | None):
+    partitions = _load_partition_tree(conn, index.table)
+    # a plain table is its own single leaf and simply gets a concurrent index
+    leaves = [partition for partition in partitions if partition.is_leaf]
+
+    lock = threading.Lock()
+    completed = 0
+
+    def _report(leaf: _Partition):
+        nonlocal completed
+
+        with lock:
+            completed += 1
+
+            if settings.on_progress is not None:
+                settings.on_progress(PartitionProgress(index=index.name, partition=leaf.name, completed=completed, total=len(leaves)))
+
+    if connect is None or settings.workers == 1:
+        for leaf in leaves:
+            _build_leaf_index(conn, index, leaf, settings.retries)
+            _report(leaf)
+    else:
+        remaining = list(reversed(leaves))
+        failed = threading.Event()
+
+        def _worker():
+            with contextlib.closing(connect()) as worker_conn:
+                worker_conn.autocommit = True
+
+                while not failed.is_set():
+                    with lock:
+                        if len(remaining) == 0:
+                            return
+
+                        leaf = remaining.pop()
+
+                    try:
+                        _build_leaf_index(worker_conn, index, leaf, settings.retries)
+                    except Exception:
+                        failed.set()
+                        raise
+
+                    _report(leaf)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=settings.workers) as pool:
+            futures = [pool.submit(_worker) for _ in range(min(settings.workers, max(len(leaves), 1)))]
+
+        for future in futures:
+            future.result()
+
+    _attach_indexes(conn, index, partitions)
@@ -0,0 +1,273 @@
+import contextlib
+import json
+import re
+import typing
+import psycopg2
+import psycopg2.extensions
+import pydantic
+from psycopg2 import sql
+
+from magistrate.db import ExecutionOptions, apply_settings, check_migration_settings, default_allowed_settings, execute_statement, get_current_migration_version_conn, prepare_migration_table_conn
+from magistrate.dbexc import DowngradeIncompatible, DryRunNotTransactional, MigrationFailed
+from magistrate.exc import InvalidHotQueries
+from magistrate.execution import MigrationParameters, execute_migration, resolve_target_version
+from magistrate.maintenance import record_touched_tables, resolve_touched_tables
+from magistrate.parser import is_query_end
+
+class HotQuery(pydantic.BaseModel):
+    name: str
+    query: str
+
+    # bound client-side, so the planner sees them as constants like a custom plan would
+    params: list[typing.Any] | None = None
+
+class ScanNode(pydantic.BaseModel):
+    relation: str
+    node_type: str
+    index: str | None = None
+
+    def __str__(self):
+        return self.node_type if self.index is None else f'{self.node_type} using {self.index}'
+
+class QueryPlan(pydantic.BaseModel):
+    name: str
+    total_cost: float | None = None
+    scans: list[ScanNode] = []
+
+    # set instead of a plan when the query no longer plans, e.g. after a dropped column
+    error: str | None = None
+
+class PlanRegression(pydantic.BaseModel):
+    name: str
+    kind: typing.Literal['seq_scan', 'cost', 'error']
+    detail: str
+
+    def __str__(self):
+        return f'{self.name}: {self.detail}'
+
+class PlanGuardSettings(pydantic.BaseModel):
+    queries: list[HotQuery]
+
+    # flag queries whose estimated total cost grew by more than this factor
+    cost_ratio: float = 2.0
+
+    # apply the migrations in a transaction that is rolled back after planning, instead of for real on a staging copy
+    dry_run: bool = True
+
+    # refresh statistics of touched tables inside the dry run, so backfills show up in the estimates
+    analyze: bool = True
+
+    @pydantic.model_validator(mode='after')
+    def _validate_plan_guard_settings(self) -> 'PlanGuardSettings':
+        if self.cost_ratio <= 1:
+            raise ValueError('Cost ratio must be above 1')
+
+        return self
+
+class PlanReport(pydantic.BaseModel):
+    version_before: int
+    version_after: int
+    before: list[QueryPlan]
+    after: list[QueryPlan]
+    regressions: list[PlanRegression]
+
+_index_node_types = {'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan'}
+
+def parse_hot_queries(text: str) -> list[HotQuery]:
+    queries: list[HotQuery] = []
+    name: str | None = None
+    params: list[typing.Any] | None = None
+    accum: list[str] = []
+
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+
+        if len(accum) == 0 and (name_match := re.search(r'^--\s*query:\s*(\S+)\s*$', stripped)):
+            if name is not None:
+                raise InvalidHotQueries(f'query {name} has no statement')
+
+            if any(query.name == name_match.group(1) for query in queries):
+                raise InvalidHotQueries(f'query {name_match.group(1)} is declared more than once')
+
+            name = name_match.group(1)
+        elif len(accum) == 0 and (params_match := re.search(r'^--\s*params:\s*(.*)$', stripped)):
+            if name is None:
+                raise InvalidHotQueries('params must follow a "-- query:" line')
+
+            try:
+                params = json.loads(params_match.group(1))
+            except json.JSONDecodeError:
+                params = None
+
+            if not isinstance(params, list):
+                raise InvalidHotQueries(f'params of query {name} are not a JSON array')
+        elif len(accum) == 0 and (stripped == '' or stripped.startswith('--')):
+            continue
+        else:
+            if name is None:
+                raise InvalidHotQueries(f'statement {repr(stripped)} has no "-- query:" name')
+
+            accum.append(line)
+
+            if is_query_end(line):
+                queries.append(HotQuery(name=name, query=''.join(accum).strip(), params=params))
+                name, params, accum = None, None, []
+
+    if len(accum) > 0 or name is not None:
+        raise InvalidHotQueries(f'query {name} was not terminated with a semicolon')
+
+    return queries
+
+def load_hot_queries(filename: str) -> list[HotQuery]:
+    with open(filename, 'r') as f:
+        return parse_hot_queries(f.read())
+
+def _collect_scans(node: dict[str, typing.Any], scans: list[ScanNode]):
+    if 'Relation Name' in node:
+        scans.append(ScanNode(relation=node['Relation Name'], node_type=node['Node Type'], index=node.get('Index Name')))
+
+    for child in node.get('Plans', []):
+        _collect_scans(child, scans)
+
+def explain_query(cur, query: HotQuery) -> QueryPlan:
+    # a savepoint keeps a query that fails to plan from aborting a dry run's transaction
+    cur.execute('SAVEPOINT magistrate_explain')
+
+    try:
+        cur.execute('EXPLAIN (FORMAT JSON) ' + query.query.rstrip().rstrip(';'), query.params)
+    except psycopg2.Error as ex:
+        cur.execute('ROLLBACK TO SAVEPOINT magistrate_explain')
+        return QueryPlan(name=query.name, error=str(ex).strip())
+
+    result = cur.fetchone()[0]
+    cur.execute('RELEASE SAVEPOINT magistrate_explain')
+
+    plan = (json.loads(result) if isinstance(result, str) else result)[0]['Plan']
+    scans: list[ScanNode] = []
+    _collect_scans(plan, scans)
+
+    return QueryPlan(name=query.name, total_cost=plan['Total Cost'], scans=scans)
+
+def capture_plans_conn(conn, queries: list[HotQuery]) -> list[QueryPlan]:
+    was_idle = conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    with conn.cursor() as cur:
+        plans = [explain_query(cur, query) for query in queries]
+
+    if was_idle:
+        conn.rollback()
+
+    return plans
+
+def compare_plans(before: list[QueryPlan], after: list[QueryPlan], cost_ratio: float) -> list[PlanRegression]:
+    regressions: list[PlanRegression] = []
+    plans_before = {plan.name: plan for plan in before}
+
+    for plan in after:
+        old = plans_before.get(plan.name)
+
+        if old is None or old.error is not None:
+            continue
+
+        if plan.error is not None:
+            regressions.append(PlanRegression(name=plan.name, kind='error', detail=f'no longer plans: {plan.error}'))
+            continue
+
+        for relation in sorted({scan.relation for scan in plan.scans}):
+            old_scans = [scan for scan in old.scans if scan.relation == relation]
+            new_scans = [scan for scan in plan.scans if scan.relation == relation]
+
+            used_index = any(scan.node_type in _index_node_types for scan in old_scans)
+            seq_before = any(scan.node_type == 'Seq Scan' for scan in old_scans)
+            seq_after = any(scan.node_type == 'Seq Scan' for scan in new_scans)
+
+            if used_index and not seq_before and seq_after:
+                old_access = ', '.join(str(scan) for scan in old_scans if scan.node_type in _index_node_types)
+                regressions.append(PlanRegression(name=plan.name, kind='seq_scan', detail=f'{relation} switched from {old_access} to Seq Scan'))
+
+        old_cost = old.total_cost or 0.0
+        new_cost = plan.total_cost or 0.0
+
+        if new_cost > old_cost * cost_ratio and new_cost > 0:
+            regressions.append(PlanRegression(name=plan.name, kind='cost', detail=f'estimated cost grew from {old_cost:.2f} to {new_cost:.2f}'))
+
+    return regressions
+
+def _dry_run_conn(conn, current_version: int, target_version: int, migrations: list, settings: PlanGuardSettings, allowed_settings: typing.AbstractSet[str], analyzed: set[str]) -> list[QueryPlan]:
+    for mig in migrations:
+        if not mig.transactional:
+            raise DryRunNotTransactional(mig.version)
+
+        if target_version < current_version and not mig.backwards_compatible:
+            raise DowngradeIncompatible(current_version, mig.version, target_version)
+
+        check_migration_settings(mig, allowed_settings)
+
+    options = ExecutionOptions(allowed_settings=allowed_settings)
+    touched: set[str] = set()
+
+    with conn.cursor() as cur:
+        for mig in migrations:
+            queries = mig.up_queries if target_version > current_version else mig.down_queries
+
+            try:
+                # SET LOCAL like a real run, restored afterwards since every migration shares this transaction
+                previous = apply_settings(conn, mig.settings, is_local=True)
+
+                for statement in record_touched_tables(queries, touched):
+                    execute_statement(conn, cur, statement, options)
+
+                apply_settings(conn, previous, is_local=True)
+            except Exception as ex:
+                raise MigrationFailed.from_cause(current_version, mig.version, target_version, current_version, ex) from ex
+
+        if settings.analyze and len(touched) > 0:
+            # ANALYZE writes pg_class.reltuples and relpages in place, which the rollback does not undo
+            analyzed.update(touched)
+
+            for _, schema, name, _, _ in resolve_touched_tables(cur, touched):
+                cur.execute(sql.SQL('ANALYZE {}').format(sql.Identifier(schema, name)))
+
+    return capture_plans_conn(conn, settings.queries)
+
+def _reanalyze_conn(conn, analyzed: set[str]):
+    # analyzes the tables again after the rollback, so the live statistics describe the real data once more
+    with conn.cursor() as cur:
+        for _, schema, name, _, _ in resolve_touched_tables(cur, analyzed):
+            cur.execute(sql.SQL('ANALYZE {}').format(sql.Identifier(schema, name)))
+
+    conn.commit()
+
+def check_plan_regressions(params: MigrationParameters, settings: PlanGuardSettings) -> PlanReport:
+    with contextlib.closing(psycopg2.connect(params.connection_string)) as conn:
+        prepare_migration_table_conn(conn)
+        current_version = get_current_migration_version_conn(conn)
+        target_version = resolve_target_version(params.migration_type, current_version, params.migration_source.highest_version())
+
+        before = capture_plans_conn(conn, settings.queries)
+
+        if settings.dry_run:
+            migrations = params.migration_source.select_migrations(current_version, target_version)
+            analyzed: set[str] = set()
+
+            try:
+                # holds every lock the migrations take until the rollback, so keep dry runs off busy primaries
+                allowed_settings = params.allowed_settings if params.allowed_settings is not None else default_allowed_settings
+                after = _dry_run_conn(conn, current_version, target_version, migrations, settings, allowed_settings, analyzed)
+            finally:
+                conn.rollback()
+
+            if len(analyzed) > 0:
+                _reanalyze_conn(conn, analyzed)
+        else:
+            conn.rollback()
+            target_version = execute_migration(params)
+            after = capture_plans_conn(conn, settings.queries)
+
+    return PlanReport(
+        version_before=current_version,
+        version_after=target_version,
+        before=before,
+        after=after,
+        regressions=compare_plans(before, after, settings.cost_ratio)
+    )
@@ -0,0 +1,267 @@
+import contextlib
+import os
+import re
+import typing
+import psycopg2
+import psycopg2.extensions
+import pydantic
+
+from magistrate.db import get_applied_versions_conn, get_current_migration_version_conn, prepare_migration_table_conn
+from magistrate.dbexc import PreflightRejected
+from magistrate.maintenance import qualified_name_pattern, statement_tables
+
+if typing.TYPE_CHECKING:
+    from magistrate.execution import MigrationParameters
+    from magistrate.parser import Migration, Statement, StreamingMigration
+
+Operation = typing.Literal['rewrite', 'index_build', 'scan', 'update', 'delete', 'copy', 'other']
+
+class TableSize(pydantic.BaseModel):
+    table: str
+
+    # False for tables a pending migration creates, which are estimated as empty
+    exists: bool
+    heap_bytes: int = 0
+    index_bytes: int = 0
+    rows: int = 0
+
+class StatementEstimate(pydantic.BaseModel):
+    index: int
+    operation: Operation
+    tables: list[TableSize]
+    seconds: float
+    extra_bytes: int
+
+    # the old copy of a rewritten table is released when the migration commits
+    transient: bool = False
+
+class VersionEstimate(pydantic.BaseModel):
+    version: int
+    statements: list[StatementEstimate]
+    seconds: float
+    extra_bytes: int
+
+class PreflightReport(pydantic.BaseModel):
+    versions: list[VersionEstimate]
+    seconds: float
+    peak_extra_bytes: int
+
+    # why the run was refused, empty when it may go ahead
+    rejections: list[str] = []
+
+class PreflightSettings(pydantic.BaseModel):
+    # refuse to start when the estimates exceed these
+    time_budget_seconds: float | None = None
+    free_bytes: int | None = None
+
+    # rough throughputs of a modest server, calibrate them against --validate timings of real migrations
+    scan_bytes_per_second: float = 200 * 1024 * 1024
+    write_bytes_per_second: float = 50 * 1024 * 1024
+    index_bytes_per_second: float = 40 * 1024 * 1024
+
+    # size of a new index relative to its table's heap, including the sort spilling to temp files
+    index_size_ratio: float = 0.5
+
+    on_report: typing.Callable[[PreflightReport], None] | None = None
+
+    @pydantic.model_validator(mode='after')
+    def _validate_preflight_settings(self) -> 'PreflightSettings':
+        if min(self.scan_bytes_per_second, self.write_bytes_per_second, self.index_bytes_per_second) <= 0:
+            raise ValueError('Throughputs must be above zero')
+
+        return self
+
+_alter_table = r'\bALTER\s+TABLE\b'
+
+_operation_patterns: list[tuple[Operation, re.Pattern]] = [
+    ('index_build', re.compile(r'\bCREATE\s+(?:UNIQUE\s+)?INDEX\b|\bREINDEX\b', re.IGNORECASE)),
+    ('index_build', re.compile(_alter_table + r'.*\bADD\s+(?:CONSTRAINT\s+\S+\s+)?(?:PRIMARY\s+KEY|UNIQUE)\b', re.IGNORECASE | re.DOTALL)),
+    ('rewrite', re.compile(r'^\s*(?:VACUUM\s+(?:\(\s*)?FULL\b|CLUSTER\b|REFRESH\s+MATERIALIZED\s+VIEW\b)', re.IGNORECASE)),
+    ('rewrite', re.compile(
+        _alter_table + r'.*(?:\bALTER\s+(?:COLUMN\s+)?\S+\s+(?:SET\s+DATA\s+)?TYPE\b|\bSET\s+(?:LOGGED|UNLOGGED|ACCESS\s+METHOD)\b'
+        r'|\bGENERATED\s+ALWAYS\s+AS\b.*\bSTORED\b|\bDEFAULT\s+(?:random|clock_timestamp|gen_random_uuid|uuid_generate_v4)\s*\()',
+        re.IGNORECASE | re.DOTALL
+    )),
+    ('scan', re.compile(_alter_table + r'.*(?:\bSET\s+NOT\s+NULL\b|\bVALIDATE\s+CONSTRAINT\b|\bADD\s+(?:CONSTRAINT\s+\S+\s+)?(?:CHECK|FOREIGN\s+KEY)\b(?!.*\bNOT\s+VALID\b))', re.IGNORECASE | re.DOTALL)),
+    ('update', re.compile(r'^\s*(?:WITH\b.*)?\bUPDATE\b', re.IGNORECASE | re.DOTALL)),
+    ('delete', re.compile(r'^\s*(?:WITH\b.*)?\bDELETE\s+FROM\b', re.IGNORECASE | re.DOTALL)),
+]
+
+_line_comment = re.compile(r'--[^\n]*')
+
+# rewrites the maintenance patterns leave out, since ANALYZE after them is pointless
+_rewritten_table_pattern = re.compile(rf'\b(?:VACUUM\s+(?:\(\s*)?FULL\s*\)?|CLUSTER|REINDEX\s+TABLE(?:\s+CONCURRENTLY)?|REFRESH\s+MATERIALIZED\s+VIEW(?:\s+CONCURRENTLY)?)\s+{qualified_name_pattern}', re.IGNORECASE)
+
+# partitioned tables are sized by all of their partitions, pg_partition_tree has no rows for materialized views
+_table_sizes_query = '''SELECT t.name, sum(pg_catalog.pg_relation_size(p.relid)), sum(pg_catalog.pg_indexes_size(p.relid)), sum(GREATEST(pc.reltuples, 0))
+FROM unnest(%s::text[]) t(name)
+JOIN pg_catalog.pg_class c ON c.oid = pg_catalog.to_regclass(t.name)
+CROSS JOIN LATERAL (SELECT relid FROM pg_catalog.pg_partition_tree(c.oid) UNION SELECT c.oid) p(relid)
+JOIN pg_catalog.pg_class pc ON pc.oid = p.relid
+WHERE c.relkind IN ('r', 'p', 'm')
+GROUP BY t.name'''
+
+def classify_statement(statement: 'Statement') -> Operation:
+    if not isinstance(statement, str):
+        return 'copy' if statement.kind == 'copy' else 'index_build'
+
+    text = _line_comment.sub('', statement)
+
+    for operation, pattern in _operation_patterns:
+        if pattern.search(text):
+            return operation
+
+    return 'other'
+
+def format_bytes(size: float) -> str:
+    for unit in ['bytes', 'kB', 'MB', 'GB']:
+        if abs(size) < 1024:
+            return f'{size:.0f} {unit}' if unit == 'bytes' else f'{size:.1f} {unit}'
+
+        size /= 1024
+
+    return f'{size:.1f} TB'
+
+def _statement_tables(statement: 'Statement') -> set[str]:
+    tables = statement_tables(statement)
+
+    if isinstance(statement, str):
+        for match in _rewritten_table_pattern.finditer(_line_comment.sub('', statement)):
+            tables.add(re.sub(r'\s*\.\s*', '.', match.group(1)))
+
+    return tables
+
+def _copy_bytes(statement: 'Statement') -> int:
+    if isinstance(statement, str) or statement.kind != 'copy':
+        return 0
+
+    if statement.filename is not None:
+        # compressed data files are counted at their compressed size
+        return os.path.getsize(statement.filename) if os.path.exists(statement.filename) else 0
+
+    return statement.rows_size()
+
+def read_table_sizes_conn(conn, tables: set[str]) -> dict[str, TableSize]:
+    was_idle = conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    with conn.cursor() as cur:
+        cur.execute(_table_sizes_query, (sorted(tables),))
+        rows = cur.fetchall()
+
+    if was_idle:
+        conn.rollback()
+
+    sizes = {table: TableSize(table=table, exists=False) for table in tables}
+
+    for table, heap_bytes, index_bytes, row_estimate in rows:
+        sizes[table] = TableSize(table=table, exists=True, heap_bytes=heap_bytes, index_bytes=index_bytes, rows=int(row_estimate))
+
+    return sizes
+
+def estimate_statement(index: int, statement: 'Statement', sizes: dict[str, TableSize], settings: PreflightSettings) -> StatementEstimate:
+    operation = classify_statement(statement)
+    tables = [sizes[table] for table in sorted(_statement_tables(statement))]
+
+    heap_bytes = sum(table.heap_bytes for table in tables)
+    index_bytes = sum(table.index_bytes for table in tables)
+
+    seconds = 0.0
+    extra_bytes = 0
+
+    if operation == 'rewrite':
+        seconds = (heap_bytes + index_bytes) / settings.write_bytes_per_second
+        extra_bytes = heap_bytes + index_bytes
+    elif operation == 'index_build':
+        seconds = heap_bytes / settings.index_bytes_per_second
+        extra_bytes = int(heap_bytes * settings.index_size_ratio)
+    elif operation == 'scan':
+        seconds = heap_bytes / settings.scan_bytes_per_second
+    elif operation == 'update':
+        # assumes every row gets a new version, the WHERE clause is not estimated
+        seconds = (heap_bytes + index_bytes) / settings.write_bytes_per_second
+        extra_bytes = heap_bytes + index_bytes
+    elif operation == 'delete':
+        seconds = heap_bytes / settings.write_bytes_per_second
+    elif operation == 'copy':
+        extra_bytes = _copy_bytes(statement)
+        seconds = extra_bytes / settings.write_bytes_per_second
+
+    return StatementEstimate(
+        index=index,
+        operation=operation,
+        tables=tables,
+        seconds=seconds,
+        extra_bytes=extra_bytes,
+        transient=operation == 'rewrite'
+    )
+
+def estimate_migrations_conn(conn, migrations: list['Migration | StreamingMigration'], direction: str, settings: PreflightSettings) -> PreflightReport:
+    def _statements(mig: 'Migration | StreamingMigration') -> typing.Iterable['Statement']:
+        # streaming migrations are read twice rather than held in memory
+        return mig.up_queries if direction == 'up' else mig.down_queries
+
+    tables: set[str] = set()
+
+    for mig in migrations:
+        for statement in _statements(mig):
+            tables.update(_statement_tables(statement))
+
+    sizes = read_table_sizes_conn(conn, tables) if len(tables) > 0 else {}
+
+    versions: list[VersionEstimate] = []
+    persistent_bytes = 0
+    peak_extra_bytes = 0
+
+    for mig in migrations:
+        estimates = [estimate_statement(i, statement, sizes, settings) for i, statement in enumerate(_statements(mig))]
+        extra_bytes = sum(estimate.extra_bytes for estimate in estimates)
+
+        # rewrites give their old copy back on commit, new indexes and row versions stay until a vacuum
+        peak_extra_bytes = max(peak_extra_bytes, persistent_bytes + extra_bytes)
+        persistent_bytes += sum(estimate.extra_bytes for estimate in estimates if not estimate.transient)
+
+        versions.append(VersionEstimate(
+            version=mig.version,
+            statements=estimates,
+            seconds=sum(estimate.seconds for estimate in estimates),
+            extra_bytes=extra_bytes
+        ))
+
+    report = PreflightReport(
+        versions=versions,
+        seconds=sum(version.seconds for version in versions),
+        peak_extra_bytes=peak_extra_bytes
+    )
+
+    if settings.time_budget_seconds is not None and report.seconds > settings.time_budget_seconds:
+        report.rejections.append(f'estimated duration {report.seconds:.0f}s exceeds the time budget of {settings.time_budget_seconds:.0f}s')
+
+    if settings.free_bytes is not None and report.peak_extra_bytes > settings.free_bytes:
+        report.rejections.append(f'estimated peak of {format_bytes(report.peak_extra_bytes)} extra disk space exceeds the {format_bytes(settings.free_bytes)} free')
+
+    return report
+
+def check_preflight_conn(conn, migrations: list['Migration | StreamingMigration'], direction: str, settings: PreflightSettings) -> PreflightReport:
+    report = estimate_migrations_conn(conn, migrations, direction, settings)
+
+    if settings.on_report is not None:
+        settings.on_report(report)
+
+    if len(report.rejections) > 0:
+        raise PreflightRejected(report.rejections)
+
+    return report
+
+def preflight_migration(params: 'MigrationParameters', settings: PreflightSettings) -> PreflightReport:
+    # execution imports this module for its own pre-flight check
+    from magistrate.execution import resolve_target_version
+
+    with contextlib.closing(psycopg2.connect(params.connection_string)) as conn:
+        prepare_migration_table_conn(conn)
+        current_version = get_current_migration_version_conn(conn)
+        target_version = resolve_target_version(params.migration_type, current_version, params.migration_source.highest_version())
+
+        applied = get_applied_versions_conn(conn)
+        migrations = [mig for mig in params.migration_source.select_migrations(current_version, target_version) if mig.version not in applied]
+
+        return estimate_migrations_conn(conn, migrations, 'down' if target_version < current_version else 'up', settings)
@@ -0,0 +1,135 @@
+import contextlib
+import threading
+import time
+import typing
+import pydantic
+
+# blocks while a table is scanned, tuples while they are loaded into the index
+_create_index_query = '''SELECT command, phase, NULLIF(relid, 0)::regclass::text,
+    CASE WHEN blocks_total > 0 THEN blocks_done ELSE tuples_done END,
+    CASE WHEN blocks_total > 0 THEN blocks_total ELSE tuples_total END
+FROM pg_catalog.pg_stat_progress_create_index WHERE pid = %(pid)s'''
+
+_cluster_query = '''SELECT command, phase, NULLIF(relid, 0)::regclass::text, heap_blks_scanned, heap_blks_total
+FROM pg_catalog.pg_stat_progress_cluster WHERE pid = %(pid)s'''
+
+_copy_query = '''SELECT command, 'copying', NULLIF(relid, 0)::regclass::text, bytes_processed, bytes_total
+FROM pg_catalog.pg_stat_progress_copy WHERE pid = %(pid)s'''
+
+class StatementProgress(pydantic.BaseModel):
+    version: int
+
+    # e.g. CREATE INDEX CONCURRENTLY, CLUSTER, VACUUM FULL or COPY FROM
+    command: str
+    relation: str | None
+    phase: str
+
+    # percent and ETA cover the current phase, since every phase counts different units
+    done: int
+    total: int
+    percent: float | None
+    eta_seconds: float | None
+    elapsed_seconds: float
+
+    # sent once after the command's progress row disappeared
+    finished: bool = False
+
+class ProgressSettings(pydantic.BaseModel):
+    on_progress: typing.Callable[[StatementProgress], None]
+    poll_interval: float = 1.0
+
+class _PhaseStart(typing.NamedTuple):
+    key: tuple[str, str | None, str]
+    started: float
+    done: int
+
+class ProgressReporter:
+    def __init__(self, settings: ProgressSettings, connect: typing.Callable[[], typing.Any], backend_pid: int, version: int):
+        self.settings: ProgressSettings = settings
+        self.backend_pid: int = backend_pid
+        self.version: int = version
+
+        self._connect = connect
+        self._conn: typing.Any = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+        self._command_started: float = 0.0
+        self._phase: _PhaseStart | None = None
+        self._last: StatementProgress | None = None
+
+    def __enter__(self) -> 'ProgressReporter':
+        self._conn = self._connect()
+        self._conn.autocommit = True
+        self._thread.start()
+
+        return self
+
+    def __exit__(self, *args):
+        self._stopped.set()
+        self._thread.join()
+        self._conn.close()
+
+    def _query(self) -> str:
+        queries = [_create_index_query, _cluster_query]
+
+        # pg_stat_progress_copy only exists from postgres 14 on
+        if self._conn.server_version >= 140000:
+            queries.append(_copy_query)
+
+        return '\nUNION ALL\n'.join(queries)
+
+    def _progress(self, command: str, phase: str, relation: str | None, done: int, total: int) -> StatementProgress:
+        now = time.monotonic()
+        key = (command, relation, phase)
+
+        if self._last is None or (self._last.command, self._last.relation) != (command, relation):
+            self._command_started = now
+
+        if self._phase is None or self._phase.key != key:
+            self._phase = _PhaseStart(key, now, done)
+
+        eta: float | None = None
+        phase_done = done - self._phase.done
+
+        if total > 0 and phase_done > 0:
+            eta = (now - self._phase.started) / phase_done * max(total - done, 0)
+
+        return StatementProgress(
+            version=self.version,
+            command=command,
+            relation=relation,
+            phase=phase,
+            done=done,
+            total=total,
+            percent=min(100.0, 100.0 * done / total) if total > 0 else None,
+            eta_seconds=eta,
+            elapsed_seconds=now - self._command_started
+        )
+
+    def _report(self, progress: StatementProgress | None):
+        if progress is None and self._last is not None:
+            self.settings.on_progress(self._last.model_copy(update={'finished': True}))
+            self._phase = None
+        elif progress is not None:
+            if self._last is not None and (self._last.command, self._last.relation) != (progress.command, progress.relation):
+                self.settings.on_progress(self._last.model_copy(update={'finished': True}))
+
+            self.settings.on_progress(progress)
+
+        self._last = progress
+
+    def _run(self):
+        # losing the progress connection must not fail the migration itself
+        with contextlib.suppress(Exception), self._conn.cursor() as cur:
+            query = self._query()
+
+            while not self._stopped.wait(self.settings.poll_interval):
+                cur.execute(query, {'pid': self.backend_pid})
+                row = cur.fetchone()
+
+                self._report(None if row is None else self._progress(row[0], row[1], row[2], int(row[3] or 0), int(row[4] or 0)))
+
+            # the last command ended after the final poll, or was cut short by an error
+            if self._last is not None:
+                self._report(None)
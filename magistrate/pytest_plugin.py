@@ -0,0 +1,38 @@
+import os
+import pytest
+
+def pytest_addoption(parser):
+    parser.addini('magistrate_migrations', 'Directory of .mig.sql files used to build the template database')
+    parser.addini('magistrate_connection_string', 'Maintenance database used to create test databases, defaults to $POSTGRES')
+    parser.addini('magistrate_template_prefix', 'Name prefix of template and test databases', default='magistrate_template')
+
+    parser.addoption('--magistrate-migrations', default=None, help='Overrides the magistrate_migrations ini option')
+
+@pytest.fixture(scope='session')
+def magistrate_template(pytestconfig):
+    from magistrate.execution import DirectorySource
+    from magistrate.testing import TemplateDatabase
+
+    directory = pytestconfig.getoption('magistrate_migrations') or pytestconfig.getini('magistrate_migrations')
+    conn_string = pytestconfig.getini('magistrate_connection_string') or os.environ.get('POSTGRES')
+
+    if not directory or not conn_string:
+        pytest.skip('magistrate_migrations and magistrate_connection_string (or $POSTGRES) must be set')
+
+    template = TemplateDatabase(
+        connection_string=conn_string,
+        migration_source=DirectorySource(directory=os.path.join(str(pytestconfig.rootpath), directory)),
+        prefix=pytestconfig.getini('magistrate_template_prefix')
+    )
+
+    template.ensure()
+
+    return template
+
+@pytest.fixture(scope='function')
+def magistrate_db(magistrate_template):
+    conn_string = magistrate_template.create_database()
+
+    yield conn_string
+
+    magistrate_template.drop_database(conn_string)
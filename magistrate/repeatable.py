@@ -0,0 +1,102 @@
+import heapq
+import psycopg2
+
+from magistrate.dbexc import RepeatableMigrationFailed
+from magistrate.exc import RepeatableDependencyCycle, UnknownRepeatableDependency
+from magistrate.parser import RepeatableMigration
+
+_create_repeatable_query = '''CREATE TABLE IF NOT EXISTS magistrate_repeatable (
+    name TEXT PRIMARY KEY,
+    checksum TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+)'''
+
+_record_repeatable_query = '''INSERT INTO magistrate_repeatable (name, checksum) VALUES (%s, %s)
+ON CONFLICT (name) DO UPDATE SET checksum = EXCLUDED.checksum, applied_at = now()'''
+
+def order_repeatable_migrations(migrations: list[RepeatableMigration]) -> list[RepeatableMigration]:
+    by_name = {mig.name: mig for mig in migrations}
+    dependents: dict[str, list[str]] = {name: [] for name in by_name}
+    remaining: dict[str, int] = {}
+
+    for mig in migrations:
+        for dependency in mig.depends:
+            if dependency not in by_name:
+                raise UnknownRepeatableDependency(mig.name, dependency)
+
+            dependents[dependency].append(mig.name)
+
+        remaining[mig.name] = len(mig.depends)
+
+    # names break ties, so the order only changes when the files do
+    ready = [name for name, count in remaining.items() if count == 0]
+    heapq.heapify(ready)
+
+    ordered: list[RepeatableMigration] = []
+
+    while len(ready) > 0:
+        name = heapq.heappop(ready)
+        ordered.append(by_name[name])
+
+        for dependent in dependents[name]:
+            remaining[dependent] -= 1
+
+            if remaining[dependent] == 0:
+                heapq.heappush(ready, dependent)
+
+    if len(ordered) != len(migrations):
+        raise RepeatableDependencyCycle(sorted(name for name, count in remaining.items() if count > 0))
+
+    return ordered
+
+def select_changed_repeatable_migrations(migrations: list[RepeatableMigration], applied: dict[str, str]) -> list[RepeatableMigration]:
+    ordered = order_repeatable_migrations(migrations)
+    changed: set[str] = set()
+
+    for mig in ordered:
+        # dependents are re-applied too, e.g. views on top of a view whose columns changed
+        if applied.get(mig.name) != mig.checksum or any(dependency in changed for dependency in mig.depends):
+            changed.add(mig.name)
+
+    return [mig for mig in ordered if mig.name in changed]
+
+def get_applied_repeatable_conn(conn) -> dict[str, str]:
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('magistrate_repeatable') IS NOT NULL")
+
+        if not cur.fetchone()[0]:
+            conn.rollback()
+            return {}
+
+        cur.execute('SELECT name, checksum FROM magistrate_repeatable')
+        applied = dict(cur.fetchall())
+
+    conn.rollback()
+
+    return applied
+
+def apply_repeatable_migrations_conn(conn, migrations: list[RepeatableMigration]) -> list[str]:
+    changed = select_changed_repeatable_migrations(migrations, get_applied_repeatable_conn(conn))
+
+    if len(changed) == 0:
+        return []
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute(_create_repeatable_query)
+
+            for mig in changed:
+                try:
+                    if mig.body.strip() != '':
+                        cur.execute(mig.body)
+                except psycopg2.Error as ex:
+                    raise RepeatableMigrationFailed(mig.name) from ex
+
+                cur.execute(_record_repeatable_query, (mig.name, mig.checksum))
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return [mig.name for mig in changed]
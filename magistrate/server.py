@@ -0,0 +1,291 @@
+import contextlib
+import http.server
+import ipaddress
+import json
+import os
+import socketserver
+import threading
+import typing
+import urllib.parse
+import psycopg2.pool
+import pydantic
+
+from magistrate.db import get_current_migration_version_conn
+from magistrate.dbexc import VersionTableNotFound
+from magistrate.exc import MigrationError
+from magistrate.execution import DirectorySource, HardcodedSource, MigrationParameters, VersionMigration, execute_migration, resolve_target_version
+from magistrate.fileio import is_migration_file
+from magistrate.parser import Migration
+
+def _is_loopback(host: str) -> bool:
+    if host == 'localhost':
+        return True
+
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+class ServerParameters(pydantic.BaseModel):
+    connection_string: str
+    migration_source: DirectorySource
+
+    host: str = '127.0.0.1'
+    port: int = 8642
+
+    # POST /migrate is unauthenticated, so anything but loopback has to be asked for explicitly
+    allow_remote: bool = False
+
+    # serves on this unix socket instead of host and port when set
+    unix_socket: str | None = None
+
+    pool_size: int = 4
+    watch_interval: float = 1.0
+
+    @pydantic.model_validator(mode='after')
+    def _validate_server_parameters(self) -> 'ServerParameters':
+        if self.pool_size < 1:
+            raise ValueError('At least one pooled connection is required')
+
+        if self.unix_socket is None and not self.allow_remote and not _is_loopback(self.host):
+            raise ValueError(f'Refusing to serve on non-loopback address {self.host} without allow_remote')
+
+        return self
+
+def _directory_signature(directory: str) -> tuple:
+    with os.scandir(directory) as entries:
+        return tuple(sorted(
+            (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+            for entry in entries if is_migration_file(entry.name)
+        ))
+
+class _SourceCache:
+    def __init__(self, source: DirectorySource):
+        # the cache keeps whole parsed migrations, streaming would re-read the files anyway
+        self._source: DirectorySource = source.model_copy(update={'streaming': False})
+        self._lock = threading.Lock()
+        self._signature: tuple | None = None
+        self._files: list[tuple[int, str]] = []
+        self._parsed: dict[int, Migration] = {}
+
+    def refresh(self):
+        signature = _directory_signature(self._source.directory)
+
+        with self._lock:
+            if signature == self._signature:
+                return
+
+            # any change drops every parsed file, edits to applied migrations are rare enough
+            self._files = self._source.discover()
+            self._parsed = {}
+            self._signature = signature
+
+    def highest_version(self) -> int:
+        with self._lock:
+            return self._files[-1][0] if len(self._files) > 0 else 0
+
+    def _parse(self, version: int) -> Migration:
+        if version not in self._parsed:
+            self._parsed[version] = typing.cast(Migration, self._source.load_migration(*self._files[version - 1]))
+
+        return self._parsed[version]
+
+    def snapshot(self) -> HardcodedSource:
+        with self._lock:
+            return HardcodedSource.trusted([self._parse(version) for version, _ in self._files])
+
+class MigrationServer:
+    def __init__(self, params: ServerParameters):
+        self.params: ServerParameters = params
+        self.cache = _SourceCache(params.migration_source)
+        self.pool = psycopg2.pool.ThreadedConnectionPool(1, params.pool_size, params.connection_string)
+
+        # migration runs are serialized, queries keep being answered while one is running
+        self.migration_lock = threading.Lock()
+        self.migrating: bool = False
+
+        self._stopped = threading.Event()
+        self._watcher = threading.Thread(target=self._watch, daemon=True)
+
+        self.cache.refresh()
+
+    def _watch(self):
+        while not self._stopped.wait(self.params.watch_interval):
+            try:
+                self.cache.refresh()
+            except (OSError, MigrationError):
+                # a half-written directory is picked up on the next poll
+                pass
+
+    def start(self):
+        self._watcher.start()
+
+    def close(self):
+        self._stopped.set()
+        self.pool.closeall()
+
+    @contextlib.contextmanager
+    def connection(self) -> typing.Iterator[typing.Any]:
+        conn = self.pool.getconn()
+
+        try:
+            yield conn
+        finally:
+            if not conn.closed:
+                conn.rollback()
+
+            self.pool.putconn(conn, close=bool(conn.closed))
+
+    def current_version(self) -> int:
+        # read-only like --get-version, probes must not run DDL or commit
+        with self.connection() as conn:
+            try:
+                return get_current_migration_version_conn(conn)
+            except VersionTableNotFound:
+                # never migrated, the first migration creates the table at version 0
+                return 0
+
+    def status(self) -> dict[str, typing.Any]:
+        current = self.current_version()
+        highest = self.cache.highest_version()
+
+        return {
+            'version': current,
+            'highest_version': highest,
+            'current': current == highest,
+            'migrating': self.migrating
+        }
+
+    def plan(self, target: int | typing.Literal['latest']) -> dict[str, typing.Any]:
+        current = self.current_version()
+        target_version = resolve_target_version(VersionMigration(target_version=target), current, self.cache.highest_version())
+
+        if target_version >= current:
+            versions = list(range(current + 1, target_version + 1))
+        else:
+            versions = list(range(current, target_version, -1))
+
+        return {
+            'version': current,
+            'target_version': target_version,
+            'direction': 'down' if target_version < current else 'up',
+            'versions': versions
+        }
+
+    def migrate(self, target: int | typing.Literal['latest']) -> dict[str, typing.Any]:
+        with self.migration_lock:
+            self.migrating = True
+
+            try:
+                version = execute_migration(MigrationParameters(
+                    connection_string=self.params.connection_string,
+                    migration_source=self.cache.snapshot(),
+                    migration_type=VersionMigration(target_version=target)
+                ))
+            finally:
+                self.migrating = False
+
+        return {'version': version}
+
+def _parse_target(query: dict[str, list[str]]) -> int | typing.Literal['latest']:
+    target = query.get('target', ['latest'])[0]
+
+    if target == 'latest':
+        return 'latest'
+
+    version = int(target)
+
+    if version < 0:
+        raise ValueError('Target version cannot be below zero')
+
+    return version
+
+class _RequestHandler(http.server.BaseHTTPRequestHandler):
+    server: typing.Any
+
+    def _respond(self, code: int, body: dict[str, typing.Any]):
+        data = json.dumps(body).encode('utf-8')
+
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, routes: dict[str, typing.Callable[[dict[str, list[str]]], dict[str, typing.Any]]]):
+        url = urllib.parse.urlparse(self.path)
+        route = routes.get(url.path)
+
+        if route is None:
+            self._respond(404, {'error': f'Unknown endpoint {url.path}'})
+            return
+
+        try:
+            self._respond(200, route(urllib.parse.parse_qs(url.query)))
+        except ValueError as ex:
+            self._respond(400, {'error': str(ex)})
+        except MigrationError as ex:
+            self._respond(409, {'error': str(ex), 'type': type(ex).__name__})
+        except Exception as ex:
+            self._respond(500, {'error': str(ex), 'type': type(ex).__name__})
+
+    def do_GET(self):
+        migration_server: MigrationServer = self.server.migration_server
+
+        self._handle({
+            '/version': lambda query: {'version': migration_server.current_version()},
+            '/status': lambda query: migration_server.status(),
+            '/plan': lambda query: migration_server.plan(_parse_target(query)),
+        })
+
+    def do_POST(self):
+        migration_server: MigrationServer = self.server.migration_server
+
+        self._handle({
+            '/migrate': lambda query: migration_server.migrate(_parse_target(query)),
+        })
+
+    def log_message(self, format: str, *args):
+        # the orchestrator polls constantly, request logs would drown everything else
+        pass
+
+class _HTTPServer(http.server.ThreadingHTTPServer):
+    migration_server: MigrationServer
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    migration_server: MigrationServer
+
+def create_server(params: ServerParameters) -> _HTTPServer | _UnixHTTPServer:
+    migration_server = MigrationServer(params)
+
+    try:
+        server: _HTTPServer | _UnixHTTPServer
+
+        if params.unix_socket is not None:
+            if os.path.exists(params.unix_socket):
+                os.unlink(params.unix_socket)
+
+            server = _UnixHTTPServer(params.unix_socket, _RequestHandler)
+        else:
+            server = _HTTPServer((params.host, params.port), _RequestHandler)
+    except Exception:
+        migration_server.close()
+        raise
+
+    server.migration_server = migration_server
+    migration_server.start()
+
+    return server
+
+def serve(params: ServerParameters):
+    server = create_server(params)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        server.migration_server.close()
+
+        if params.unix_socket is not None and os.path.exists(params.unix_socket):
+            os.unlink(params.unix_socket)
@@ -0,0 +1,143 @@
+import contextlib
+import typing
+import psycopg2
+import psycopg2.extensions
+import pydantic
+
+# magistrate's own bookkeeping is not part of the migrated schema
+magistrate_relations = [
+    'magistrate_migrations',
+    'magistrate_migrations_id_seq',
+    'magistrate_migrations_pkey',
+    'magistrate_progress',
+    'magistrate_progress_pkey',
+    'magistrate_applied',
+    'magistrate_applied_pkey',
+    'magistrate_repeatable',
+    'magistrate_repeatable_pkey',
+]
+
+# one query per category over the whole catalog, so capture time does not grow with round trips
+_relations_query = '''SELECT n.nspname || '.' || c.relname,
+    CASE WHEN c.relkind IN ('v', 'm') THEN c.relkind || ' ' || pg_catalog.pg_get_viewdef(c.oid) ELSE c.relkind::text END
+FROM pg_catalog.pg_class c
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = ANY(%(schemas)s) AND c.relkind IN ('r', 'p', 'v', 'm', 'f', 'S')
+    AND c.relname <> ALL(%(excluded)s)'''
+
+_columns_query = '''SELECT n.nspname || '.' || c.relname || '.' || a.attname,
+    pg_catalog.format_type(a.atttypid, a.atttypmod)
+        || CASE WHEN a.attnotnull THEN ' not null' ELSE '' END
+        || COALESCE(' default ' || pg_catalog.pg_get_expr(d.adbin, d.adrelid), '')
+FROM pg_catalog.pg_attribute a
+JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_catalog.pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+WHERE n.nspname = ANY(%(schemas)s) AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+    AND a.attnum > 0 AND NOT a.attisdropped AND c.relname <> ALL(%(excluded)s)'''
+
+_indexes_query = '''SELECT n.nspname || '.' || ci.relname, pg_catalog.pg_get_indexdef(i.indexrelid)
+FROM pg_catalog.pg_index i
+JOIN pg_catalog.pg_class ci ON ci.oid = i.indexrelid
+JOIN pg_catalog.pg_class ct ON ct.oid = i.indrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = ci.relnamespace
+WHERE n.nspname = ANY(%(schemas)s) AND ct.relname <> ALL(%(excluded)s)'''
+
+_constraints_query = '''SELECT n.nspname || '.' || c.relname || '.' || con.conname, pg_catalog.pg_get_constraintdef(con.oid)
+FROM pg_catalog.pg_constraint con
+JOIN pg_catalog.pg_class c ON c.oid = con.conrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = ANY(%(schemas)s) AND c.relname <> ALL(%(excluded)s)'''
+
+# function bodies can be large, so only their hash is kept
+_functions_query = '''SELECT n.nspname || '.' || p.proname || '(' || pg_catalog.pg_get_function_identity_arguments(p.oid) || ')',
+    md5(pg_catalog.pg_get_functiondef(p.oid))
+FROM pg_catalog.pg_proc p
+JOIN pg_catalog.pg_namespace n ON n.oid = p.pronamespace
+WHERE n.nspname = ANY(%(schemas)s) AND p.prokind IN ('f', 'p')
+    AND NOT EXISTS (SELECT 1 FROM pg_catalog.pg_depend d WHERE d.classid = 'pg_catalog.pg_proc'::regclass AND d.objid = p.oid AND d.deptype = 'e')'''
+
+_enums_query = '''SELECT n.nspname || '.' || t.typname, string_agg(e.enumlabel, ', ' ORDER BY e.enumsortorder)
+FROM pg_catalog.pg_enum e
+JOIN pg_catalog.pg_type t ON t.oid = e.enumtypid
+JOIN pg_catalog.pg_namespace n ON n.oid = t.typnamespace
+WHERE n.nspname = ANY(%(schemas)s)
+GROUP BY n.nspname, t.typname'''
+
+SnapshotCategory = typing.Literal['relations', 'columns', 'indexes', 'constraints', 'functions', 'enums']
+
+_category_queries: dict[SnapshotCategory, str] = {
+    'relations': _relations_query,
+    'columns': _columns_query,
+    'indexes': _indexes_query,
+    'constraints': _constraints_query,
+    'functions': _functions_query,
+    'enums': _enums_query,
+}
+
+class SchemaSnapshot(pydantic.BaseModel):
+    schemas: list[str]
+
+    # qualified object name -> normalized definition
+    relations: dict[str, str] = {}
+    columns: dict[str, str] = {}
+    indexes: dict[str, str] = {}
+    constraints: dict[str, str] = {}
+    functions: dict[str, str] = {}
+    enums: dict[str, str] = {}
+
+class SchemaChange(pydantic.BaseModel):
+    category: SnapshotCategory
+    name: str
+    before: str | None
+    after: str | None
+
+    def __str__(self):
+        if self.before is None:
+            return f'{self.category} {self.name} added: {self.after}'
+
+        if self.after is None:
+            return f'{self.category} {self.name} removed: {self.before}'
+
+        return f'{self.category} {self.name} changed: {self.before} -> {self.after}'
+
+def capture_snapshot_conn(conn, schemas: list[str] | None = None) -> SchemaSnapshot:
+    was_idle = conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    with conn.cursor() as cur:
+        if schemas is None:
+            cur.execute('SELECT current_schema()')
+            schemas = [cur.fetchone()[0]]
+
+        snapshot = SchemaSnapshot(schemas=schemas)
+        params = {'schemas': schemas, 'excluded': magistrate_relations}
+
+        for category, query in _category_queries.items():
+            cur.execute(query, params)
+            setattr(snapshot, category, dict(cur.fetchall()))
+
+    # snapshots only read the catalog, so don't leave a transaction open that the caller did not start
+    if was_idle:
+        conn.rollback()
+
+    return snapshot
+
+def capture_snapshot(conn_string: str, schemas: list[str] | None = None) -> SchemaSnapshot:
+    with contextlib.closing(psycopg2.connect(conn_string)) as conn:
+        return capture_snapshot_conn(conn, schemas)
+
+def compare_schema(conn_string: str, expected: SchemaSnapshot) -> list[SchemaChange]:
+    return diff_snapshots(expected, capture_snapshot(conn_string, expected.schemas))
+
+def diff_snapshots(before: SchemaSnapshot, after: SchemaSnapshot) -> list[SchemaChange]:
+    changes: list[SchemaChange] = []
+
+    for category in _category_queries:
+        old: dict[str, str] = getattr(before, category)
+        new: dict[str, str] = getattr(after, category)
+
+        for name in sorted(old.keys() | new.keys()):
+            if old.get(name) != new.get(name):
+                changes.append(SchemaChange(category=category, name=name, before=old.get(name), after=new.get(name)))
+
+    return changes
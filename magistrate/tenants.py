@@ -0,0 +1,155 @@
+import concurrent.futures
+import contextlib
+import threading
+import psycopg2
+import pydantic
+from psycopg2 import sql
+
+from magistrate.db import ExecutionOptions, get_current_migration_version_conn, prepare_migration_table_conn
+from magistrate.dbexc import MultiSchemaMigrationFailed, SchemaNotFound
+from magistrate.execution import ArchiveSource, DirectionMigration, DirectorySource, HardcodedSource, VersionMigration, execute_migration_list, resolve_target_version
+from magistrate.parser import Migration, StreamingMigration
+
+class MultiSchemaParameters(pydantic.BaseModel):
+    connection_string: str
+    schemas: list[str]
+
+    migration_source: DirectorySource | HardcodedSource | ArchiveSource
+    migration_type: VersionMigration | DirectionMigration
+
+    # schemas appended after the tenant schema, e.g. ['public'] for shared extensions
+    search_path_suffix: list[str] = []
+    create_schemas: bool = False
+    workers: int = 1
+
+    @pydantic.model_validator(mode='after')
+    def _validate_multi_schema_parameters(self) -> 'MultiSchemaParameters':
+        if self.workers < 1:
+            raise ValueError('At least one worker is required')
+
+        if len(set(self.schemas)) != len(self.schemas):
+            raise ValueError('Schemas must not be repeated')
+        
+        return self
+
+class _MigrationCache:
+    def __init__(self, params: MultiSchemaParameters):
+        self._params: MultiSchemaParameters = params
+        self._lock = threading.Lock()
+        self._selected: dict[tuple[int, int], list[Migration | StreamingMigration]] = {}
+
+    def select_migrations(self, current_version: int, target_version: int) -> list[Migration | StreamingMigration]:
+        # tenants usually share a handful of versions, so each range is parsed once for all of them
+        key = (current_version, target_version)
+
+        with self._lock:
+            if key not in self._selected:
+                self._selected[key] = self._params.migration_source.select_migrations(current_version, target_version)
+
+            return self._selected[key]
+
+def _set_search_path(conn, params: MultiSchemaParameters, schema: str):
+    with conn.cursor() as cur:
+        if params.create_schemas:
+            cur.execute(sql.SQL('CREATE SCHEMA IF NOT EXISTS {}').format(sql.Identifier(schema)))
+        else:
+            cur.execute('SELECT 1 FROM pg_catalog.pg_namespace WHERE nspname = %s', (schema,))
+
+            if cur.fetchone() is None:
+                conn.rollback()
+                raise SchemaNotFound(schema)
+
+        cur.execute(sql.SQL('SET search_path TO {}').format(
+            sql.SQL(', ').join(sql.Identifier(x) for x in [schema, *params.search_path_suffix])
+        ))
+
+    conn.commit()
+
+def _connect_in_schema(params: MultiSchemaParameters, schema: str):
+    conn = psycopg2.connect(params.connection_string)
+
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL('SET search_path TO {}').format(
+            sql.SQL(', ').join(sql.Identifier(x) for x in [schema, *params.search_path_suffix])
+        ))
+
+    conn.commit()
+
+    return conn
+
+def _migrate_schema(conn, params: MultiSchemaParameters, cache: _MigrationCache, schema: str, highest_version: int) -> int:
+    _set_search_path(conn, params, schema)
+    prepare_migration_table_conn(conn)
+
+    current_version = get_current_migration_version_conn(conn)
+
+    if highest_version == 0:
+        return current_version
+
+    target_version = resolve_target_version(params.migration_type, current_version, highest_version)
+
+    if target_version == current_version:
+        return current_version
+
+    migrations = cache.select_migrations(current_version, target_version)
+
+    options = ExecutionOptions(connect=lambda: _connect_in_schema(params, schema))
+
+    execute_migration_list(conn, current_version, target_version, migrations, options)
+
+    return get_current_migration_version_conn(conn)
+
+def _migrate_schema_batch(params: MultiSchemaParameters, cache: _MigrationCache, schemas: list[str], highest_version: int) -> tuple[dict[str, int], dict[str, Exception]]:
+    versions: dict[str, int] = {}
+    failures: dict[str, Exception] = {}
+
+    with contextlib.closing(psycopg2.connect(params.connection_string)) as conn:
+        try:
+            for schema in schemas:
+                try:
+                    versions[schema] = _migrate_schema(conn, params, cache, schema, highest_version)
+                except Exception as ex:
+                    failures[schema] = ex
+
+                    if conn.closed:
+                        break
+        finally:
+            if not conn.closed:
+                conn.rollback()
+
+                with conn.cursor() as cur:
+                    cur.execute('RESET search_path')
+
+                conn.commit()
+
+    for schema in schemas:
+        if schema not in versions and schema not in failures:
+            failures[schema] = psycopg2.InterfaceError('connection closed before the schema was migrated')
+
+    return versions, failures
+
+def execute_multi_schema_migration(params: MultiSchemaParameters) -> dict[str, int]:
+    highest_version = params.migration_source.highest_version()
+    cache = _MigrationCache(params)
+
+    worker_count = min(params.workers, max(len(params.schemas), 1))
+    batches = [params.schemas[i::worker_count] for i in range(worker_count)]
+
+    versions: dict[str, int] = {}
+    failures: dict[str, Exception] = {}
+
+    if worker_count == 1:
+        results = [_migrate_schema_batch(params, cache, batches[0], highest_version)]
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=worker_count) as pool:
+            futures = [pool.submit(_migrate_schema_batch, params, cache, batch, highest_version) for batch in batches]
+            results = [future.result() for future in futures]
+
+    for batch_versions, batch_failures in results:
+        versions.update(batch_versions)
+        failures.update(batch_failures)
+
+    if len(failures) > 0:
+        raise MultiSchemaMigrationFailed(versions, failures)
+
+    return versions
@@ -0,0 +1,152 @@
+import contextlib
+import hashlib
+import os
+import uuid
+import psycopg2
+import pydantic
+from psycopg2 import errors, sql
+from psycopg2.extensions import make_dsn, parse_dsn
+
+from magistrate.execution import ArchiveSource, DirectorySource, HardcodedSource, MigrationParameters, VersionMigration, execute_migration
+
+_template_lock_namespace = 0x6d616769
+
+_find_database_query = 'SELECT datistemplate FROM pg_catalog.pg_database WHERE datname = %s'
+
+_stale_templates_query = '''SELECT datname, datistemplate FROM pg_catalog.pg_database
+WHERE starts_with(datname, %(prefix)s) AND substr(datname, length(%(prefix)s) + 1) ~ '^[0-9a-f]{16}$' AND datname <> %(name)s'''
+
+def migration_fingerprint(source: DirectorySource | HardcodedSource | ArchiveSource) -> str:
+    digest = hashlib.sha256()
+
+    if isinstance(source, DirectorySource):
+        # hash every file below the migrations too, since '-- copy:' can read data files from subdirectories
+        versions = {os.path.basename(filename): version for version, filename in source.discover()}
+        paths: list[str] = []
+
+        for root, directories, files in os.walk(source.directory):
+            directories.sort()
+            paths.extend(os.path.join(root, name) for name in files)
+
+        for path in sorted(paths):
+            name = os.path.relpath(path, source.directory)
+            digest.update(f'{versions.get(name, 0)}:{name}\0'.encode('utf-8'))
+
+            with open(path, 'rb') as f:
+                while chunk := f.read(1024 * 1024):
+                    digest.update(chunk)
+    else:
+        for mig in source.select_migrations(0, source.highest_version()):
+            digest.update(mig.model_dump_json().encode('utf-8'))
+
+    return digest.hexdigest()
+
+def database_connection_string(conn_string: str, database: str) -> str:
+    return make_dsn(conn_string, dbname=database)
+
+def _admin_connection(conn_string: str):
+    conn = psycopg2.connect(conn_string)
+    conn.autocommit = True
+    return conn
+
+def _drop_database(cur, database: str, *, is_template: bool):
+    if not is_template:
+        cur.execute(sql.SQL('DROP DATABASE IF EXISTS {}').format(sql.Identifier(database)))
+        return
+
+    # templates cannot be dropped, and DROP DATABASE cannot share a transaction with unmarking it
+    cur.execute(sql.SQL('ALTER DATABASE {} WITH IS_TEMPLATE false').format(sql.Identifier(database)))
+
+    try:
+        cur.execute(sql.SQL('DROP DATABASE IF EXISTS {}').format(sql.Identifier(database)))
+    except psycopg2.Error:
+        # e.g. another run is still copying from it, which must be able to keep doing so
+        cur.execute(sql.SQL('ALTER DATABASE {} WITH IS_TEMPLATE true').format(sql.Identifier(database)))
+        raise
+
+def _build_template(cur, template: 'TemplateDatabase', name: str):
+    cur.execute(sql.SQL('CREATE DATABASE {}').format(sql.Identifier(name)))
+
+    try:
+        execute_migration(MigrationParameters(
+            connection_string=database_connection_string(template.connection_string, name),
+            migration_source=template.migration_source,
+            migration_type=VersionMigration(target_version='latest')
+        ))
+    except Exception:
+        cur.execute(sql.SQL('DROP DATABASE IF EXISTS {}').format(sql.Identifier(name)))
+        raise
+
+    # only a fully migrated template is marked, so an interrupted build is rebuilt next time
+    cur.execute(sql.SQL('ALTER DATABASE {} WITH IS_TEMPLATE true').format(sql.Identifier(name)))
+
+class TemplateDatabase(pydantic.BaseModel):
+    # maintenance database used to create and drop databases, usually 'postgres'
+    connection_string: str
+    migration_source: DirectorySource | HardcodedSource | ArchiveSource
+
+    prefix: str = 'magistrate_template'
+
+    # drop templates left behind by earlier versions of the migration set
+    drop_stale: bool = True
+
+    _name: str | None = pydantic.PrivateAttr(default=None)
+
+    def template_name(self) -> str:
+        return f'{self.prefix}_{migration_fingerprint(self.migration_source)[:16]}'
+
+    def ensure(self) -> str:
+        # fingerprints once per object, create a new TemplateDatabase to pick up changed files
+        if self._name is not None:
+            return self._name
+
+        name = self.template_name()
+        lock_key = int(name[-8:], 16) & 0x7fffffff
+
+        with contextlib.closing(_admin_connection(self.connection_string)) as conn:
+            with conn.cursor() as cur:
+                # several test processes may start at once, only one of them builds
+                cur.execute('SELECT pg_advisory_lock(%s, %s)', (_template_lock_namespace, lock_key))
+
+                try:
+                    cur.execute(_find_database_query, (name,))
+                    row = cur.fetchone()
+
+                    if row is not None and not row[0]:
+                        _drop_database(cur, name, is_template=False)
+
+                    if row is None or not row[0]:
+                        _build_template(cur, self, name)
+
+                    if self.drop_stale:
+                        cur.execute(_stale_templates_query, {'prefix': f'{self.prefix}_', 'name': name})
+
+                        for stale, is_template in cur.fetchall():
+                            try:
+                                _drop_database(cur, stale, is_template=is_template)
+                            except errors.ObjectInUse:
+                                # another run is still copying from it
+                                pass
+                finally:
+                    cur.execute('SELECT pg_advisory_unlock(%s, %s)', (_template_lock_namespace, lock_key))
+
+        self._name = name
+
+        return name
+
+    def create_database(self, database: str | None = None) -> str:
+        name = self.ensure()
+        database = database if database is not None else f'{self.prefix}_db_{uuid.uuid4().hex[:12]}'
+
+        with contextlib.closing(_admin_connection(self.connection_string)) as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL('CREATE DATABASE {} TEMPLATE {}').format(sql.Identifier(database), sql.Identifier(name)))
+
+        return database_connection_string(self.connection_string, database)
+
+    def drop_database(self, conn_string: str):
+        database = parse_dsn(conn_string)['dbname']
+
+        with contextlib.closing(_admin_connection(self.connection_string)) as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL('DROP DATABASE IF EXISTS {}').format(sql.Identifier(database)))
@@ -0,0 +1,51 @@
+import contextlib
+import time
+import typing
+import psycopg2
+import pydantic
+
+from magistrate.dbexc import ReplicationLagTimeout
+
+_replication_lag_query = '''SELECT COALESCE(EXTRACT(EPOCH FROM MAX(GREATEST(write_lag, flush_lag, replay_lag))), 0)
+FROM pg_catalog.pg_stat_replication'''
+
+def get_replication_lag(conn_string: str) -> float:
+    with contextlib.closing(psycopg2.connect(conn_string)) as conn:
+        conn.autocommit = True
+
+        with conn.cursor() as cur:
+            cur.execute(_replication_lag_query)
+            return float(cur.fetchone()[0])
+
+class ReplicationThrottle(pydantic.BaseModel):
+    max_lag_seconds: float = 10.0
+    poll_interval: float = 1.0
+    max_wait_seconds: float | None = None
+
+    # defaults to polling pg_stat_replication on the migrated database
+    lag_provider: typing.Callable[[], float] | None = None
+
+    _waited_seconds: float = pydantic.PrivateAttr(default=0.0)
+
+    @property
+    def waited_seconds(self) -> float:
+        return self._waited_seconds
+
+    def wait(self, conn_string: str) -> float:
+        provider = self.lag_provider if self.lag_provider is not None else lambda: get_replication_lag(conn_string)
+
+        started = time.monotonic()
+
+        while (lag := provider()) >= self.max_lag_seconds:
+            waited = time.monotonic() - started
+
+            if self.max_wait_seconds is not None and waited >= self.max_wait_seconds:
+                self._waited_seconds += waited
+                raise ReplicationLagTimeout(lag, waited)
+
+            time.sleep(self.poll_interval)
+
+        waited = time.monotonic() - started
+        self._waited_seconds += waited
+
+        return waited
@@ -0,0 +1,94 @@
+import contextlib
+import time
+import psycopg2
+import pydantic
+
+from magistrate.db import ExecutionOptions, get_current_migration_version_conn, migrate_down_conn, migrate_up_conn, prepare_migration_table_conn
+from magistrate.dbexc import DowngradeSchemaMismatch, MigrationFailed
+from magistrate.execution import ArchiveSource, DirectorySource, HardcodedSource
+from magistrate.snapshot import SchemaSnapshot, capture_snapshot_conn, diff_snapshots
+
+class VersionTiming(pydantic.BaseModel):
+    version: int
+    up_seconds: float
+    down_seconds: float | None = None
+
+class ValidationReport(pydantic.BaseModel):
+    start_version: int
+    highest_version: int
+    timings: list[VersionTiming] = []
+
+    # downs stop at the first backwards-incompatible version, which cannot be rolled back
+    down_stopped_at: int | None = None
+
+    setup_seconds: float = 0.0
+    total_seconds: float = 0.0
+
+def validate_migrations(conn_string: str, source: DirectorySource | HardcodedSource | ArchiveSource, *, verify_schema: bool = True) -> ValidationReport:
+    started = time.monotonic()
+    options = ExecutionOptions.for_connection_string(conn_string)
+
+    with contextlib.closing(psycopg2.connect(conn_string)) as conn:
+        prepare_migration_table_conn(conn)
+        start_version = get_current_migration_version_conn(conn)
+        highest_version = source.highest_version()
+
+        report = ValidationReport(start_version=start_version, highest_version=highest_version)
+        timings: dict[int, VersionTiming] = {}
+        # schema each version was applied to, compared with the schema left behind by its down
+        snapshots: dict[int, SchemaSnapshot] = {}
+        living_db_version = start_version
+
+        for mig in source.select_migrations(start_version, highest_version):
+            if verify_schema:
+                snapshots[mig.version] = capture_snapshot_conn(conn)
+
+            before = time.monotonic()
+
+            try:
+                migrate_up_conn(conn, mig, options)
+            except Exception as ex:
+                raise MigrationFailed.from_cause(start_version, mig.version, highest_version, living_db_version, ex) from ex
+
+            timings[mig.version] = VersionTiming(version=mig.version, up_seconds=time.monotonic() - before)
+            report.timings.append(timings[mig.version])
+            living_db_version = mig.version
+
+        for mig in source.select_migrations(highest_version, start_version):
+            if not mig.backwards_compatible:
+                report.down_stopped_at = mig.version
+                break
+
+            before = time.monotonic()
+
+            try:
+                migrate_down_conn(conn, mig, options)
+            except Exception as ex:
+                raise MigrationFailed.from_cause(highest_version, mig.version, start_version, living_db_version, ex) from ex
+
+            timings[mig.version].down_seconds = time.monotonic() - before
+            living_db_version = mig.version - 1
+
+            if verify_schema:
+                changes = diff_snapshots(snapshots[mig.version], capture_snapshot_conn(conn))
+
+                if len(changes) > 0:
+                    raise DowngradeSchemaMismatch(mig.version, [str(change) for change in changes])
+
+    report.total_seconds = time.monotonic() - started
+
+    return report
+
+def validate_migrations_ephemeral(source: DirectorySource | HardcodedSource | ArchiveSource, *, bin_dir: str | None = None, verify_schema: bool = True) -> ValidationReport:
+    from magistrate.ephemeral import ephemeral_cluster
+
+    started = time.monotonic()
+
+    with ephemeral_cluster(bin_dir=bin_dir) as conn_string:
+        setup_seconds = time.monotonic() - started
+        report = validate_migrations(conn_string, source, verify_schema=verify_schema)
+
+    report.setup_seconds = setup_seconds
+    report.total_seconds = time.monotonic() - started
+
+    return report
@@ -0,0 +1,93 @@
+import contextlib
+import threading
+import time
+import typing
+import pydantic
+
+# sessions waiting on a lock held (or queued for) by the migration's backend, with how long each has waited for it;
+# query_start would count the time a long query ran before it got stuck behind the migration
+_blocked_sessions_query = '''SELECT a.pid, EXTRACT(EPOCH FROM now() - min(l.waitstart))
+FROM pg_catalog.pg_stat_activity a
+LEFT JOIN pg_catalog.pg_locks l ON l.pid = a.pid AND NOT l.granted
+WHERE %s = ANY(pg_catalog.pg_blocking_pids(a.pid))
+GROUP BY a.pid'''
+
+# pg_locks.waitstart only exists from postgres 14 on, before that the wait is timed from when the watchdog first saw it
+_blocked_sessions_query_pre14 = '''SELECT a.pid, NULL::float8
+FROM pg_catalog.pg_stat_activity a
+WHERE %s = ANY(pg_catalog.pg_blocking_pids(a.pid))'''
+
+class LockWatchdogSettings(pydantic.BaseModel):
+    # cancel the migration's statement once either threshold is exceeded
+    max_blocked_sessions: int | None = 10
+    max_blocked_seconds: float | None = 5.0
+
+    poll_interval: float = 0.2
+
+    @pydantic.model_validator(mode='after')
+    def _validate_lock_watchdog_settings(self) -> 'LockWatchdogSettings':
+        if self.max_blocked_sessions is None and self.max_blocked_seconds is None:
+            raise ValueError('At least one of max_blocked_sessions and max_blocked_seconds is required')
+
+        return self
+
+class LockWatchdog:
+    def __init__(self, settings: LockWatchdogSettings, connect: typing.Callable[[], typing.Any], backend_pid: int):
+        self.settings: LockWatchdogSettings = settings
+        self.backend_pid: int = backend_pid
+
+        self.tripped: bool = False
+        # the largest values seen while the migration ran
+        self.blocked_sessions: int = 0
+        self.blocked_seconds: float = 0.0
+
+        self._connect = connect
+        self._conn: typing.Any = None
+        # monotonic time each blocked backend was first seen waiting, for waits postgres does not time
+        self._first_seen: dict[int, float] = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> 'LockWatchdog':
+        self._conn = self._connect()
+        self._conn.autocommit = True
+        self._thread.start()
+
+        return self
+
+    def __exit__(self, *args):
+        self._stopped.set()
+        self._thread.join()
+        self._conn.close()
+
+    def _exceeded(self, blocked_sessions: int, blocked_seconds: float) -> bool:
+        if self.settings.max_blocked_sessions is not None and blocked_sessions > self.settings.max_blocked_sessions:
+            return True
+
+        return self.settings.max_blocked_seconds is not None and blocked_seconds > self.settings.max_blocked_seconds
+
+    def _waited_seconds(self, blocked: list[tuple[int, float | None]], now: float) -> float:
+        self._first_seen = {pid: self._first_seen.get(pid, now) for pid, _ in blocked}
+
+        # waitstart is also NULL for the instant between a backend starting to wait and recording it
+        return max((float(waited) if waited is not None else now - self._first_seen[pid] for pid, waited in blocked), default=0.0)
+
+    def _run(self):
+        query = _blocked_sessions_query if self._conn.server_version >= 140000 else _blocked_sessions_query_pre14
+
+        # losing the watchdog connection must not fail the migration itself
+        with contextlib.suppress(Exception), self._conn.cursor() as cur:
+            while not self._stopped.wait(self.settings.poll_interval):
+                cur.execute(query, (self.backend_pid,))
+                blocked = cur.fetchall()
+
+                blocked_sessions = len(blocked)
+                blocked_seconds = self._waited_seconds(blocked, time.monotonic())
+
+                self.blocked_sessions = max(self.blocked_sessions, blocked_sessions)
+                self.blocked_seconds = max(self.blocked_seconds, blocked_seconds)
+
+                # keeps cancelling while the queue persists, a cancel arriving between statements is lost
+                if self._exceeded(blocked_sessions, blocked_seconds):
+                    self.tripped = True
+                    cur.execute('SELECT pg_catalog.pg_cancel_backend(%s)', (self.backend_pid,))
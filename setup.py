@@ -11,6 +11,9 @@ setup(
     entry_points={
         "console_scripts": [
             "magistrate = magistrate.main:_main_no_args"
+        ],
+        "pytest11": [
+            "magistrate = magistrate.pytest_plugin"
         ]
     },
     python_requires=">=3.11",
@@ -0,0 +1,6 @@
+-- ver: 2
+-- up
+CREATE TABLE public.regions (id integer primary key, "name" text);
+-- copy: public.regions(id, "name") from regions.csv csv
+-- down
+DROP TABLE public.regions;
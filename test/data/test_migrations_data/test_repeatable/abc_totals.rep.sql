@@ -0,0 +1,4 @@
+-- depends: abc_values
+
+CREATE OR REPLACE VIEW abc_totals AS
+SELECT sum(value) AS total FROM abc_values;
@@ -0,0 +1,2 @@
+CREATE OR REPLACE VIEW abc_values AS
+SELECT id, value FROM abc WHERE value IS NOT NULL;
@@ -0,0 +1,5 @@
+CREATE OR REPLACE FUNCTION double_value(x integer) RETURNS integer AS $$
+BEGIN
+    RETURN x * 2;
+END;
+$$ LANGUAGE plpgsql;
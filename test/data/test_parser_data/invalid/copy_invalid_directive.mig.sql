@@ -0,0 +1,6 @@
+-- ver: 1
+-- up
+CREATE TABLE lookup (id integer primary key, name text);
+-- copy: lookup
+-- down
+DROP TABLE lookup;
@@ -0,0 +1,8 @@
+-- ver: 1
+-- up
+CREATE TABLE lookup (id integer primary key, name text);
+-- copy: lookup(id, name)
+1	one
+2	two
+-- down
+DROP TABLE lookup;
@@ -0,0 +1,5 @@
+-- ver: 1
+-- up
+-- partitioned_index: events_created_at_idx ON events (created_at)
+-- down
+DROP INDEX events_created_at_idx;
@@ -0,0 +1,63 @@
+import gzip
+import importlib
+import os
+import zipfile
+import pytest
+
+from magistrate.exc import FilenameVersionMismatch, InvalidMigrationFile
+from magistrate.execution import ArchiveSource, DirectorySource
+from test.test_common import TEST_DATA_FOLDER
+
+_directory_source_folder = os.path.join(TEST_DATA_FOLDER, 'test_migrations_data', 'test_directory_select_migrations')
+
+def _write_archive(filename, prefix: str = ''):
+    with zipfile.ZipFile(filename, 'w') as archive:
+        for name in sorted(os.listdir(_directory_source_folder)):
+            archive.write(os.path.join(_directory_source_folder, name), prefix + name)
+
+def test_zip_archive_source(tmp_path):
+    _write_archive(tmp_path / 'migrations.zip', 'sql/migrations/')
+
+    source = ArchiveSource(archive=str(tmp_path / 'migrations.zip'), directory='sql/migrations')
+    expected = DirectorySource(directory=_directory_source_folder)
+
+    assert source.highest_version() == 4
+    assert source.select_migrations(0, 4) == expected.select_migrations(0, 4)
+    assert [mig.version for mig in source.select_migrations(4, 2)] == [4, 3]
+    assert source.model_copy(update={'filename_versions': False}).select_migrations(1, 3) == expected.select_migrations(1, 3)
+
+def test_zipped_package_source(tmp_path, monkeypatch):
+    with zipfile.ZipFile(tmp_path / 'bundle.zip', 'w') as archive:
+        archive.writestr('bundled_migrations/__init__.py', '')
+
+        for name in sorted(os.listdir(_directory_source_folder)):
+            with open(os.path.join(_directory_source_folder, name), 'rb') as f:
+                archive.writestr(f'bundled_migrations/migrations/{name}.gz', gzip.compress(f.read()))
+
+    monkeypatch.syspath_prepend(str(tmp_path / 'bundle.zip'))
+    importlib.invalidate_caches()
+
+    source = ArchiveSource(package='bundled_migrations', directory='migrations')
+
+    assert source.highest_version() == 4
+    assert source.select_migrations(0, 4) == DirectorySource(directory=_directory_source_folder).select_migrations(0, 4)
+
+def test_archive_source_requires_one_location():
+    with pytest.raises(ValueError):
+        ArchiveSource()
+
+    with pytest.raises(ValueError):
+        ArchiveSource(archive='migrations.zip', package='bundled_migrations')
+
+def test_archive_source_rejects_copy_files(tmp_path):
+    with zipfile.ZipFile(tmp_path / 'migrations.zip', 'w') as archive:
+        archive.writestr('1_lookup.mig.sql', '-- ver: 1\n-- up\n-- copy: lookup(id) from lookup.tsv\n-- down\nDELETE FROM lookup;\n')
+        archive.writestr('2_mismatch.mig.sql', '-- ver: 3\n-- up\nSELECT 1;\n-- down\nSELECT 1;\n')
+
+    source = ArchiveSource(archive=str(tmp_path / 'migrations.zip'))
+
+    with pytest.raises(InvalidMigrationFile):
+        source.select_migrations(0, 1)
+
+    with pytest.raises(FilenameVersionMismatch):
+        source.select_migrations(2, 1)
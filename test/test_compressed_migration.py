@@ -0,0 +1,50 @@
+import bz2
+import gzip
+import lzma
+import os
+import pytest
+
+from magistrate.discovery import discover_migrations
+from magistrate.execution import DirectorySource
+from magistrate.fileio import open_text
+from magistrate.parser import CopyData, StreamingMigration, parse_migration
+from test.test_common import TEST_DATA_FOLDER
+
+_directory_source_folder = os.path.join(TEST_DATA_FOLDER, 'test_migrations_data', 'test_directory_select_migrations')
+
+_compressors = {
+    'gz': gzip.open,
+    'xz': lzma.open,
+    'bz2': bz2.open,
+}
+
+def _compress_directory(source: str, target, extension: str):
+    for name in os.listdir(source):
+        with open(os.path.join(source, name), 'rb') as src, _compressors[extension](target / f'{name}.{extension}', 'wb') as dst:
+            dst.write(src.read())
+
+@pytest.mark.parametrize('extension', sorted(_compressors.keys()))
+def test_compressed_directory_source(tmp_path, extension):
+    _compress_directory(_directory_source_folder, tmp_path, extension)
+
+    assert [version for version, _ in discover_migrations(str(tmp_path))] == [1, 2, 3, 4]
+    assert [version for version, _ in discover_migrations(str(tmp_path), filename_versions=True)] == [1, 2, 3, 4]
+
+    expected = DirectorySource(directory=_directory_source_folder).select_migrations(0, 4)
+
+    assert DirectorySource(directory=str(tmp_path)).select_migrations(0, 4) == expected
+
+    streamed = DirectorySource(directory=str(tmp_path), streaming=True).select_migrations(0, 4)
+
+    assert [list(mig.up_queries) for mig in streamed] == [mig.up_queries for mig in expected]
+
+def test_compressed_copy_file_is_relative_to_migration(tmp_path):
+    with lzma.open(tmp_path / '1.mig.sql.xz', 'wt') as f:
+        f.write('-- ver: 1\n-- up\n-- copy: lookup(id, name) from lookup.tsv\n-- down\nDELETE FROM lookup;\n')
+
+    with open_text(str(tmp_path / '1.mig.sql.xz')) as f:
+        migration = parse_migration(f)
+
+    assert isinstance(migration.up_queries[0], CopyData)
+    assert migration.up_queries[0].filename == str(tmp_path / 'lookup.tsv')
+    assert StreamingMigration(str(tmp_path / '1.mig.sql.xz')).version == 1
@@ -0,0 +1,52 @@
+import builtins
+import pytest
+
+from magistrate.discovery import discover_migrations, verify_migrations
+from magistrate.exc import FilenameVersionMismatch, InvalidMigrationFile
+from magistrate.execution import DirectorySource
+
+def _write_migration(folder, filename: str, version: int):
+    (folder / filename).write_text(f'-- ver: {version}\n-- up\nCREATE TABLE t{version} (id int);\n-- down\nDROP TABLE t{version};\n')
+
+def test_filename_discovery_opens_no_files(tmp_path, monkeypatch):
+    _write_migration(tmp_path, '000001_create_users.mig.sql', 1)
+    _write_migration(tmp_path, '000002_create_orders.mig.sql', 2)
+    _write_migration(tmp_path, '3.mig.sql', 3)
+    (tmp_path / 'notes.txt').write_text('not a migration')
+
+    def _no_open(*args, **kwargs):
+        raise AssertionError('discovery opened a file')
+
+    monkeypatch.setattr(builtins, 'open', _no_open)
+
+    migrations = discover_migrations(str(tmp_path), filename_versions=True)
+
+    assert [(version, filename.rsplit('/', 1)[-1]) for version, filename in migrations] == [
+        (1, '000001_create_users.mig.sql'),
+        (2, '000002_create_orders.mig.sql'),
+        (3, '3.mig.sql')
+    ]
+
+def test_filename_discovery_invalid_name(tmp_path):
+    _write_migration(tmp_path, 'create_users.mig.sql', 1)
+
+    with pytest.raises(InvalidMigrationFile):
+        discover_migrations(str(tmp_path), filename_versions=True)
+
+def test_filename_version_mismatch(tmp_path):
+    _write_migration(tmp_path, '000001_create_users.mig.sql', 1)
+    _write_migration(tmp_path, '000002_create_orders.mig.sql', 3)
+
+    source = DirectorySource(directory=str(tmp_path), filename_versions=True)
+
+    assert source.highest_version() == 2
+    assert [mig.version for mig in source.select_migrations(0, 1)] == [1]
+
+    with pytest.raises(FilenameVersionMismatch) as ex:
+        source.select_migrations(1, 2)
+
+    assert ex.value.filename_version == 2
+    assert ex.value.header_version == 3
+
+    with pytest.raises(FilenameVersionMismatch):
+        verify_migrations(str(tmp_path))
@@ -0,0 +1,35 @@
+import pytest
+
+from magistrate.ephemeral import ephemeral_cluster, find_postgres_binary
+from magistrate.exc import PostgresBinaryError, PostgresBinaryNotFound
+
+def test_missing_postgres_binary(tmp_path):
+    with pytest.raises(PostgresBinaryNotFound) as ex:
+        find_postgres_binary('initdb', str(tmp_path))
+
+    assert ex.value.binary == 'initdb'
+    assert ex.value.path == str(tmp_path)
+
+def test_postgres_binary_in_bin_dir(tmp_path):
+    initdb = tmp_path / 'initdb'
+    initdb.write_text('#!/bin/sh\n')
+    initdb.chmod(0o755)
+
+    assert find_postgres_binary('initdb', str(tmp_path)) == str(initdb)
+
+def _failing_stop_binaries(bin_dir):
+    for name, script in [('initdb', 'exit 0'), ('pg_ctl', 'for arg; do [ "$arg" = stop ] && exit 1; done; exit 0')]:
+        binary = bin_dir / name
+        binary.write_text(f'#!/bin/sh\n{script}\n')
+        binary.chmod(0o755)
+
+def test_failing_stop_keeps_original_error(tmp_path):
+    _failing_stop_binaries(tmp_path)
+
+    with pytest.raises(ZeroDivisionError):
+        with ephemeral_cluster(bin_dir=str(tmp_path), parent_directory=str(tmp_path)):
+            1 / 0
+
+    with pytest.raises(PostgresBinaryError):
+        with ephemeral_cluster(bin_dir=str(tmp_path), parent_directory=str(tmp_path)):
+            pass
@@ -0,0 +1,71 @@
+from io import StringIO
+import threading
+import pytest
+
+from magistrate.exc import InvalidDependency, InvalidDependencyHeader
+from magistrate.graph import _GraphFailure, migration_dependencies, run_migration_graph
+from magistrate.parser import Migration, parse_migration
+
+def _migration(version: int, depends: list[int] | None = None) -> Migration:
+    return Migration(version=version, up_queries=[], down_queries=[], backwards_compatible=True, depends=depends)
+
+def test_depends_header():
+    parsed = parse_migration(StringIO('-- ver: 5\n-- depends: 3, 1\n-- up\nSELECT 1;\n-- down\nSELECT 2;\n'))
+
+    assert parsed.depends == [1, 3]
+    assert migration_dependencies(parsed) == [1, 3]
+
+    parsed = parse_migration(StringIO('-- ver: 5\n-- up\nSELECT 1;\n-- down\nSELECT 2;\n'))
+
+    assert parsed.depends is None
+    assert migration_dependencies(parsed) == [4]
+
+def test_depends_header_invalid():
+    with pytest.raises(InvalidDependency):
+        parse_migration(StringIO('-- ver: 5\n-- depends: 5\n-- up\nSELECT 1;\n-- down\nSELECT 2;\n'))
+
+    with pytest.raises(InvalidDependencyHeader):
+        parse_migration(StringIO('-- ver: 5\n-- depends: three\n-- up\nSELECT 1;\n-- down\nSELECT 2;\n'))
+
+def test_depends_comment_in_section():
+    parsed = parse_migration(StringIO('-- ver: 5\n-- up\n-- depends: on the orders backfill\nSELECT 1;\n-- down\nSELECT 2;\n'))
+
+    assert parsed.depends is None
+    assert parsed.up_queries == ['-- depends: on the orders backfill\nSELECT 1;\n']
+
+def test_graph_runs_independent_migrations_concurrently():
+    migrations = [_migration(2, [1]), _migration(3, [1]), _migration(4, [2, 3])]
+    both_started = threading.Barrier(2, timeout=5)
+    order: list[int] = []
+
+    def run(mig):
+        if mig.version in {2, 3}:
+            # only passes if 2 and 3 are in flight at the same time
+            both_started.wait()
+
+        order.append(mig.version)
+
+    run_migration_graph(migrations, {1}, 2, run)
+
+    assert sorted(order[:2]) == [2, 3]
+    assert order[2] == 4
+
+def test_graph_stops_dependents_on_failure():
+    migrations = [_migration(2, [1]), _migration(3, [1]), _migration(4, [2])]
+    ran: list[int] = []
+
+    def run(mig):
+        if mig.version == 2:
+            raise RuntimeError('boom')
+
+        ran.append(mig.version)
+
+    with pytest.raises(_GraphFailure) as exc_info:
+        run_migration_graph(migrations, {1}, 1, run)
+
+    assert exc_info.value.version == 2
+    assert 4 not in ran
+
+def test_graph_unknown_dependency():
+    with pytest.raises(InvalidDependency):
+        run_migration_graph([_migration(3, [2])], {1}, 1, lambda mig: None)
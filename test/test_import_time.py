@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+_repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def _imported_modules(args: list[str], environ: dict[str, str]) -> set[str]:
+    result = subprocess.run([sys.executable, '-X', 'importtime', *args], capture_output=True, text=True, env=environ, cwd=_repo_root)
+
+    modules: set[str] = set()
+
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and 'cumulative' not in line:
+            modules.add(line.split('|')[-1].strip())
+
+    return modules
+
+def test_get_version_skips_heavy_imports():
+    environ = {**os.environ, 'POSTGRES': 'host=/nonexistent-magistrate-socket dbname=magistrate connect_timeout=1'}
+
+    modules = _imported_modules(['-m', 'magistrate.main', '--get-version'], environ)
+
+    assert 'magistrate.db' in modules
+    assert 'pydantic' not in modules
+    assert 'magistrate.execution' not in modules
+    assert 'magistrate.parser' not in modules
+
+def test_main_import_is_light():
+    modules = _imported_modules(['-c', 'import magistrate.main'], dict(os.environ))
+
+    assert 'magistrate.main' in modules
+    assert 'psycopg2' not in modules
+    assert 'pydantic' not in modules
+
+def test_execution_import_skips_feature_modules():
+    modules = _imported_modules(['-c', 'import magistrate.execution'], dict(os.environ))
+
+    assert 'magistrate.execution' in modules
+
+    for feature in ['graph', 'maintenance', 'partitions', 'preflight', 'progress', 'repeatable', 'snapshot', 'throttle', 'watchdog']:
+        assert f'magistrate.{feature}' not in modules
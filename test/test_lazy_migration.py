@@ -0,0 +1,76 @@
+import pytest
+
+from magistrate.exc import InvalidMigrationFile
+from magistrate.execution import HardcodedSource
+from magistrate.parser import LazyMigration, Migration
+
+def _migration_text(version: int) -> str:
+    return f'''-- ver: {version}
+-- up
+CREATE TABLE t{version} (id serial primary key);
+-- down
+DROP TABLE t{version};
+'''
+
+def test_lazy_migration_from_text():
+    lazy = LazyMigration.from_text(1, _migration_text(1))
+
+    migration = lazy.load()
+
+    assert migration.version == 1
+    assert [x.strip() for x in migration.up_queries] == ['CREATE TABLE t1 (id serial primary key);']
+    assert [x.strip() for x in migration.down_queries] == ['DROP TABLE t1;']
+
+def test_lazy_migration_from_file_offsets(tmp_path):
+    bundle = tmp_path / 'bundle.sql'
+    texts = [_migration_text(v).encode('utf-8') for v in (1, 2, 3)]
+    bundle.write_bytes(b''.join(texts))
+
+    lazies: list[LazyMigration] = []
+    offset = 0
+
+    for version, text in zip((1, 2, 3), texts):
+        lazies.append(LazyMigration.from_file(version, str(bundle), offset=offset, length=len(text)))
+        offset += len(text)
+
+    for lazy in lazies:
+        migration = lazy.load()
+        assert migration.version == lazy.version
+        assert [x.strip() for x in migration.down_queries] == [f'DROP TABLE t{lazy.version};']
+
+def test_lazy_migration_version_mismatch():
+    lazy = LazyMigration.from_text(2, _migration_text(1))
+
+    with pytest.raises(InvalidMigrationFile):
+        lazy.load()
+
+def test_trusted_hardcoded_source_selection():
+    hs = HardcodedSource.trusted([
+        LazyMigration.from_text(3, _migration_text(3)),
+        LazyMigration.from_text(1, _migration_text(1)),
+        Migration(version=2, up_queries=[], down_queries=[], backwards_compatible=True),
+    ])
+
+    assert [mig.version for mig in hs.migrations] == [1, 2, 3]
+
+    selected = hs.select_migrations(1, 3)
+
+    assert [mig.version for mig in selected] == [2, 3]
+    assert all(isinstance(mig, Migration) for mig in selected)
+
+    selected = hs.select_migrations(3, 0)
+
+    assert [mig.version for mig in selected] == [3, 2, 1]
+
+def test_lazy_migration_copy_from_relative_file(tmp_path):
+    text = '-- ver: 1\n-- up\n-- copy: t1 (id) from rows.csv csv\n-- down\nDELETE FROM t1;\n'
+    (tmp_path / 'bundle.sql').write_text(text)
+
+    copy = LazyMigration.from_file(1, str(tmp_path / 'bundle.sql')).load().up_queries[0]
+    assert copy.filename == str(tmp_path / 'rows.csv')
+
+    copy = LazyMigration.from_text(1, text, base_directory=str(tmp_path)).load().up_queries[0]
+    assert copy.filename == str(tmp_path / 'rows.csv')
+
+    with pytest.raises(InvalidMigrationFile):
+        LazyMigration.from_text(1, text).load()
@@ -0,0 +1,42 @@
+from magistrate.loadimpact import LoadImpactReport, Workload, _Sample, summarize
+
+def test_summarize_phase():
+    samples = [_Sample(started=1.0 + i * 0.01, latency=(i + 1) / 1000, failed=False) for i in range(100)]
+    samples.append(_Sample(started=1.5, latency=0.5, failed=True))
+    # started before the phase, so it belongs to the previous one
+    samples.append(_Sample(started=0.5, latency=10.0, failed=False))
+
+    stats = summarize('version 1', samples, 1.0, 3.0)
+
+    assert stats.queries == 100
+    assert stats.errors == 1
+    assert stats.throughput == 50.0
+    assert stats.p50_ms == 50.0
+    assert stats.p99_ms == 99.0
+    assert stats.max_ms == 100.0
+
+def test_empty_phase():
+    stats = summarize('version 2', [], 1.0, 2.0)
+
+    assert stats.queries == 0
+    assert stats.p99_ms == 0.0
+
+def test_report_markdown():
+    samples = [_Sample(started=float(i), latency=0.002, failed=False) for i in range(10)]
+
+    report = LoadImpactReport(
+        workload=Workload(),
+        baseline=summarize('baseline', samples, 0.0, 5.0),
+        versions=[summarize('version 1', samples, 5.0, 10.0)]
+    )
+
+    lines = report.to_markdown().splitlines()
+
+    assert lines[0] == 'Workload: 4 readers, 2 writers'
+    assert lines[-1].startswith('| version 1 | 5.00 | 5 | 0 | 1.0 | 2.00 | 2.00 | 2.00 | 1.00x |')
+
+def test_report_warns_about_synthetic_workload():
+    stats = summarize('baseline', [], 0.0, 1.0)
+
+    assert 'Warning' in LoadImpactReport(workload=Workload(), baseline=stats, versions=[], synthetic=True).to_markdown()
+    assert 'Warning' not in LoadImpactReport(workload=Workload(touched_tables=True), baseline=stats, versions=[]).to_markdown()
@@ -0,0 +1,51 @@
+from io import StringIO
+import pytest
+
+from magistrate.exc import DuplicateHeader
+from magistrate.maintenance import MaintenanceSettings, record_touched_tables, statement_tables
+from magistrate.parser import CopyData, PartitionedIndex, parse_migration
+
+@pytest.mark.parametrize('statement,tables', [
+    ('ALTER TABLE abc ADD COLUMN value integer;', {'abc'}),
+    ('ALTER TABLE IF EXISTS ONLY public.abc DROP COLUMN value;', {'public.abc'}),
+    ('CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS abc_idx ON ONLY "Events" (id);', {'"Events"'}),
+    ('CREATE INDEX ON app . abc (id);', {'app.abc'}),
+    ('INSERT INTO abc (id) VALUES (1) ON CONFLICT (id) DO UPDATE SET id = 2;', {'abc'}),
+    ('WITH moved AS (DELETE FROM old RETURNING *) INSERT INTO new SELECT * FROM moved;', {'old', 'new'}),
+    ('UPDATE abc SET value = 1 -- UPDATE ignored\nWHERE id IN (SELECT id FROM def FOR UPDATE NOWAIT);', {'abc'}),
+    ('CREATE TABLE summary AS SELECT * FROM abc;', {'summary'}),
+    ('CREATE TABLE abc (id integer primary key);', set()),
+    ('REFRESH MATERIALIZED VIEW CONCURRENTLY totals;', {'totals'}),
+    ('SELECT 1;', set()),
+])
+def test_statement_tables(statement, tables):
+    assert statement_tables(statement) == tables
+
+def test_directive_tables():
+    assert statement_tables(CopyData(table='public.lookup', columns=['id'], rows='')) == {'public.lookup'}
+    assert statement_tables(PartitionedIndex(name='idx', table='events', definition='(id)')) == {'events'}
+
+def test_record_touched_tables():
+    touched: set[str] = set()
+    statements = ['UPDATE abc SET value = 1;', 'DELETE FROM def;']
+
+    assert list(record_touched_tables(statements, touched)) == statements
+    assert touched == {'abc', 'def'}
+
+def test_maintenance_header():
+    parsed = parse_migration(StringIO('-- ver: 2\n-- maintenance: false\n-- up\nUPDATE abc SET value = 1;\n-- down\nSELECT 1;\n'))
+    assert parsed.maintenance is False
+
+    parsed = parse_migration(StringIO('-- ver: 2\n-- up\nUPDATE abc SET value = 1;\n-- down\nSELECT 1;\n'))
+    assert parsed.maintenance is True
+
+def test_maintenance_header_invalid():
+    with pytest.raises(DuplicateHeader):
+        parse_migration(StringIO('-- ver: 2\n-- maintenance: false\n-- maintenance: true\n-- up\nSELECT 1;\n-- down\nSELECT 1;\n'))
+
+    # a comment inside a section, not a directive
+    assert parse_migration(StringIO('-- ver: 2\n-- up\n-- maintenance: false\nSELECT 1;\n-- down\nSELECT 1;\n')).maintenance is True
+
+def test_maintenance_settings_invalid():
+    with pytest.raises(ValueError):
+        MaintenanceSettings(vacuum_threshold=-1)
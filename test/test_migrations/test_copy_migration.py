@@ -0,0 +1,26 @@
+import os
+import psycopg2
+
+from magistrate.execution import DirectorySource, MigrationParameters, VersionMigration, execute_migration
+from test.test_common import TEST_DATA_FOLDER
+
+_directory = os.path.join(TEST_DATA_FOLDER, 'test_migrations_data', 'test_copy')
+
+def test_copy_migration(conn_string, db):
+    params = MigrationParameters(
+        connection_string=conn_string,
+        migration_source=DirectorySource(directory=_directory),
+        migration_type=VersionMigration(target_version='latest')
+    )
+
+    new_version = execute_migration(params)
+
+    assert new_version == 2
+
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT id, name FROM lookup ORDER BY id')
+            assert cur.fetchall() == [(1, 'one'), (2, 'two')]
+
+            cur.execute('SELECT id, name FROM regions ORDER BY id')
+            assert cur.fetchall() == [(1, 'north'), (2, 'south')]
@@ -0,0 +1,56 @@
+import psycopg2
+
+from magistrate.execution import HardcodedSource, MigrationParameters, VersionMigration, execute_migration
+from magistrate.parser import Migration
+
+def test_graph_migration(conn_string, db):
+    migrations = [
+        Migration(
+            version=1,
+            up_queries=['CREATE TABLE abc (id serial primary key, val integer);'],
+            down_queries=['DROP TABLE abc;'],
+            backwards_compatible=True
+        ),
+        Migration(
+            version=2,
+            up_queries=['CREATE TABLE def (id serial primary key, val integer);'],
+            down_queries=['DROP TABLE def;'],
+            backwards_compatible=True,
+            depends=[]
+        ),
+        Migration(
+            version=3,
+            up_queries=['CREATE INDEX abc_val_idx ON abc (val);'],
+            down_queries=['DROP INDEX abc_val_idx;'],
+            backwards_compatible=True,
+            depends=[1]
+        ),
+        Migration(
+            version=4,
+            up_queries=['CREATE INDEX def_val_idx ON def (val);'],
+            down_queries=['DROP INDEX def_val_idx;'],
+            backwards_compatible=True,
+            depends=[2]
+        )
+    ]
+
+    params = MigrationParameters(
+        connection_string=conn_string,
+        migration_source=HardcodedSource(migrations=migrations),
+        migration_type=VersionMigration(target_version='latest'),
+        workers=3
+    )
+
+    assert execute_migration(params) == 4
+
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT indexname FROM pg_indexes WHERE indexname IN ('abc_val_idx', 'def_val_idx') ORDER BY indexname")
+            assert cur.fetchall() == [('abc_val_idx',), ('def_val_idx',)]
+
+            cur.execute('SELECT count(*) FROM magistrate_applied')
+            assert cur.fetchall() == [(0,)]
+
+    params.migration_type = VersionMigration(target_version=0)
+
+    assert execute_migration(params) == 0
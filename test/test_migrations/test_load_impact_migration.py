@@ -0,0 +1,30 @@
+from magistrate.execution import HardcodedSource
+from magistrate.loadimpact import Workload, measure_load_impact
+from magistrate.parser import Migration
+
+def test_measure_load_impact(conn_string, db):
+    source = HardcodedSource(migrations=[
+        Migration(version=1, up_queries=['CREATE TABLE abc (id int);'], down_queries=['DROP TABLE abc;'], backwards_compatible=True),
+        Migration(version=2, up_queries=['SELECT pg_sleep(0.2);'], down_queries=['SELECT 1;'], backwards_compatible=True)
+    ])
+
+    report = measure_load_impact(conn_string, source, 'latest', Workload(readers=2, writers=1, rows=100, baseline_seconds=0.2))
+
+    assert report.baseline.queries > 0
+    assert [stats.phase for stats in report.versions] == ['version 1', 'version 2']
+    assert report.versions[1].seconds >= 0.2
+    assert report.synthetic
+
+def test_measure_load_impact_on_touched_tables(conn_string, db):
+    source = HardcodedSource(migrations=[
+        Migration(version=1, up_queries=['CREATE TABLE abc (id int);', 'INSERT INTO abc VALUES (1);'], down_queries=['DROP TABLE abc;'], backwards_compatible=True),
+        Migration(version=2, up_queries=['LOCK TABLE abc IN ACCESS EXCLUSIVE MODE;', 'SELECT pg_sleep(0.5);'], down_queries=['SELECT 1;'], backwards_compatible=True)
+    ])
+
+    measure_load_impact(conn_string, source, 1, Workload(baseline_seconds=0.0))
+
+    report = measure_load_impact(conn_string, source, 'latest', Workload(readers=2, writers=1, baseline_seconds=0.2, touched_tables=True))
+
+    assert not report.synthetic
+    # the readers queue behind the migration's lock on abc
+    assert report.versions[0].max_ms >= 400
@@ -0,0 +1,50 @@
+import psycopg2
+
+from magistrate.execution import HardcodedSource, MigrationParameters, VersionMigration, execute_migration
+from magistrate.maintenance import MaintenanceSettings, TableMaintenance
+from magistrate.parser import Migration
+
+def _last_analyzed(conn_string: str, table: str):
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT last_analyze, last_vacuum FROM pg_catalog.pg_stat_user_tables WHERE relname = %s', (table,))
+            return cur.fetchone()
+
+def test_maintenance_after_migration(conn_string, db):
+    migrations = [
+        Migration(
+            version=1,
+            up_queries=['CREATE TABLE abc (id int, value int);', 'CREATE TABLE def (id int);', 'CREATE TABLE skipped (id int);'],
+            down_queries=['DROP TABLE skipped;', 'DROP TABLE def;', 'DROP TABLE abc;'],
+            backwards_compatible=True
+        ),
+        Migration(
+            version=2,
+            up_queries=['INSERT INTO abc SELECT g, g FROM generate_series(1, 5000) g;', 'UPDATE abc SET value = value + 1;', 'INSERT INTO def VALUES (1);'],
+            down_queries=['DELETE FROM def;', 'DELETE FROM abc;'],
+            backwards_compatible=True
+        ),
+        Migration(
+            version=3,
+            up_queries=['INSERT INTO skipped VALUES (1);'],
+            down_queries=['DELETE FROM skipped;'],
+            backwards_compatible=True,
+            maintenance=False
+        )
+    ]
+
+    results: list[TableMaintenance] = []
+
+    version = execute_migration(MigrationParameters(
+        connection_string=conn_string,
+        migration_source=HardcodedSource(migrations=migrations),
+        migration_type=VersionMigration(target_version='latest'),
+        maintenance=MaintenanceSettings(vacuum_threshold=100, on_table=results.append)
+    ))
+
+    assert version == 3
+    assert [result.table for result in results] == ['public.abc', 'public.def']
+    assert results[1].analyzed and not results[1].vacuumed
+
+    assert _last_analyzed(conn_string, 'def')[0] is not None
+    assert _last_analyzed(conn_string, 'skipped')[0] is None
@@ -0,0 +1,81 @@
+import psycopg2
+import pytest
+from psycopg2 import sql
+
+from magistrate.dbexc import MultiSchemaMigrationFailed, SchemaNotFound
+from magistrate.execution import HardcodedSource, VersionMigration
+from magistrate.parser import Migration
+from magistrate.tenants import MultiSchemaParameters, execute_multi_schema_migration
+
+_schemas = ['magistrate_tenant_a', 'magistrate_tenant_b', 'magistrate_tenant_c']
+
+@pytest.fixture(scope='function')
+def tenant_schemas(conn_string, db):
+    def _drop():
+        with psycopg2.connect(conn_string) as conn:
+            with conn.cursor() as cur:
+                for schema in _schemas:
+                    cur.execute(sql.SQL('DROP SCHEMA IF EXISTS {} CASCADE').format(sql.Identifier(schema)))
+
+    _drop()
+    yield _schemas
+    _drop()
+
+_migrations = [
+    Migration(
+        version=1,
+        up_queries=['CREATE TABLE abc (id serial primary key, val integer);'],
+        down_queries=['DROP TABLE abc;'],
+        backwards_compatible=True
+    ),
+    Migration(
+        version=2,
+        up_queries=['INSERT INTO abc (val) VALUES (22);'],
+        down_queries=['DELETE FROM abc;'],
+        backwards_compatible=True
+    )
+]
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_multi_schema_migration(conn_string, tenant_schemas, workers):
+    params = MultiSchemaParameters(
+        connection_string=conn_string,
+        schemas=tenant_schemas,
+        migration_source=HardcodedSource(migrations=_migrations),
+        migration_type=VersionMigration(target_version='latest'),
+        create_schemas=True,
+        workers=workers
+    )
+
+    assert execute_multi_schema_migration(params) == {schema: 2 for schema in tenant_schemas}
+
+    params.migration_type = VersionMigration(target_version=1)
+    params.schemas = tenant_schemas[:1]
+
+    assert execute_multi_schema_migration(params) == {tenant_schemas[0]: 1}
+
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            for schema, expected_version, expected_rows in [(tenant_schemas[0], 1, 0), (tenant_schemas[1], 2, 1)]:
+                cur.execute(sql.SQL('SELECT version FROM {}.magistrate_migrations').format(sql.Identifier(schema)))
+                assert cur.fetchall() == [(expected_version,)]
+
+                cur.execute(sql.SQL('SELECT count(*) FROM {}.abc').format(sql.Identifier(schema)))
+                assert cur.fetchall() == [(expected_rows,)]
+
+            cur.execute("SELECT 1 FROM pg_tables WHERE schemaname = 'public' AND tablename = 'magistrate_migrations'")
+            assert cur.fetchall() == []
+
+def test_multi_schema_missing_schema(conn_string, tenant_schemas):
+    params = MultiSchemaParameters(
+        connection_string=conn_string,
+        schemas=tenant_schemas,
+        migration_source=HardcodedSource(migrations=_migrations),
+        migration_type=VersionMigration(target_version='latest')
+    )
+
+    with pytest.raises(MultiSchemaMigrationFailed) as exc_info:
+        execute_multi_schema_migration(params)
+
+    assert exc_info.value.versions == {}
+    assert all(isinstance(ex, SchemaNotFound) for ex in exc_info.value.failures.values())
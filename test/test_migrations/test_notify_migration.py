@@ -0,0 +1,84 @@
+import contextlib
+import select
+import threading
+import psycopg2
+
+from magistrate.db import migration_checksum
+from magistrate.execution import HardcodedSource, MigrationParameters, VersionMigration, execute_migration
+from magistrate.notify import VersionChange, VersionListener, parse_notification
+from magistrate.parser import Migration
+
+def _migrations() -> list[Migration]:
+    return [
+        Migration(version=1, up_queries=['CREATE TABLE a (id int);'], down_queries=['DROP TABLE a;'], backwards_compatible=True),
+        Migration(version=2, up_queries=['CREATE TABLE b (id int);'], down_queries=['DROP TABLE b;'], backwards_compatible=True)
+    ]
+
+def _migrate(conn_string: str, target: int | str, channel: str | None = 'magistrate_version') -> int:
+    return execute_migration(MigrationParameters(
+        connection_string=conn_string,
+        migration_source=HardcodedSource(migrations=_migrations()),
+        migration_type=VersionMigration(target_version=target),
+        notify_channel=channel
+    ))
+
+def _drain(conn) -> list[VersionChange]:
+    select.select([conn], [], [], 1.0)
+    conn.poll()
+
+    changes = [parse_notification(notify.payload) for notify in conn.notifies]
+    conn.notifies.clear()
+
+    return changes
+
+def test_notify_on_each_committed_version(conn_string, db):
+    migrations = _migrations()
+
+    with contextlib.closing(psycopg2.connect(conn_string)) as conn:
+        conn.autocommit = True
+
+        with conn.cursor() as cur:
+            cur.execute('LISTEN magistrate_version')
+
+        assert _migrate(conn_string, 'latest') == 2
+
+        assert _drain(conn) == [
+            VersionChange(old_version=0, new_version=1, migrated=1, direction='up', checksum=migration_checksum(migrations[0])),
+            VersionChange(old_version=1, new_version=2, migrated=2, direction='up', checksum=migration_checksum(migrations[1]))
+        ]
+
+        assert _migrate(conn_string, 1) == 1
+
+        assert _drain(conn) == [
+            VersionChange(old_version=2, new_version=1, migrated=2, direction='down', checksum=migration_checksum(migrations[1]))
+        ]
+
+def test_no_notify_without_channel(conn_string, db):
+    with contextlib.closing(psycopg2.connect(conn_string)) as conn:
+        conn.autocommit = True
+
+        with conn.cursor() as cur:
+            cur.execute('LISTEN magistrate_version')
+
+        _migrate(conn_string, 'latest', None)
+
+        assert _drain(conn) == []
+
+def test_listener_invokes_callback(conn_string, db):
+    _migrate(conn_string, 1)
+
+    received = threading.Event()
+    seen: list[VersionChange] = []
+
+    def callback(change: VersionChange):
+        seen.append(change)
+        received.set()
+
+    with VersionListener(conn_string, callback, poll_interval=0.1) as listener:
+        assert listener.version == 1
+
+        _migrate(conn_string, 2)
+
+        assert received.wait(5)
+
+    assert [(change.old_version, change.new_version, change.direction) for change in seen] == [(1, 2, 'up')]
@@ -0,0 +1,99 @@
+import psycopg2
+
+from magistrate.execution import HardcodedSource, MigrationParameters, VersionMigration, execute_migration
+from magistrate.parser import Migration, PartitionedIndex
+from magistrate.partitions import PartitionProgress, PartitionSettings
+
+def test_partitioned_index_migration(conn_string, db):
+    progress: list[PartitionProgress] = []
+
+    migrations = [
+        Migration(
+            version=1,
+            up_queries=[
+                'CREATE TABLE events (id bigint, created_at date not null) PARTITION BY RANGE (created_at);',
+                "CREATE TABLE events_2024 PARTITION OF events FOR VALUES FROM ('2024-01-01') TO ('2025-01-01');",
+                "CREATE TABLE events_2025 PARTITION OF events FOR VALUES FROM ('2025-01-01') TO ('2026-01-01');",
+                "CREATE TABLE events_2026 PARTITION OF events FOR VALUES FROM ('2026-01-01') TO ('2027-01-01');"
+            ],
+            down_queries=['DROP TABLE events;'],
+            backwards_compatible=True
+        ),
+        Migration(
+            version=2,
+            up_queries=[
+                PartitionedIndex(name='events_created_at_idx', table='events', definition='(created_at)')
+            ],
+            down_queries=['DROP INDEX events_created_at_idx;'],
+            backwards_compatible=True,
+            transactional=False
+        )
+    ]
+
+    params = MigrationParameters(
+        connection_string=conn_string,
+        migration_source=HardcodedSource(migrations=migrations),
+        migration_type=VersionMigration(target_version='latest'),
+        partitions=PartitionSettings(workers=2, on_progress=progress.append)
+    )
+
+    assert execute_migration(params) == 2
+    assert sorted(p.completed for p in progress) == [1, 2, 3]
+
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute('''SELECT c.relname, i.indisvalid FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname LIKE '%events_created_at_idx' ORDER BY c.relname''')
+
+            assert cur.fetchall() == [
+                ('events_2024_events_created_at_idx', True),
+                ('events_2025_events_created_at_idx', True),
+                ('events_2026_events_created_at_idx', True),
+                ('events_created_at_idx', True)
+            ]
+
+    params.migration_type = VersionMigration(target_version=1)
+
+    assert execute_migration(params) == 1
+
+def test_unique_partial_partitioned_index_migration(conn_string, db):
+    migrations = [
+        Migration(
+            version=1,
+            up_queries=[
+                'CREATE TABLE events (id bigint, created_at date not null, deleted_at date) PARTITION BY RANGE (created_at);',
+                "CREATE TABLE events_2024 PARTITION OF events FOR VALUES FROM ('2024-01-01') TO ('2025-01-01');",
+                "CREATE TABLE events_2025 PARTITION OF events FOR VALUES FROM ('2025-01-01') TO ('2026-01-01');"
+            ],
+            down_queries=['DROP TABLE events;'],
+            backwards_compatible=True
+        ),
+        Migration(
+            version=2,
+            up_queries=[
+                PartitionedIndex(name='events_key_idx', table='events', unique=True, definition='(id, created_at) WHERE deleted_at IS NULL')
+            ],
+            down_queries=['DROP INDEX events_key_idx;'],
+            backwards_compatible=True,
+            transactional=False
+        )
+    ]
+
+    assert execute_migration(MigrationParameters(
+        connection_string=conn_string,
+        migration_source=HardcodedSource(migrations=migrations),
+        migration_type=VersionMigration(target_version='latest')
+    )) == 2
+
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute('''SELECT c.relname, i.indisunique, i.indpred IS NOT NULL, i.indisvalid FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname LIKE '%events_key_idx' ORDER BY c.relname''')
+
+            assert cur.fetchall() == [
+                ('events_2024_events_key_idx', True, True, True),
+                ('events_2025_events_key_idx', True, True, True),
+                ('events_key_idx', True, True, True)
+            ]
@@ -0,0 +1,62 @@
+import pytest
+
+from magistrate.dbexc import DryRunNotTransactional
+from magistrate.db import get_current_migration_version
+from magistrate.execution import HardcodedSource, MigrationParameters, VersionMigration, execute_migration
+from magistrate.parser import Migration
+from magistrate.plans import HotQuery, PlanGuardSettings, check_plan_regressions
+
+_migrations = [
+    Migration(
+        version=1,
+        up_queries=[
+            'CREATE TABLE users (id int primary key, email text);',
+            'INSERT INTO users SELECT g, \'user\' || g || \'@example.com\' FROM generate_series(1, 10000) g;',
+            'CREATE INDEX users_email_idx ON users (email);',
+            'ANALYZE users;'
+        ],
+        down_queries=['DROP TABLE users;'],
+        backwards_compatible=True
+    ),
+    Migration(version=2, up_queries=['DROP INDEX users_email_idx;'], down_queries=['CREATE INDEX users_email_idx ON users (email);'], backwards_compatible=True),
+    Migration(version=3, up_queries=['CREATE INDEX CONCURRENTLY users_id_email_idx ON users (id, email);'], down_queries=['DROP INDEX users_id_email_idx;'], backwards_compatible=True, transactional=False)
+]
+
+_queries = [
+    HotQuery(name='by_email', query='SELECT id FROM users WHERE email = %s;', params=['user42@example.com']),
+    HotQuery(name='by_id', query='SELECT email FROM users WHERE id = 42;')
+]
+
+def _params(conn_string: str, target: int) -> MigrationParameters:
+    return MigrationParameters(
+        connection_string=conn_string,
+        migration_source=HardcodedSource(migrations=_migrations),
+        migration_type=VersionMigration(target_version=target)
+    )
+
+def test_dry_run_flags_dropped_index(conn_string, db):
+    execute_migration(_params(conn_string, 1))
+
+    report = check_plan_regressions(_params(conn_string, 2), PlanGuardSettings(queries=_queries))
+
+    assert report.version_before == 1
+    assert report.version_after == 2
+    assert [(regression.name, regression.kind) for regression in report.regressions] == [('by_email', 'seq_scan'), ('by_email', 'cost')]
+
+    # the dry run was rolled back
+    assert get_current_migration_version(conn_string) == 1
+    assert check_plan_regressions(_params(conn_string, 2), PlanGuardSettings(queries=_queries)).regressions == report.regressions
+
+def test_dry_run_rejects_non_transactional(conn_string, db):
+    execute_migration(_params(conn_string, 1))
+
+    with pytest.raises(DryRunNotTransactional):
+        check_plan_regressions(_params(conn_string, 3), PlanGuardSettings(queries=_queries))
+
+def test_staging_run_migrates(conn_string, db):
+    execute_migration(_params(conn_string, 1))
+
+    report = check_plan_regressions(_params(conn_string, 2), PlanGuardSettings(queries=_queries, dry_run=False))
+
+    assert len(report.regressions) == 2
+    assert get_current_migration_version(conn_string) == 2
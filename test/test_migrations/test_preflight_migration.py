@@ -0,0 +1,55 @@
+import pytest
+
+from magistrate.db import get_current_migration_version
+from magistrate.dbexc import PreflightRejected
+from magistrate.execution import HardcodedSource, MigrationParameters, VersionMigration, execute_migration
+from magistrate.parser import Migration
+from magistrate.preflight import PreflightReport, PreflightSettings, preflight_migration
+
+_migrations = [
+    Migration(
+        version=1,
+        up_queries=['CREATE TABLE abc (id int, value int);', 'INSERT INTO abc SELECT g, g FROM generate_series(1, 10000) g;', 'ANALYZE abc;'],
+        down_queries=['DROP TABLE abc;'],
+        backwards_compatible=True
+    ),
+    Migration(
+        version=2,
+        up_queries=['ALTER TABLE abc ALTER COLUMN id TYPE bigint;', 'CREATE INDEX abc_value_idx ON abc (value);'],
+        down_queries=['DROP INDEX abc_value_idx;', 'ALTER TABLE abc ALTER COLUMN id TYPE int;'],
+        backwards_compatible=True
+    )
+]
+
+def _params(conn_string: str, target: int, preflight: PreflightSettings | None = None) -> MigrationParameters:
+    return MigrationParameters(
+        connection_string=conn_string,
+        migration_source=HardcodedSource(migrations=_migrations),
+        migration_type=VersionMigration(target_version=target),
+        preflight=preflight
+    )
+
+def test_preflight_report(conn_string, db):
+    execute_migration(_params(conn_string, 1))
+
+    report = preflight_migration(_params(conn_string, 2), PreflightSettings())
+    rewrite, index = report.versions[0].statements
+
+    assert rewrite.operation == 'rewrite'
+    assert index.operation == 'index_build'
+    assert rewrite.tables[0].exists and rewrite.tables[0].heap_bytes > 0
+    assert rewrite.tables[0].rows == 10000
+    assert report.peak_extra_bytes > rewrite.tables[0].heap_bytes
+
+def test_preflight_refuses_to_start(conn_string, db):
+    execute_migration(_params(conn_string, 1))
+
+    reports: list[PreflightReport] = []
+
+    with pytest.raises(PreflightRejected):
+        execute_migration(_params(conn_string, 2, PreflightSettings(free_bytes=1024, on_report=reports.append)))
+
+    assert len(reports[0].rejections) == 1
+    assert get_current_migration_version(conn_string) == 1
+
+    assert execute_migration(_params(conn_string, 2, PreflightSettings(time_budget_seconds=60))) == 2
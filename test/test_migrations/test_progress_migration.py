@@ -0,0 +1,33 @@
+from magistrate.execution import HardcodedSource, MigrationParameters, VersionMigration, execute_migration
+from magistrate.parser import Migration
+from magistrate.progress import ProgressSettings, StatementProgress
+
+def test_progress_of_index_build(conn_string, db):
+    migrations = [
+        Migration(
+            version=1,
+            up_queries=['CREATE TABLE abc (id int, value text);', 'INSERT INTO abc SELECT g, md5(g::text) FROM generate_series(1, 2000000) g;'],
+            down_queries=['DROP TABLE abc;'],
+            backwards_compatible=True
+        ),
+        Migration(version=2, up_queries=['CREATE INDEX abc_value_idx ON abc (value);'], down_queries=['DROP INDEX abc_value_idx;'], backwards_compatible=True)
+    ]
+
+    events: list[StatementProgress] = []
+
+    params = MigrationParameters(
+        connection_string=conn_string,
+        migration_source=HardcodedSource(migrations=migrations),
+        migration_type=VersionMigration(target_version=1)
+    )
+
+    execute_migration(params)
+
+    params.migration_type = VersionMigration(target_version=2)
+    params.progress = ProgressSettings(on_progress=events.append, poll_interval=0.01)
+
+    assert execute_migration(params) == 2
+
+    assert len(events) > 0
+    assert all(event.version == 2 and event.command == 'CREATE INDEX' and event.relation == 'abc' for event in events)
+    assert events[-1].finished
@@ -0,0 +1,64 @@
+import os
+import shutil
+import psycopg2
+
+from magistrate.execution import HardcodedSource, MigrationParameters, RepeatableSource, VersionMigration, execute_migration
+from magistrate.parser import Migration
+from test.test_common import TEST_DATA_FOLDER
+
+_repeatable_folder = os.path.join(TEST_DATA_FOLDER, 'test_migrations_data', 'test_repeatable')
+
+def _applied_at(conn_string) -> dict[str, object]:
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT name, applied_at FROM magistrate_repeatable')
+            return dict(cur.fetchall())
+
+def test_repeatable_migration(conn_string, db, tmp_path):
+    shutil.copytree(_repeatable_folder, tmp_path / 'repeatable')
+
+    params = MigrationParameters(
+        connection_string=conn_string,
+        migration_source=HardcodedSource(migrations=[
+            Migration(
+                version=1,
+                up_queries=['CREATE TABLE abc (id serial primary key, value integer);', 'INSERT INTO abc (value) VALUES (1), (2), (NULL);'],
+                down_queries=['DROP TABLE abc;'],
+                backwards_compatible=True
+            )
+        ]),
+        migration_type=VersionMigration(target_version='latest'),
+        repeatable_source=RepeatableSource(directory=str(tmp_path / 'repeatable'))
+    )
+
+    assert execute_migration(params) == 1
+
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT total, double_value(total::integer) FROM abc_totals')
+            assert cur.fetchone() == (3, 6)
+
+    first = _applied_at(conn_string)
+
+    assert sorted(first.keys()) == ['abc_totals', 'abc_values', 'double_value']
+
+    # nothing changed, nothing is re-applied
+    assert execute_migration(params) == 1
+    assert _applied_at(conn_string) == first
+
+    with open(tmp_path / 'repeatable' / 'abc_values.rep.sql', 'w') as f:
+        f.write('CREATE OR REPLACE VIEW abc_values AS\nSELECT id, value FROM abc WHERE value > 1;\n')
+
+    assert execute_migration(params) == 1
+
+    second = _applied_at(conn_string)
+
+    assert second['abc_values'] != first['abc_values']
+    assert second['abc_totals'] != first['abc_totals']
+    assert second['double_value'] == first['double_value']
+
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT total FROM abc_totals')
+            assert cur.fetchone() == (2,)
+            cur.execute('DROP FUNCTION double_value(integer)')
@@ -0,0 +1,135 @@
+from io import StringIO
+import psycopg2
+import pytest
+
+from magistrate.db import _concurrent_index_name
+from magistrate.dbexc import CheckpointMismatch, InvalidIndexFound, MigrationFailed, PartialMigrationFound
+from magistrate.execution import HardcodedSource, MigrationParameters, VersionMigration, execute_migration
+from magistrate.parser import Migration, parse_migration
+
+def _migration(third_statement: str, first_statement: str = 'CREATE TABLE abc (id serial primary key, val integer);') -> Migration:
+    return Migration(
+        version=1,
+        up_queries=[
+            first_statement,
+            'INSERT INTO abc (val) VALUES (1);',
+            third_statement,
+            'INSERT INTO abc (val) VALUES (3);'
+        ],
+        down_queries=['DROP TABLE abc;'],
+        backwards_compatible=True,
+        transactional=False
+    )
+
+def _params(conn_string: str, migration: Migration, resume: bool) -> MigrationParameters:
+    return MigrationParameters(
+        connection_string=conn_string,
+        migration_source=HardcodedSource(migrations=[migration]),
+        migration_type=VersionMigration(target_version='latest'),
+        resume=resume
+    )
+
+def test_transactional_header():
+    parsed = parse_migration(StringIO('-- ver: 1\n-- transactional: false\n-- up\nSELECT 1;\n-- down\nSELECT 2;\n'))
+    assert parsed.transactional is False
+
+    parsed = parse_migration(StringIO('-- ver: 1\n-- up\nSELECT 1;\n-- down\nSELECT 2;\n'))
+    assert parsed.transactional is True
+
+def test_resume_non_transactional_migration(conn_string, db):
+    with pytest.raises(MigrationFailed):
+        execute_migration(_params(conn_string, _migration('INSERT INTO missing_table VALUES (2);'), resume=False))
+
+    with pytest.raises(MigrationFailed) as exc_info:
+        execute_migration(_params(conn_string, _migration('INSERT INTO abc (val) VALUES (2);'), resume=False))
+
+    assert isinstance(exc_info.value.__cause__, PartialMigrationFound)
+    assert exc_info.value.__cause__.completed_statements == 2
+
+    with pytest.raises(MigrationFailed) as exc_info:
+        execute_migration(_params(conn_string, _migration('INSERT INTO abc (val) VALUES (2);', 'CREATE TABLE abc (id int);'), resume=True))
+
+    assert isinstance(exc_info.value.__cause__, CheckpointMismatch)
+    assert exc_info.value.__cause__.statement_index == 0
+
+    new_version = execute_migration(_params(conn_string, _migration('INSERT INTO abc (val) VALUES (2);'), resume=True))
+
+    assert new_version == 1
+
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT val FROM abc ORDER BY id')
+            assert cur.fetchall() == [(1,), (2,), (3,)]
+
+            cur.execute('SELECT count(*) FROM magistrate_progress')
+            assert cur.fetchall() == [(0,)]
+
+def test_concurrent_index_name():
+    assert _concurrent_index_name('CREATE UNIQUE INDEX CONCURRENTLY abc_val_idx ON abc (val);') == 'abc_val_idx'
+    assert _concurrent_index_name('-- built online\ncreate index concurrently if not exists "Val Idx" on only app."Abc" (val);') == 'app."Val Idx"'
+    assert _concurrent_index_name('CREATE INDEX abc_val_idx ON abc (val);') is None
+
+def _index_migration(index_statement: str, last_statement: str) -> Migration:
+    return Migration(
+        version=1,
+        up_queries=[
+            'CREATE TABLE abc (id serial primary key, val integer);',
+            'INSERT INTO abc (val) VALUES (1), (1);',
+            index_statement,
+            last_statement
+        ],
+        down_queries=['DROP TABLE abc;'],
+        backwards_compatible=True,
+        transactional=False
+    )
+
+def test_resume_drops_invalid_concurrent_index(conn_string, db):
+    migration = _index_migration('CREATE UNIQUE INDEX CONCURRENTLY abc_val_idx ON abc (val);', 'INSERT INTO abc (val) VALUES (3);')
+
+    # the duplicate rows leave an INVALID index behind
+    with pytest.raises(MigrationFailed):
+        execute_migration(_params(conn_string, migration, resume=False))
+
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute('DELETE FROM abc WHERE id = 2')
+
+    assert execute_migration(_params(conn_string, migration, resume=True)) == 1
+
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = 'abc_val_idx'::regclass")
+            assert cur.fetchall() == [(True,)]
+
+def test_invalid_concurrent_index_kept_without_resume(conn_string, db):
+    migration = _index_migration('CREATE UNIQUE INDEX CONCURRENTLY abc_val_idx ON abc (val);', 'INSERT INTO abc (val) VALUES (3);')
+
+    with pytest.raises(MigrationFailed):
+        execute_migration(_params(conn_string, migration, resume=False))
+
+    # resumes at the INSERT, so the index statement is not the one the earlier run was interrupted in
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute('DELETE FROM magistrate_progress WHERE statement_index = 1')
+            cur.execute('DELETE FROM abc WHERE id = 2')
+
+    with pytest.raises(MigrationFailed) as ex_info:
+        execute_migration(_params(conn_string, migration, resume=True))
+
+    assert isinstance(ex_info.value.__cause__, InvalidIndexFound)
+
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = 'abc_val_idx'::regclass")
+            assert cur.fetchall() == [(False,)]
+
+def test_resume_skips_built_concurrent_index(conn_string, db):
+    with pytest.raises(MigrationFailed):
+        execute_migration(_params(conn_string, _index_migration('CREATE INDEX CONCURRENTLY abc_val_idx ON abc (val);', 'INSERT INTO missing_table VALUES (3);'), resume=False))
+
+    # as if the run stopped between building the index and recording it
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute('DELETE FROM magistrate_progress WHERE statement_index = 2')
+
+    assert execute_migration(_params(conn_string, _index_migration('CREATE INDEX CONCURRENTLY abc_val_idx ON abc (val);', 'INSERT INTO abc (val) VALUES (3);'), resume=True)) == 1
@@ -0,0 +1,39 @@
+import json
+import os
+import threading
+import urllib.request
+
+from magistrate.execution import DirectorySource
+from magistrate.server import ServerParameters, create_server
+from test.test_common import TEST_DATA_FOLDER
+
+_directory_source_folder = os.path.join(TEST_DATA_FOLDER, 'test_migrations_data', 'test_directory_select_migrations')
+
+def _request(url: str, method: str = 'GET') -> dict:
+    with urllib.request.urlopen(urllib.request.Request(url, method=method)) as response:
+        return json.loads(response.read())
+
+def test_server(conn_string, db):
+    server = create_server(ServerParameters(
+        connection_string=conn_string,
+        migration_source=DirectorySource(directory=_directory_source_folder),
+        port=0
+    ))
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+
+    try:
+        assert _request(f'{base}/version') == {'version': 0}
+        assert _request(f'{base}/status') == {'version': 0, 'highest_version': 4, 'current': False, 'migrating': False}
+        assert _request(f'{base}/plan?target=2') == {'version': 0, 'target_version': 2, 'direction': 'up', 'versions': [1, 2]}
+
+        assert _request(f'{base}/migrate?target=latest', method='POST') == {'version': 4}
+        assert _request(f'{base}/status')['current'] is True
+        assert _request(f'{base}/plan?target=2')['versions'] == [4, 3]
+    finally:
+        server.shutdown()
+        server.server_close()
+        server.migration_server.close()
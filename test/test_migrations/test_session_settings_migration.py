@@ -0,0 +1,63 @@
+import psycopg2
+import pytest
+
+from magistrate.db import get_current_migration_version
+from magistrate.dbexc import SettingNotAllowed
+from magistrate.execution import HardcodedSource, MigrationParameters, VersionMigration, execute_migration
+from magistrate.parser import Migration
+
+def _migrations() -> list[Migration]:
+    return [
+        Migration(version=1, up_queries=['CREATE TABLE seen (version int, work_mem text);'], down_queries=['DROP TABLE seen;'], backwards_compatible=True),
+        Migration(
+            version=2,
+            up_queries=["INSERT INTO seen VALUES (2, current_setting('work_mem'));"],
+            down_queries=['DELETE FROM seen WHERE version = 2;'],
+            backwards_compatible=True,
+            settings={'work_mem': '77MB'}
+        ),
+        Migration(
+            version=3,
+            up_queries=["INSERT INTO seen VALUES (3, current_setting('work_mem'));", "INSERT INTO seen VALUES (3, current_setting('work_mem'));"],
+            down_queries=['DELETE FROM seen WHERE version = 3;'],
+            backwards_compatible=True,
+            transactional=False,
+            settings={'work_mem': '99MB'}
+        ),
+        Migration(
+            version=4,
+            up_queries=["INSERT INTO seen VALUES (4, current_setting('work_mem'));"],
+            down_queries=['DELETE FROM seen WHERE version = 4;'],
+            backwards_compatible=True
+        )
+    ]
+
+def test_settings_apply_to_their_migration_only(conn_string, db):
+    assert execute_migration(MigrationParameters(
+        connection_string=conn_string,
+        migration_source=HardcodedSource(migrations=_migrations()),
+        migration_type=VersionMigration(target_version='latest')
+    )) == 4
+
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute('SHOW work_mem')
+            default = cur.fetchone()[0]
+
+            cur.execute('SELECT version, work_mem FROM seen ORDER BY version')
+            seen = cur.fetchall()
+
+    assert seen == [(2, '77MB'), (3, '99MB'), (3, '99MB'), (4, default)]
+
+def test_disallowed_setting_applies_nothing(conn_string, db):
+    migrations = _migrations()
+    migrations[2].settings['search_path'] = 'elsewhere'
+
+    with pytest.raises(SettingNotAllowed):
+        execute_migration(MigrationParameters(
+            connection_string=conn_string,
+            migration_source=HardcodedSource(migrations=migrations),
+            migration_type=VersionMigration(target_version='latest')
+        ))
+
+    assert get_current_migration_version(conn_string) == 0
@@ -0,0 +1,62 @@
+import psycopg2
+import pytest
+
+from magistrate.dbexc import DowngradeSchemaMismatch
+from magistrate.execution import HardcodedSource
+from magistrate.parser import Migration
+from magistrate.snapshot import capture_snapshot, compare_schema
+from magistrate.validation import validate_migrations
+
+def test_capture_snapshot(conn_string, db):
+    validate_migrations(conn_string, HardcodedSource(migrations=[]))
+
+    empty = capture_snapshot(conn_string)
+
+    assert empty.relations == {}
+
+    validate_migrations(conn_string, HardcodedSource(migrations=[
+        Migration(
+            version=1,
+            up_queries=[
+                "CREATE TYPE status AS ENUM ('pending', 'approved');",
+                'CREATE TABLE abc (id serial primary key, value integer not null default 1, status status);',
+                'CREATE INDEX abc_value_idx ON abc (value);',
+                'CREATE FUNCTION abc_count() RETURNS bigint AS $$ SELECT count(*) FROM abc $$ LANGUAGE sql;'
+            ],
+            down_queries=[],
+            backwards_compatible=False
+        )
+    ]))
+
+    snapshot = capture_snapshot(conn_string)
+
+    assert snapshot.relations['public.abc'] == 'r'
+    assert snapshot.columns['public.abc.value'] == 'integer not null default 1'
+    assert 'public.abc_value_idx' in snapshot.indexes
+    assert snapshot.constraints['public.abc.abc_pkey'] == 'PRIMARY KEY (id)'
+    assert 'public.abc_count()' in snapshot.functions
+    assert snapshot.enums['public.status'] == 'pending, approved'
+    assert not any('magistrate' in name for name in snapshot.relations)
+
+    assert compare_schema(conn_string, snapshot) == []
+    assert len(compare_schema(conn_string, empty)) > 0
+
+    # the db fixture only clears tables and enums
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            cur.execute('DROP FUNCTION abc_count();')
+
+def test_validation_detects_incomplete_down(conn_string, db):
+    source = HardcodedSource(migrations=[
+        Migration(
+            version=1,
+            up_queries=['CREATE TABLE abc (id serial primary key);', 'CREATE INDEX abc_id_idx ON abc (id);'],
+            down_queries=['DROP INDEX abc_id_idx;'],
+            backwards_compatible=True
+        )
+    ])
+
+    with pytest.raises(DowngradeSchemaMismatch) as ex:
+        validate_migrations(conn_string, source)
+
+    assert ex.value.version == 1
@@ -0,0 +1,82 @@
+import os
+import psycopg2
+from psycopg2 import sql
+
+from magistrate.db import get_current_migration_version
+from magistrate.execution import DirectorySource
+from magistrate.testing import TemplateDatabase, database_connection_string
+from test.test_common import TEST_DATA_FOLDER
+
+_directory_source_folder = os.path.join(TEST_DATA_FOLDER, 'test_migrations_data', 'test_directory_select_migrations')
+
+def test_template_database(conn_string):
+    template = TemplateDatabase(
+        connection_string=conn_string,
+        migration_source=DirectorySource(directory=_directory_source_folder),
+        prefix='magistrate_test_template'
+    )
+
+    name = template.ensure()
+
+    first = template.create_database()
+    second = template.create_database()
+
+    try:
+        assert first != second
+        assert get_current_migration_version(first) == 4
+        assert get_current_migration_version(second) == 4
+
+        # a fresh object fingerprints again and reuses the template that is already built
+        assert TemplateDatabase(
+            connection_string=conn_string,
+            migration_source=template.migration_source,
+            prefix='magistrate_test_template'
+        ).ensure() == name
+    finally:
+        template.drop_database(first)
+        template.drop_database(second)
+
+        conn = psycopg2.connect(conn_string)
+        conn.autocommit = True
+
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL('ALTER DATABASE {} WITH IS_TEMPLATE false').format(sql.Identifier(name)))
+            cur.execute(sql.SQL('DROP DATABASE {}').format(sql.Identifier(name)))
+
+        conn.close()
+
+def test_stale_template_in_use_stays_template(conn_string):
+    stale = 'magistrate_test_stale_0123456789abcdef'
+    template = TemplateDatabase(
+        connection_string=conn_string,
+        migration_source=DirectorySource(directory=_directory_source_folder),
+        prefix='magistrate_test_stale'
+    )
+
+    admin = psycopg2.connect(conn_string)
+    admin.autocommit = True
+
+    with admin.cursor() as cur:
+        cur.execute(sql.SQL('CREATE DATABASE {}').format(sql.Identifier(stale)))
+        cur.execute(sql.SQL('ALTER DATABASE {} WITH IS_TEMPLATE true').format(sql.Identifier(stale)))
+
+    # holds the stale template open, like a run still copying from it
+    in_use = psycopg2.connect(database_connection_string(conn_string, stale))
+    name = None
+
+    try:
+        name = template.ensure()
+
+        with admin.cursor() as cur:
+            cur.execute('SELECT datistemplate FROM pg_database WHERE datname = %s', (stale,))
+            assert cur.fetchall() == [(True,)]
+    finally:
+        in_use.close()
+
+        with admin.cursor() as cur:
+            for database in [stale, name]:
+                if database is not None:
+                    cur.execute(sql.SQL('ALTER DATABASE {} WITH IS_TEMPLATE false').format(sql.Identifier(database)))
+                    cur.execute(sql.SQL('DROP DATABASE {}').format(sql.Identifier(database)))
+
+        admin.close()
@@ -0,0 +1,32 @@
+import os
+import pytest
+
+from magistrate.db import get_current_migration_version
+from magistrate.ephemeral import find_postgres_binary
+from magistrate.exc import PostgresBinaryNotFound
+from magistrate.execution import DirectorySource
+from magistrate.validation import validate_migrations, validate_migrations_ephemeral
+from test.test_common import TEST_DATA_FOLDER
+
+_directory_source_folder = os.path.join(TEST_DATA_FOLDER, 'test_migrations_data', 'test_directory_select_migrations')
+
+def test_validate_migrations(conn_string, db):
+    report = validate_migrations(conn_string, DirectorySource(directory=_directory_source_folder))
+
+    assert report.start_version == 0
+    assert report.highest_version == 4
+    assert [timing.version for timing in report.timings] == [1, 2, 3, 4]
+    assert all(timing.down_seconds is not None for timing in report.timings)
+    assert report.down_stopped_at is None
+    assert get_current_migration_version(conn_string) == 0
+
+def test_validate_migrations_ephemeral():
+    try:
+        find_postgres_binary('initdb')
+    except PostgresBinaryNotFound:
+        pytest.skip('initdb is not installed')
+
+    report = validate_migrations_ephemeral(DirectorySource(directory=_directory_source_folder))
+
+    assert [timing.version for timing in report.timings] == [1, 2, 3, 4]
+    assert report.setup_seconds > 0
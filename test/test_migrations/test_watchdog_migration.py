@@ -0,0 +1,102 @@
+import threading
+import time
+import psycopg2
+import pytest
+
+from magistrate.dbexc import MigrationBlockedTraffic
+from magistrate.execution import HardcodedSource, MigrationParameters, VersionMigration, execute_migration
+from magistrate.parser import Migration
+from magistrate.watchdog import LockWatchdogSettings
+
+def _blocked_reader(conn_string: str, started: threading.Event):
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            started.set()
+            cur.execute('SELECT count(*) FROM abc')
+
+def test_watchdog_cancels_blocking_migration(conn_string, db):
+    migrations = [
+        Migration(version=1, up_queries=['CREATE TABLE abc (id int);'], down_queries=['DROP TABLE abc;'], backwards_compatible=True),
+        Migration(
+            version=2,
+            up_queries=['LOCK TABLE abc IN ACCESS EXCLUSIVE MODE;', 'SELECT pg_sleep(30);'],
+            down_queries=['SELECT 1;'],
+            backwards_compatible=True
+        )
+    ]
+
+    params = MigrationParameters(
+        connection_string=conn_string,
+        migration_source=HardcodedSource(migrations=migrations),
+        migration_type=VersionMigration(target_version=1)
+    )
+
+    execute_migration(params)
+
+    params.migration_type = VersionMigration(target_version=2)
+    params.watchdog = LockWatchdogSettings(max_blocked_sessions=1, max_blocked_seconds=None, poll_interval=0.05)
+
+    readers: list[threading.Thread] = []
+
+    def _start_readers():
+        time.sleep(0.5)
+
+        for _ in range(3):
+            started = threading.Event()
+            readers.append(threading.Thread(target=_blocked_reader, args=(conn_string, started), daemon=True))
+            readers[-1].start()
+            started.wait()
+
+    threading.Thread(target=_start_readers, daemon=True).start()
+
+    started_at = time.monotonic()
+
+    with pytest.raises(MigrationBlockedTraffic) as ex:
+        execute_migration(params)
+
+    assert time.monotonic() - started_at < 10
+    assert ex.value.version_failed == 2
+    assert ex.value.version_end == 1
+    assert ex.value.blocked_sessions >= 2
+
+    for reader in readers:
+        reader.join(5)
+
+def _late_blocked_reader(conn_string: str, started: threading.Event):
+    with psycopg2.connect(conn_string) as conn:
+        with conn.cursor() as cur:
+            started.set()
+            # one long statement that only reaches the locked table after running for a while
+            cur.execute('DO $$ BEGIN PERFORM pg_sleep(3); PERFORM count(*) FROM abc; END $$')
+
+def test_watchdog_ignores_time_before_lock_wait(conn_string, db):
+    migrations = [
+        Migration(version=1, up_queries=['CREATE TABLE abc (id int);'], down_queries=['DROP TABLE abc;'], backwards_compatible=True),
+        Migration(
+            version=2,
+            up_queries=['LOCK TABLE abc IN ACCESS EXCLUSIVE MODE;', 'SELECT pg_sleep(4);'],
+            down_queries=['SELECT 1;'],
+            backwards_compatible=True
+        )
+    ]
+
+    params = MigrationParameters(
+        connection_string=conn_string,
+        migration_source=HardcodedSource(migrations=migrations),
+        migration_type=VersionMigration(target_version=1)
+    )
+
+    execute_migration(params)
+
+    started = threading.Event()
+    reader = threading.Thread(target=_late_blocked_reader, args=(conn_string, started), daemon=True)
+    reader.start()
+    started.wait()
+
+    # the reader waits about a second on the lock, after its statement has already run for three
+    params.migration_type = VersionMigration(target_version=2)
+    params.watchdog = LockWatchdogSettings(max_blocked_sessions=None, max_blocked_seconds=2.5, poll_interval=0.05)
+
+    assert execute_migration(params) == 2
+
+    reader.join(5)
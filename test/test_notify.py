@@ -0,0 +1,69 @@
+import json
+import pytest
+
+from magistrate.db import migration_checksum
+from magistrate.notify import VersionChange, VersionListener, parse_notification
+from magistrate.parser import CopyData, LazyMigration, Migration, StreamingMigration, parse_migration
+
+def _migration(up: str) -> Migration:
+    return Migration(version=2, up_queries=[up], down_queries=['DROP TABLE t;'], backwards_compatible=True)
+
+def test_parse_notification():
+    change = parse_notification(json.dumps({'old_version': 1, 'new_version': 3, 'migrated': 3, 'direction': 'up', 'checksum': 'abc'}))
+    assert change == VersionChange(old_version=1, new_version=3, migrated=3, direction='up', checksum='abc')
+
+    # only the versions are required
+    assert parse_notification('{"old_version": 3, "new_version": 2}').checksum is None
+
+@pytest.mark.parametrize('payload', ['', 'reload', '{"old_version": 1}', '{"old_version": 1, "new_version": 2, "direction": "sideways"}'])
+def test_parse_notification_invalid(payload):
+    with pytest.raises(ValueError):
+        parse_notification(payload)
+
+def test_migration_checksum():
+    assert migration_checksum(_migration('CREATE TABLE t (id int);')) == migration_checksum(_migration('CREATE TABLE t (id int);'))
+    assert migration_checksum(_migration('CREATE TABLE t (id int);')) != migration_checksum(_migration('CREATE TABLE t (id bigint);'))
+
+def test_streaming_migration_checksum(tmp_path):
+    path = tmp_path / '2.sql'
+    path.write_text('-- ver: 2\n-- up\nCREATE TABLE t (id int);\n-- down\nDROP TABLE t;\n')
+
+    first = migration_checksum(StreamingMigration(str(path)))
+    path.write_text('-- ver: 2\n-- up\nCREATE TABLE t (id bigint);\n-- down\nDROP TABLE t;\n')
+
+    assert first != migration_checksum(StreamingMigration(str(path)))
+
+_copy_migration = '-- ver: 2\n-- transactional: false\n-- up\n-- copy: t (id)\n1\n2\n\\.\nCREATE INDEX t_idx ON t (id);\n-- down\nDROP INDEX t_idx;\n'
+
+def test_streaming_checksum_matches_parsed(tmp_path):
+    path = tmp_path / '2.mig.sql'
+    path.write_text(_copy_migration)
+
+    with open(path) as f:
+        parsed = parse_migration(f)
+
+    streaming = StreamingMigration(str(path))
+
+    # read through while the statements run, the way the runner consumes them
+    for statement in streaming.up_queries:
+        if isinstance(statement, CopyData):
+            statement.open_rows().read()
+
+    assert streaming.checksum == parsed.checksum
+    assert migration_checksum(streaming) == migration_checksum(parsed)
+    assert migration_checksum(StreamingMigration(str(path))) == parsed.checksum
+    assert LazyMigration.from_text(2, _copy_migration.replace('\n', '\r\n')).load().checksum == parsed.checksum
+
+def test_listener_survives_failing_callback():
+    seen: list[VersionChange] = []
+
+    def callback(change: VersionChange):
+        seen.append(change)
+        raise RuntimeError('cache refresh failed')
+
+    listener = VersionListener('postgresql://unused', callback)
+    listener._emit(VersionChange(old_version=1, new_version=2))
+    listener._catch_up(4)
+
+    assert [(change.old_version, change.new_version) for change in seen] == [(1, 2), (2, 4)]
+    assert listener.version == 4
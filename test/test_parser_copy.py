@@ -0,0 +1,36 @@
+import os
+
+from magistrate.parser import CopyData, parse_migration
+from test.test_common import TEST_DATA_FOLDER
+
+_copy_migration_path = os.path.join(TEST_DATA_FOLDER, 'test_parser_data', 'copy')
+
+def test_inline_copy_section():
+    with open(os.path.join(_copy_migration_path, 'ver_1_inline_copy.mig.sql'), 'r') as f:
+        parsed = parse_migration(f)
+
+    assert parsed.up_queries[0].strip() == 'CREATE TABLE lookup (id integer primary key, name text);'
+
+    copy = parsed.up_queries[1]
+
+    assert isinstance(copy, CopyData)
+    assert copy.table == 'lookup'
+    assert copy.columns == ['id', 'name']
+    assert copy.format == 'text'
+    assert copy.rows == '1\tone\n2\ttwo\n'
+    assert copy.filename is None
+
+    assert [x.strip() for x in parsed.down_queries] == ['DROP TABLE lookup;']
+
+def test_file_copy_section():
+    with open(os.path.join(_copy_migration_path, 'ver_2_file_copy.mig.sql'), 'r') as f:
+        parsed = parse_migration(f)
+
+    copy = parsed.up_queries[1]
+
+    assert isinstance(copy, CopyData)
+    assert copy.table == 'public.regions'
+    assert copy.columns == ['id', 'name']
+    assert copy.format == 'csv'
+    assert copy.rows is None
+    assert copy.filename == os.path.join(_copy_migration_path, 'regions.csv')
@@ -3,7 +3,7 @@ from io import StringIO
 import typing
 import pytest
 
-from magistrate.exc import BackwardsIncompatibilityViolation, DisjointedSections, IncompleteQuery, InvalidMigrationVersion, ManualCommitDisabled, MissingSection, SectionNotSet, VersionCannotBeZero
+from magistrate.exc import BackwardsIncompatibilityViolation, DirectiveRequiresNonTransactional, DisjointedSections, IncompleteQuery, InvalidCopyDirective, InvalidMigrationVersion, ManualCommitDisabled, MissingSection, SectionNotSet, UnterminatedCopyData, VersionCannotBeZero
 from magistrate.parser import MigrationDirection, parse_migration
 
 _invalid_migration_path = os.path.abspath(os.path.join(
@@ -49,6 +49,25 @@ _invalid_parser_data: list[tuple[str, typing.Type[Exception], typing.Callable[[E
         lambda ex: typing.cast(IncompleteQuery, ex).query == 'DROP TABLE \n'
     ),
 
+    # copy tests
+    (
+        'copy_unterminated_rows.mig.sql',
+        UnterminatedCopyData,
+        lambda ex: typing.cast(UnterminatedCopyData, ex).table == 'lookup'
+    ),
+    (
+        'copy_invalid_directive.mig.sql',
+        InvalidCopyDirective,
+        lambda ex: typing.cast(InvalidCopyDirective, ex).line == '-- copy: lookup'
+    ),
+
+    # partitioned index tests
+    (
+        'partitioned_index_in_transaction.mig.sql',
+        DirectiveRequiresNonTransactional,
+        lambda ex: typing.cast(DirectiveRequiresNonTransactional, ex).directive == 'partitioned_index'
+    ),
+
     # section tests
     (
         'section_missing_down.mig.sql',
@@ -0,0 +1,61 @@
+from io import StringIO
+import pytest
+
+from magistrate.exc import InvalidPartitionedIndexDirective
+from magistrate.parser import PartitionedIndex, parse_migration, parse_partitioned_index_directive
+from magistrate.partitions import partition_index_name
+
+def test_partitioned_index_directive():
+    parsed = parse_migration(StringIO(
+        '-- ver: 1\n'
+        '-- transactional: false\n'
+        '-- up\n'
+        '-- partitioned_index: events_created_at_idx ON public.events USING btree (created_at) WHERE deleted_at IS NULL;\n'
+        '-- down\n'
+        'DROP INDEX events_created_at_idx;\n'
+    ))
+
+    index = parsed.up_queries[0]
+
+    assert isinstance(index, PartitionedIndex)
+    assert index.name == 'events_created_at_idx'
+    assert index.table == 'public.events'
+    assert index.definition == 'USING btree (created_at) WHERE deleted_at IS NULL'
+
+@pytest.mark.parametrize('line,unique,definition', [
+    ('-- partitioned_index: UNIQUE events_key_idx ON events (tenant_id, id)', True, '(tenant_id, id)'),
+    ('-- partitioned_index: events_email_idx ON events (lower(email)) INCLUDE (name) WITH (fillfactor = 70) WHERE email <> \'\'', False, "(lower(email)) INCLUDE (name) WITH (fillfactor = 70) WHERE email <> ''"),
+    ('-- partitioned_index: unique ON events USING hash (code);', False, 'USING hash (code)'),
+])
+def test_partitioned_index_directive_clauses(line, unique, definition):
+    index = parse_partitioned_index_directive(line)
+
+    assert index is not None
+    assert index.unique is unique
+    assert index.definition == definition
+
+@pytest.mark.parametrize('line', [
+    '-- partitioned_index: events_created_at_idx ON events',
+    '-- partitioned_index: events_created_at_idx ON events (created_at',
+    '-- partitioned_index: events_created_at_idx ON events (created_at) garbage',
+    '-- partitioned_index: events_created_at_idx ON events (created_at) WHERE',
+    '-- partitioned_index: events_created_at_idx ON events created_at',
+])
+def test_partitioned_index_directive_invalid(line):
+    with pytest.raises(InvalidPartitionedIndexDirective):
+        parse_migration(StringIO(
+            '-- ver: 1\n'
+            '-- transactional: false\n'
+            '-- up\n'
+            f'{line}\n'
+            '-- down\n'
+            'DROP INDEX events_created_at_idx;\n'
+        ))
+
+def test_partition_index_name():
+    assert partition_index_name('created_idx', 'events_2024_01') == 'events_2024_01_created_idx'
+
+    long_name = partition_index_name('a_rather_long_index_name_for_created_at', 'events_partition_with_a_long_name_2024_01')
+
+    assert len(long_name) <= 63
+    assert long_name != partition_index_name('a_rather_long_index_name_for_created_at', 'events_partition_with_a_long_name_2024_02')
@@ -0,0 +1,84 @@
+import pytest
+
+from magistrate.exc import InvalidHotQueries
+from magistrate.plans import HotQuery, PlanGuardSettings, QueryPlan, ScanNode, _collect_scans, compare_plans, parse_hot_queries
+
+def test_parse_hot_queries():
+    queries = parse_hot_queries('''-- hot paths of the user service
+
+-- query: user_by_email
+-- params: ["a@example.com"]
+SELECT id
+FROM users
+WHERE email = %s;
+
+-- query: count_users
+SELECT count(*) FROM users;
+''')
+
+    assert queries == [
+        HotQuery(name='user_by_email', query='SELECT id\nFROM users\nWHERE email = %s;', params=['a@example.com']),
+        HotQuery(name='count_users', query='SELECT count(*) FROM users;')
+    ]
+
+@pytest.mark.parametrize('text', [
+    'SELECT 1;\n',
+    '-- query: a\n-- query: b\nSELECT 1;\n',
+    '-- query: a\nSELECT 1;\n-- query: a\nSELECT 2;\n',
+    '-- params: [1]\n-- query: a\nSELECT %s;\n',
+    '-- query: a\n-- params: {"id": 1}\nSELECT %(id)s;\n',
+    '-- query: a\nSELECT 1\n',
+    '-- query: a\n',
+])
+def test_parse_hot_queries_invalid(text):
+    with pytest.raises(InvalidHotQueries):
+        parse_hot_queries(text)
+
+def test_collect_scans():
+    plan = {
+        'Node Type': 'Nested Loop',
+        'Plans': [
+            {'Node Type': 'Index Scan', 'Relation Name': 'users', 'Index Name': 'users_email_idx'},
+            {'Node Type': 'Bitmap Heap Scan', 'Relation Name': 'orders', 'Plans': [{'Node Type': 'Bitmap Index Scan', 'Index Name': 'orders_user_idx'}]}
+        ]
+    }
+
+    scans: list[ScanNode] = []
+    _collect_scans(plan, scans)
+
+    assert [str(scan) for scan in scans] == ['Index Scan using users_email_idx', 'Bitmap Heap Scan']
+
+def _plan(name: str, cost: float, *scans: tuple[str, str]) -> QueryPlan:
+    return QueryPlan(name=name, total_cost=cost, scans=[ScanNode(relation=relation, node_type=node_type) for relation, node_type in scans])
+
+def test_compare_plans():
+    before = [
+        _plan('by_email', 8.3, ('users', 'Index Scan')),
+        _plan('join', 100.0, ('users', 'Seq Scan'), ('orders', 'Index Only Scan')),
+        _plan('stable', 10.0, ('users', 'Index Scan')),
+        QueryPlan(name='broken_before', error='column does not exist'),
+        _plan('dropped_column', 5.0, ('users', 'Seq Scan')),
+    ]
+
+    after = [
+        _plan('by_email', 1500.0, ('users', 'Seq Scan')),
+        _plan('join', 150.0, ('users', 'Seq Scan'), ('orders', 'Seq Scan')),
+        _plan('stable', 12.0, ('users', 'Bitmap Heap Scan')),
+        QueryPlan(name='broken_before', error='column does not exist'),
+        QueryPlan(name='dropped_column', error='column "email" does not exist'),
+    ]
+
+    regressions = compare_plans(before, after, 2.0)
+
+    assert [(regression.name, regression.kind) for regression in regressions] == [
+        ('by_email', 'seq_scan'),
+        ('by_email', 'cost'),
+        ('join', 'seq_scan'),
+        ('dropped_column', 'error'),
+    ]
+
+    assert str(regressions[2]) == 'join: orders switched from Index Only Scan to Seq Scan'
+
+def test_plan_guard_settings_invalid():
+    with pytest.raises(ValueError):
+        PlanGuardSettings(queries=[], cost_ratio=1.0)
@@ -0,0 +1,86 @@
+import pytest
+
+import magistrate.preflight
+from magistrate.parser import CopyData, Migration, PartitionedIndex
+from magistrate.preflight import PreflightSettings, TableSize, classify_statement, estimate_migrations_conn, estimate_statement
+
+@pytest.mark.parametrize('statement,operation', [
+    ('CREATE INDEX CONCURRENTLY abc_idx ON abc (id);', 'index_build'),
+    ('ALTER TABLE abc ADD CONSTRAINT abc_pkey PRIMARY KEY (id);', 'index_build'),
+    ('ALTER TABLE abc ALTER COLUMN id TYPE bigint;', 'rewrite'),
+    ('ALTER TABLE abc ADD COLUMN token uuid DEFAULT gen_random_uuid();', 'rewrite'),
+    ('VACUUM FULL abc;', 'rewrite'),
+    ('REFRESH MATERIALIZED VIEW CONCURRENTLY abc_summary;', 'rewrite'),
+    ('ALTER TABLE abc CLUSTER ON abc_idx;', 'other'),
+    ('ALTER TABLE abc ADD COLUMN value integer NOT NULL DEFAULT 0;', 'other'),
+    ('ALTER TABLE abc ALTER COLUMN value SET NOT NULL;', 'scan'),
+    ('ALTER TABLE abc ADD CONSTRAINT abc_def_fk FOREIGN KEY (def_id) REFERENCES def (id);', 'scan'),
+    ('ALTER TABLE abc ADD CONSTRAINT abc_def_fk FOREIGN KEY (def_id) REFERENCES def (id) NOT VALID;', 'other'),
+    ('UPDATE abc SET value = 1;', 'update'),
+    ('INSERT INTO abc VALUES (1) ON CONFLICT (id) DO UPDATE SET value = 2;', 'other'),
+    ('DELETE FROM abc WHERE value = 0;', 'delete'),
+    ('-- UPDATE abc\nCREATE TABLE def (id int);', 'other'),
+])
+def test_classify_statement(statement, operation):
+    assert classify_statement(statement) == operation
+
+def test_classify_directives():
+    assert classify_statement(CopyData(table='abc', columns=['id'], rows='1\n')) == 'copy'
+    assert classify_statement(PartitionedIndex(name='idx', table='events', definition='(id)')) == 'index_build'
+
+_mb = 1024 * 1024
+
+_sizes = {
+    'abc': TableSize(table='abc', exists=True, heap_bytes=100 * _mb, index_bytes=20 * _mb, rows=1000000),
+    'def': TableSize(table='def', exists=False),
+}
+
+_settings = PreflightSettings(scan_bytes_per_second=100 * _mb, write_bytes_per_second=10 * _mb, index_bytes_per_second=50 * _mb, index_size_ratio=0.5)
+
+def test_estimate_statement():
+    rewrite = estimate_statement(0, 'ALTER TABLE abc ALTER COLUMN id TYPE bigint;', _sizes, _settings)
+
+    assert rewrite.seconds == 12.0
+    assert rewrite.extra_bytes == 120 * _mb
+    assert rewrite.transient
+
+    index = estimate_statement(1, 'CREATE INDEX abc_idx ON abc (id);', _sizes, _settings)
+
+    assert index.seconds == 2.0
+    assert index.extra_bytes == 50 * _mb
+    assert not index.transient
+
+    new_table = estimate_statement(2, 'UPDATE def SET id = 1;', _sizes, _settings)
+
+    assert new_table.tables == [_sizes['def']]
+    assert new_table.seconds == 0.0
+
+    copy = estimate_statement(3, CopyData(table='def', columns=['id'], rows='1\n2\n'), _sizes, _settings)
+
+    assert copy.extra_bytes == 4
+
+def test_estimate_refresh_materialized_view():
+    refresh = estimate_statement(0, 'REFRESH MATERIALIZED VIEW CONCURRENTLY abc WITH DATA;', _sizes, _settings)
+
+    assert refresh.tables == [_sizes['abc']]
+    assert refresh.extra_bytes == 120 * _mb
+    assert refresh.transient
+
+def test_estimate_migrations(monkeypatch):
+    monkeypatch.setattr(magistrate.preflight, 'read_table_sizes_conn', lambda conn, tables: {table: _sizes[table] for table in tables})
+
+    migrations = [
+        Migration(version=1, up_queries=['CREATE INDEX abc_idx ON abc (id);'], down_queries=[], backwards_compatible=True),
+        Migration(version=2, up_queries=['ALTER TABLE abc ALTER COLUMN id TYPE bigint;', 'UPDATE def SET id = 1;'], down_queries=[], backwards_compatible=True),
+        Migration(version=3, up_queries=['CLUSTER abc USING abc_idx;'], down_queries=[], backwards_compatible=True)
+    ]
+
+    settings = _settings.model_copy(update={'time_budget_seconds': 20.0, 'free_bytes': 100 * _mb})
+    report = estimate_migrations_conn(None, migrations, 'up', settings)
+
+    assert [version.seconds for version in report.versions] == [2.0, 12.0, 12.0]
+    assert report.seconds == 26.0
+
+    # the index stays, each rewrite gives its old copy back when its version commits
+    assert report.peak_extra_bytes == 170 * _mb
+    assert len(report.rejections) == 2
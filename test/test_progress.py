@@ -0,0 +1,47 @@
+import time
+
+from magistrate.progress import ProgressReporter, ProgressSettings, StatementProgress
+
+def _reporter(events: list[StatementProgress]) -> ProgressReporter:
+    return ProgressReporter(ProgressSettings(on_progress=events.append), lambda: None, 1234, 7)
+
+def test_progress_percent_and_eta(monkeypatch):
+    clock = iter([100.0, 110.0, 120.0])
+    monkeypatch.setattr(time, 'monotonic', lambda: next(clock))
+
+    events: list[StatementProgress] = []
+    reporter = _reporter(events)
+
+    reporter._report(reporter._progress('CREATE INDEX', 'building index: scanning table', 'abc', 0, 1000))
+    reporter._report(reporter._progress('CREATE INDEX', 'building index: scanning table', 'abc', 250, 1000))
+    reporter._report(reporter._progress('CREATE INDEX', 'building index: loading tuples in tree', 'abc', 0, 50000))
+
+    assert [event.version for event in events] == [7, 7, 7]
+    assert events[0].percent == 0.0 and events[0].eta_seconds is None
+
+    # a quarter done in 10s, so three quarters are left for 30s
+    assert events[1].percent == 25.0
+    assert events[1].eta_seconds == 30.0
+    assert events[1].elapsed_seconds == 10.0
+
+    # a new phase starts its own estimate, the command keeps its elapsed time
+    assert events[2].eta_seconds is None
+    assert events[2].elapsed_seconds == 20.0
+
+def test_progress_finished_events():
+    events: list[StatementProgress] = []
+    reporter = _reporter(events)
+
+    reporter._report(reporter._progress('CREATE INDEX', 'building index: scanning table', 'abc', 10, 100))
+    reporter._report(reporter._progress('CLUSTER', 'seq scanning heap', 'def', 0, 0))
+    reporter._report(None)
+    reporter._report(None)
+
+    assert [(event.command, event.finished) for event in events] == [
+        ('CREATE INDEX', False),
+        ('CREATE INDEX', True),
+        ('CLUSTER', False),
+        ('CLUSTER', True),
+    ]
+
+    assert events[2].percent is None
@@ -0,0 +1,57 @@
+import pytest
+
+from magistrate.exc import InvalidRepeatableDependencyHeader, RepeatableDependencyCycle, UnknownRepeatableDependency
+from magistrate.parser import parse_repeatable_migration
+from magistrate.repeatable import order_repeatable_migrations, select_changed_repeatable_migrations
+
+def test_parse_repeatable_migration():
+    mig = parse_repeatable_migration('totals', '-- depends: values, base\n\nCREATE VIEW totals AS SELECT 1;\n')
+
+    assert mig.name == 'totals'
+    assert mig.depends == ['base', 'values']
+    assert mig.body == 'CREATE VIEW totals AS SELECT 1;\n'
+    assert mig.checksum != parse_repeatable_migration('totals', '-- depends: values, base\n\nCREATE VIEW totals AS SELECT 2;\n').checksum
+
+def test_parse_repeatable_migration_invalid_depends():
+    with pytest.raises(InvalidRepeatableDependencyHeader):
+        parse_repeatable_migration('totals', '-- depends: values base\nCREATE VIEW totals AS SELECT 1;\n')
+
+def test_repeatable_order():
+    migrations = [
+        parse_repeatable_migration('c', '-- depends: b\nSELECT 1;\n'),
+        parse_repeatable_migration('b', '-- depends: a\nSELECT 1;\n'),
+        parse_repeatable_migration('a', 'SELECT 1;\n'),
+        parse_repeatable_migration('d', 'SELECT 1;\n'),
+    ]
+
+    assert [mig.name for mig in order_repeatable_migrations(migrations)] == ['a', 'b', 'c', 'd']
+
+def test_repeatable_unknown_dependency():
+    with pytest.raises(UnknownRepeatableDependency):
+        order_repeatable_migrations([parse_repeatable_migration('a', '-- depends: missing\nSELECT 1;\n')])
+
+def test_repeatable_cycle():
+    with pytest.raises(RepeatableDependencyCycle) as ex:
+        order_repeatable_migrations([
+            parse_repeatable_migration('a', '-- depends: b\nSELECT 1;\n'),
+            parse_repeatable_migration('b', '-- depends: a\nSELECT 1;\n'),
+            parse_repeatable_migration('c', 'SELECT 1;\n'),
+        ])
+
+    assert ex.value.names == ['a', 'b']
+
+def test_repeatable_changed_selection():
+    migrations = [
+        parse_repeatable_migration('a', 'SELECT 1;\n'),
+        parse_repeatable_migration('b', '-- depends: a\nSELECT 1;\n'),
+        parse_repeatable_migration('c', 'SELECT 1;\n'),
+    ]
+
+    applied = {mig.name: mig.checksum for mig in migrations}
+
+    assert select_changed_repeatable_migrations(migrations, applied) == []
+
+    applied['a'] = 'outdated'
+
+    assert [mig.name for mig in select_changed_repeatable_migrations(migrations, applied)] == ['a', 'b']
+    assert [mig.name for mig in select_changed_repeatable_migrations(migrations, {})] == ['a', 'b', 'c']
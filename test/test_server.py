@@ -0,0 +1,44 @@
+import os
+import shutil
+import pydantic
+import pytest
+
+from magistrate.execution import DirectorySource
+from magistrate.server import ServerParameters, _SourceCache
+from test.test_common import TEST_DATA_FOLDER
+
+_directory_source_folder = os.path.join(TEST_DATA_FOLDER, 'test_migrations_data', 'test_directory_select_migrations')
+
+def test_source_cache_reloads_on_change(tmp_path):
+    directory = tmp_path / 'migrations'
+    shutil.copytree(_directory_source_folder, directory)
+    os.remove(directory / '4.mig.sql')
+
+    cache = _SourceCache(DirectorySource(directory=str(directory)))
+    cache.refresh()
+
+    assert cache.highest_version() == 3
+
+    first = cache.snapshot()
+    second = cache.snapshot()
+
+    assert [mig.version for mig in first.migrations] == [1, 2, 3]
+    # parsed migrations are reused until the directory changes
+    assert first.migrations[0] is second.migrations[0]
+
+    shutil.copy(os.path.join(_directory_source_folder, '4.mig.sql'), directory / '4.mig.sql')
+    cache.refresh()
+
+    assert cache.highest_version() == 4
+    assert cache.snapshot().migrations[0] is not first.migrations[0]
+
+@pytest.mark.parametrize('host', ['127.0.0.1', '::1', 'localhost'])
+def test_loopback_host_allowed(host):
+    ServerParameters(connection_string='', migration_source=DirectorySource(directory='.'), host=host)
+
+def test_remote_host_requires_allow_remote():
+    with pytest.raises(pydantic.ValidationError):
+        ServerParameters(connection_string='', migration_source=DirectorySource(directory='.'), host='0.0.0.0')
+
+    ServerParameters(connection_string='', migration_source=DirectorySource(directory='.'), host='0.0.0.0', allow_remote=True)
+    ServerParameters(connection_string='', migration_source=DirectorySource(directory='.'), host='0.0.0.0', unix_socket='/tmp/magistrate.sock')
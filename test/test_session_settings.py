@@ -0,0 +1,49 @@
+from io import StringIO
+import pytest
+
+from magistrate.db import check_migration_settings, default_allowed_settings
+from magistrate.dbexc import SettingNotAllowed
+from magistrate.exc import DuplicateHeader, InvalidSetDirective
+from magistrate.parser import parse_migration
+
+def _parse(header: str):
+    return parse_migration(StringIO(f'-- ver: 3\n{header}-- up\nSELECT 1;\n-- down\nSELECT 2;\n'))
+
+def test_set_directives():
+    parsed = _parse('-- set: maintenance_work_mem=4GB\n-- set: Max_Parallel_Maintenance_Workers = 8\n-- set: statement_timeout=\'30min\'\n')
+
+    assert parsed.settings == {
+        'maintenance_work_mem': '4GB',
+        'max_parallel_maintenance_workers': '8',
+        'statement_timeout': '30min',
+    }
+
+    assert _parse('').settings == {}
+
+@pytest.mark.parametrize('header,exception', [
+    ('-- set: maintenance_work_mem\n', InvalidSetDirective),
+    ('-- set: =4GB\n', InvalidSetDirective),
+    ('-- set: work_mem=\n', InvalidSetDirective),
+    ('-- set: maintenance_work_mem=4GB, work_mem=1GB\n', InvalidSetDirective),
+    ('-- set: maintenance_work_mem=4GB work_mem=1GB\n', InvalidSetDirective),
+    ('-- set: work_mem=64MB\n-- set: WORK_MEM=128MB\n', DuplicateHeader),
+])
+def test_set_directive_invalid(header, exception):
+    with pytest.raises(exception):
+        _parse(header)
+
+def test_set_directive_in_section():
+    parsed = parse_migration(StringIO('-- ver: 3\n-- up\n-- set: work_mem=64MB\nSELECT 1;\n-- down\nSELECT 2;\n'))
+
+    assert parsed.settings == {}
+    assert parsed.up_queries == ['-- set: work_mem=64MB\nSELECT 1;\n']
+
+def test_allowed_settings():
+    parsed = _parse('-- set: work_mem=64MB\n-- set: search_path=evil\n')
+
+    with pytest.raises(SettingNotAllowed) as ex:
+        check_migration_settings(parsed, default_allowed_settings)
+
+    assert ex.value.setting == 'search_path'
+
+    check_migration_settings(parsed, default_allowed_settings | {'search_path'})
@@ -0,0 +1,33 @@
+from magistrate.snapshot import SchemaChange, SchemaSnapshot, diff_snapshots
+
+def test_identical_snapshots():
+    snapshot = SchemaSnapshot(
+        schemas=['public'],
+        relations={'public.abc': 'r'},
+        columns={'public.abc.id': 'integer not null'}
+    )
+
+    assert diff_snapshots(snapshot, snapshot.model_copy(deep=True)) == []
+
+def test_snapshot_diff():
+    before = SchemaSnapshot(
+        schemas=['public'],
+        relations={'public.abc': 'r', 'public.old': 'r'},
+        columns={'public.abc.id': 'integer not null'},
+        enums={'public.status': 'pending, approved'}
+    )
+
+    after = SchemaSnapshot(
+        schemas=['public'],
+        relations={'public.abc': 'r'},
+        columns={'public.abc.id': 'bigint not null', 'public.abc.value': 'integer'},
+        enums={'public.status': 'pending, approved'}
+    )
+
+    assert diff_snapshots(before, after) == [
+        SchemaChange(category='relations', name='public.old', before='r', after=None),
+        SchemaChange(category='columns', name='public.abc.id', before='integer not null', after='bigint not null'),
+        SchemaChange(category='columns', name='public.abc.value', before=None, after='integer')
+    ]
+
+    assert str(diff_snapshots(before, after)[0]) == 'relations public.old removed: r'
@@ -0,0 +1,89 @@
+import os
+import pytest
+
+from magistrate.exc import IncompleteQuery, UnterminatedCopyData
+from magistrate.execution import DirectorySource
+from magistrate.parser import CopyData, StreamingMigration, parse_migration
+from test.test_common import TEST_DATA_FOLDER
+
+_valid_migration_path = os.path.join(TEST_DATA_FOLDER, 'test_parser_data', 'valid')
+_directory_source_folder = os.path.join(TEST_DATA_FOLDER, 'test_migrations_data', 'test_directory_select_migrations')
+
+@pytest.mark.parametrize('migration_filename', sorted(os.listdir(_valid_migration_path)))
+def test_streaming_matches_parser(migration_filename):
+    filename = os.path.join(_valid_migration_path, migration_filename)
+
+    with open(filename, 'r') as f:
+        parsed = parse_migration(f)
+
+    streamed = StreamingMigration(filename)
+
+    assert streamed.version == parsed.version
+    assert streamed.backwards_compatible == parsed.backwards_compatible
+    assert list(streamed.up_queries) == parsed.up_queries
+    assert list(streamed.down_queries) == parsed.down_queries
+
+def test_streaming_yields_before_invalid_tail(tmp_path):
+    filename = tmp_path / '1.mig.sql'
+    filename.write_text('-- ver: 1\n-- up\nCREATE TABLE abc (id int);\n-- down\nDROP TABLE \n')
+
+    streamed = StreamingMigration(str(filename))
+    queries = streamed.up_queries
+
+    assert next(queries) == 'CREATE TABLE abc (id int);\n'
+
+    with pytest.raises(IncompleteQuery):
+        next(queries)
+
+def test_streaming_directory_source_selection():
+    ds = DirectorySource(
+        directory=_directory_source_folder,
+        streaming=True
+    )
+
+    selected = ds.select_migrations(2, 4)
+
+    assert [mig.version for mig in selected] == [3, 4]
+    assert all(isinstance(mig, StreamingMigration) for mig in selected)
+
+def test_streaming_copy_rows(tmp_path):
+    filename = tmp_path / '1.mig.sql'
+    filename.write_text('-- ver: 1\n-- up\n-- copy: lookup (id, name)\n1\tone\n2\ttwo\n3\tthree\n\\.\nANALYZE lookup;\n-- down\nTRUNCATE lookup;\n')
+
+    with open(filename, 'r') as f:
+        parsed = parse_migration(f)
+
+    queries = StreamingMigration(str(filename)).up_queries
+    copy = next(queries)
+
+    assert isinstance(copy, CopyData)
+    assert copy.rows is None
+
+    # read in pieces the way COPY FROM STDIN pulls them
+    rows = copy.open_rows()
+    assert rows.read(5) == '1\tone'
+    assert rows.read() == '\n2\ttwo\n3\tthree\n'
+    assert rows.read() == ''
+
+    assert copy.checksum() == parsed.up_queries[0].checksum()
+    assert next(queries) == 'ANALYZE lookup;\n'
+
+def test_streaming_copy_rows_skipped_unread(tmp_path):
+    filename = tmp_path / '1.mig.sql'
+    filename.write_text('-- ver: 1\n-- up\n-- copy: lookup (id)\n1\n2\n\\.\nANALYZE lookup;\n-- down\nTRUNCATE lookup;\n')
+
+    queries = StreamingMigration(str(filename)).up_queries
+    copy = next(queries)
+
+    assert next(queries) == 'ANALYZE lookup;\n'
+    assert copy.rows_size() == 4
+
+def test_streaming_copy_rows_unterminated(tmp_path):
+    filename = tmp_path / '1.mig.sql'
+    filename.write_text('-- ver: 1\n-- up\n-- copy: lookup (id)\n1\n2\n')
+
+    queries = StreamingMigration(str(filename)).up_queries
+    copy = next(queries)
+
+    with pytest.raises(UnterminatedCopyData):
+        copy.open_rows().read()
@@ -0,0 +1,49 @@
+import os
+import shutil
+
+from magistrate.execution import DirectorySource, HardcodedSource
+from magistrate.parser import Migration
+from magistrate.testing import TemplateDatabase, database_connection_string, migration_fingerprint
+from test.test_common import TEST_DATA_FOLDER
+
+_directory_source_folder = os.path.join(TEST_DATA_FOLDER, 'test_migrations_data', 'test_directory_select_migrations')
+
+def test_directory_fingerprint_changes_with_files(tmp_path):
+    shutil.copytree(_directory_source_folder, tmp_path / 'migrations')
+    source = DirectorySource(directory=str(tmp_path / 'migrations'))
+
+    before = migration_fingerprint(source)
+
+    assert migration_fingerprint(source) == before
+
+    with open(tmp_path / 'migrations' / '4.mig.sql', 'a') as f:
+        f.write('\n')
+
+    assert migration_fingerprint(source) != before
+
+def test_directory_fingerprint_covers_data_subdirectories(tmp_path):
+    shutil.copytree(_directory_source_folder, tmp_path / 'migrations')
+    os.mkdir(tmp_path / 'migrations' / 'data')
+    (tmp_path / 'migrations' / 'data' / 'rows.csv').write_text('1\n')
+
+    source = DirectorySource(directory=str(tmp_path / 'migrations'))
+    before = migration_fingerprint(source)
+
+    (tmp_path / 'migrations' / 'data' / 'rows.csv').write_text('2\n')
+
+    assert migration_fingerprint(source) != before
+
+def test_hardcoded_fingerprint():
+    first = HardcodedSource(migrations=[Migration(version=1, up_queries=['SELECT 1;'], down_queries=[], backwards_compatible=True)])
+    second = HardcodedSource(migrations=[Migration(version=1, up_queries=['SELECT 2;'], down_queries=[], backwards_compatible=True)])
+
+    assert migration_fingerprint(first) != migration_fingerprint(second)
+
+def test_template_name():
+    template = TemplateDatabase(
+        connection_string='postgresql://user@localhost/postgres',
+        migration_source=DirectorySource(directory=_directory_source_folder)
+    )
+
+    assert template.template_name() == f'magistrate_template_{migration_fingerprint(template.migration_source)[:16]}'
+    assert 'dbname=tests' in database_connection_string(template.connection_string, 'tests')
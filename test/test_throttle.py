@@ -0,0 +1,65 @@
+from io import StringIO
+import pydantic
+import pytest
+
+from magistrate.dbexc import ReplicationLagTimeout
+from magistrate.exc import DirectiveRequiresNonTransactional, DuplicateHeader
+from magistrate.parser import Migration, parse_migration
+from magistrate.throttle import ReplicationThrottle
+
+def _lag_sequence(values: list[float]):
+    remaining = list(values)
+
+    def provider() -> float:
+        return remaining.pop(0) if len(remaining) > 1 else remaining[0]
+
+    return provider
+
+def test_throttle_waits_until_lag_drops():
+    polls = _lag_sequence([30.0, 12.0, 4.0])
+    throttle = ReplicationThrottle(max_lag_seconds=5.0, poll_interval=0.01, lag_provider=polls)
+
+    waited = throttle.wait('unused')
+
+    assert waited >= 0.02
+    assert throttle.waited_seconds == waited
+
+    throttle.wait('unused')
+
+    assert throttle.waited_seconds >= waited
+
+def test_throttle_timeout():
+    throttle = ReplicationThrottle(max_lag_seconds=5.0, poll_interval=0.01, max_wait_seconds=0.03, lag_provider=lambda: 60.0)
+
+    with pytest.raises(ReplicationLagTimeout) as exc_info:
+        throttle.wait('unused')
+
+    assert exc_info.value.lag_seconds == 60.0
+    assert exc_info.value.waited_seconds >= 0.03
+
+def test_throttle_header():
+    parsed = parse_migration(StringIO('-- ver: 1\n-- throttle: true\n-- transactional: false\n-- up\nSELECT 1;\n-- down\nSELECT 2;\n'))
+
+    assert parsed.throttle is True
+
+    parsed = parse_migration(StringIO('-- ver: 1\n-- up\nSELECT 1;\n-- down\nSELECT 2;\n'))
+
+    assert parsed.throttle is False
+
+def test_throttle_header_in_section():
+    # only the header holds directives, inside a section the line is an ordinary comment
+    parsed = parse_migration(StringIO('-- ver: 1\n-- up\n-- throttle: true\nSELECT 1;\n-- down\nSELECT 2;\n'))
+
+    assert parsed.throttle is False
+    assert parsed.up_queries == ['-- throttle: true\nSELECT 1;\n']
+
+def test_throttle_header_duplicate():
+    with pytest.raises(DuplicateHeader):
+        parse_migration(StringIO('-- ver: 1\n-- throttle: true\n-- throttle: false\n-- up\nSELECT 1;\n-- down\nSELECT 2;\n'))
+
+def test_throttle_header_requires_non_transactional():
+    with pytest.raises(DirectiveRequiresNonTransactional):
+        parse_migration(StringIO('-- ver: 1\n-- throttle: true\n-- up\nSELECT 1;\n-- down\nSELECT 2;\n'))
+
+    with pytest.raises(pydantic.ValidationError):
+        Migration(version=1, up_queries=['SELECT 1;'], down_queries=['SELECT 2;'], backwards_compatible=True, throttle=True)
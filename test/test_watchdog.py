@@ -0,0 +1,37 @@
+import pytest
+
+from magistrate.dbexc import LockQueueExceeded, MigrationBlockedTraffic, MigrationFailed
+from magistrate.watchdog import LockWatchdog, LockWatchdogSettings
+
+def test_watchdog_settings_require_threshold():
+    with pytest.raises(ValueError):
+        LockWatchdogSettings(max_blocked_sessions=None, max_blocked_seconds=None)
+
+def test_watchdog_thresholds():
+    watchdog = LockWatchdog(LockWatchdogSettings(max_blocked_sessions=3, max_blocked_seconds=None), lambda: None, 1)
+
+    assert not watchdog._exceeded(3, 100.0)
+    assert watchdog._exceeded(4, 0.0)
+
+    watchdog = LockWatchdog(LockWatchdogSettings(max_blocked_sessions=None, max_blocked_seconds=2.0), lambda: None, 1)
+
+    assert not watchdog._exceeded(100, 2.0)
+    assert watchdog._exceeded(1, 2.5)
+
+def test_watchdog_times_lock_waits():
+    watchdog = LockWatchdog(LockWatchdogSettings(), lambda: None, 1)
+
+    assert watchdog._waited_seconds([], 10.0) == 0.0
+    assert watchdog._waited_seconds([(11, 0.5), (12, None)], 10.0) == 0.5
+
+    # without waitstart, a wait is timed from the poll that first saw it
+    assert watchdog._waited_seconds([(12, None)], 13.0) == 3.0
+    assert watchdog._waited_seconds([(11, None)], 14.0) == 0.0
+
+def test_migration_failed_from_cause():
+    failed = MigrationFailed.from_cause(0, 2, 3, 1, LockQueueExceeded(2, 12, 4.5))
+
+    assert isinstance(failed, MigrationBlockedTraffic)
+    assert (failed.version_failed, failed.version_end, failed.blocked_sessions, failed.blocked_seconds) == (2, 1, 12, 4.5)
+
+    assert type(MigrationFailed.from_cause(0, 2, 3, 1, RuntimeError())) is MigrationFailed